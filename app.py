@@ -6,7 +6,6 @@ import plotly.express as px
 import plotly.graph_objects as go
 from fpdf import FPDF
 import base64
-import sqlite3
 import hashlib
 import os
 import io
@@ -14,7 +13,8 @@ from PIL import Image, ImageDraw, ImageFont
 import secrets
 import hmac
 import time
-from functools import wraps
+import threading
+from functools import partial, wraps
 import psycopg2
 import textwrap
 # =============================================
@@ -64,105 +64,145 @@ def resetar_formulario():
     """Reseta o estado do formulário após submit bem-sucedido"""
     st.session_state.ultimo_submit = 0
 
-def forcar_atualizacao_gastos():
-    """Força a atualização dos dados de gastos no cache"""
-    if 'cache_gastos' in st.session_state:
-        del st.session_state.cache_gastos
-    if 'cache_veiculos' in st.session_state:
-        del st.session_state.cache_veiculos
-    if 'cache_dashboard' in st.session_state:
-        del st.session_state.cache_dashboard
-
 # =============================================
-# SISTEMA DE CACHE PARA ATUALIZAÇÃO RÁPIDA
+# SISTEMA DE CACHE POR TABELA (INVALIDADO NA ESCRITA)
 # =============================================
-
-@st.cache_data(ttl=30)  # Cache de 30 segundos
+# Cada leitura em cache declara as tabelas de que depende. Os métodos de
+# escrita do Database incrementam a versão das tabelas que alteram logo após
+# o commit, e essa versão faz parte da chave do cache: a leitura seguinte já
+# vem do banco. O TTL só cobre escritas feitas fora deste processo.
+
+CACHE_TTL = 600  # 10 minutos
+
+def cache_por_tabela(*tabelas):
+    """st.cache_data com a versão das tabelas na chave - invalidado pelos métodos de escrita"""
+    def decorador(funcao):
+        def em_cache(_db, versao, *args, **kwargs):
+            return funcao(_db, *args, **kwargs)
+        # O st.cache_data separa os caches pelo nome qualificado da função
+        em_cache.__qualname__ = em_cache.__name__ = f"{funcao.__name__}_por_versao"
+        em_cache = st.cache_data(ttl=CACHE_TTL, show_spinner=False)(em_cache)
+
+        @wraps(funcao)
+        def leitura(_db, *args, **kwargs):
+            return em_cache(_db, _db.versao(*tabelas), *args, **kwargs)
+        leitura.clear = em_cache.clear
+        return leitura
+    return decorador
+
+@cache_por_tabela('veiculos')
 def get_veiculos_cache(_db, filtro_status=None):
     """Cache para veículos"""
     return _db.get_veiculos(filtro_status)
 
-@st.cache_data(ttl=30)
+@cache_por_tabela('gastos', 'veiculos')
 def get_gastos_cache(_db, veiculo_id=None):
     """Cache para gastos"""
     return _db.get_gastos(veiculo_id)
 
-@st.cache_data(ttl=30)
-def get_vendas_cache(_db):
-    """Cache para vendas"""
-    return _db.get_vendas()
-
-@st.cache_data(ttl=30)
-def get_fluxo_caixa_cache(_db, data_inicio=None, data_fim=None):
-    """Cache para fluxo de caixa"""
-    return _db.get_fluxo_caixa(data_inicio, data_fim)
-
-@st.cache_data(ttl=30)
-def get_financiamentos_cache(_db, veiculo_id=None):
-    """Cache para financiamentos"""
-    return _db.get_financiamentos(veiculo_id)
-
-@st.cache_data(ttl=30)
-def get_contatos_cache(_db):
-    """Cache para contatos"""
-    return _db.get_contatos()
+# Páginas por cursor - o cursor entra na chave do cache junto com os filtros
+@cache_por_tabela('veiculos', 'gastos')
+def get_veiculos_com_custos_pagina_cache(_db, filtro_status=None, marca=None, limite=20, cursor=None, direcao='proximos'):
+    """Cache para uma página do estoque com custos"""
+    return _db.get_veiculos_com_custos_pagina(filtro_status, marca, limite, cursor, direcao)
+
+@cache_por_tabela('vendas', 'veiculos', 'financiamentos')
+def get_historico_vendas_pagina_cache(_db, limite=20, cursor=None, direcao='proximos'):
+    """Cache para uma página do histórico de vendas"""
+    return _db.get_historico_vendas_pagina(limite, cursor, direcao)
+
+@cache_por_tabela('documentos', 'veiculos')
+def get_documentos_pagina_cache(_db, veiculo_id=None, limite=20, cursor=None, direcao='proximos'):
+    """Cache para uma página de documentos (só metadados)"""
+    return _db.get_documentos_pagina(veiculo_id, limite, cursor, direcao)
+
+@cache_por_tabela('fluxo_caixa', 'veiculos')
+def get_fluxo_caixa_pagina_cache(_db, data_inicio=None, data_fim=None, limite=20, cursor=None, direcao='proximos'):
+    """Cache para uma página do fluxo de caixa"""
+    return _db.get_fluxo_caixa_pagina(data_inicio, data_fim, limite, cursor, direcao)
+
+@cache_por_tabela('fluxo_caixa')
+def get_resumo_fluxo_caixa_cache(_db, data_inicio, data_fim):
+    """Cache para os totais do período do fluxo de caixa"""
+    return _db.get_resumo_fluxo_caixa(data_inicio, data_fim)
+
+@cache_por_tabela('parcelas', 'financiamentos', 'veiculos')
+def get_parcelas_pagina_cache(_db, status=None, vencimento_antes=None, vencimento_ate=None, limite=20, cursor=None,
+                              direcao='proximos'):
+    """Cache para uma página de parcelas"""
+    return _db.get_parcelas_pagina(None, status, vencimento_antes, vencimento_ate, limite, cursor, direcao)
+
+@cache_por_tabela('parcelas')
+def get_resumo_vencimentos_cache(_db, hoje, ate):
+    """Cache para as métricas da tela de parcelas"""
+    return _db.get_resumo_vencimentos(hoje, ate)
+
+@cache_por_tabela('contatos')
+def get_contatos_pagina_cache(_db, limite=20, cursor=None, direcao='proximos'):
+    """Cache para uma página de contatos"""
+    return _db.get_contatos_pagina(limite, cursor, direcao)
+
+@cache_por_tabela('fotos_variantes', 'veiculos')
+def get_fotos_variante_cache(_db, variante, formato):
+    """Cache para {veiculo_id: hash} de uma variante das fotos"""
+    return _db.get_fotos_variante(variante, formato)
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def ler_blob_cache(_db, hash_blob):
+    """Conteúdo de um arquivo do armazenamento - o hash muda junto com o conteúdo, nunca expira"""
+    return _db.armazenamento.ler(hash_blob)
+
+@cache_por_tabela('veiculos', 'vendas', 'gastos', 'fluxo_caixa', 'financiamentos', 'parcelas')
+def get_painel_cache(_db, hoje):
+    """Cache para os indicadores do Dashboard - 'hoje' na chave vira o cache à meia-noite"""
+    return painel.calcular_painel(
+        _db.get_estoque_painel(),
+        painel.carregar_agregados(_db, hoje),
+        hoje,
+    )
     
 # =============================================
-# FUNÇÃO AUXILIAR PARA DATAS - CORRIGIDA PARA POSTGRESQL
+# FUNÇÃO AUXILIAR PARA DATAS
 # =============================================
+# O pool entrega date/datetime nos dois bancos - aqui só se formata para exibição
 
 def formatar_data(data):
-    """Formata data para exibição, funcionando com SQLite e PostgreSQL"""
+    """dd/mm/aaaa de um date/datetime vindo do banco"""
     if data is None:
         return "Data inválida"
-    
-    try:
-        # ✅ CORREÇÃO PARA POSTGRESQL: Verificar se é Timestamp
-        if hasattr(data, 'strftime'):
-            # Timestamp do PostgreSQL
-            return data.strftime('%d/%m/%Y')
-        elif isinstance(data, str):
-            # String do SQLite
-            if len(data) >= 10:
-                # Converter de YYYY-MM-DD para DD/MM/YYYY
-                return f"{data[8:10]}/{data[5:7]}/{data[0:4]}"
-            return data
-        elif hasattr(data, 'date'):
-            # Date object
-            return data.strftime('%d/%m/%Y')
-        else:
-            return str(data)
-    except Exception as e:
-        print(f"⚠️ Erro ao formatar data {data} ({type(data)}): {e}")
-        return "Data inválida"
-        
+    return data.strftime('%d/%m/%Y')
+
 # =============================================
-# FUNÇÕES AUXILIARES PARA POSTGRESQL
+# PAGINAÇÃO POR CURSOR NAS TELAS
 # =============================================
-
-def converter_data_postgresql(data):
-    """Converte data do PostgreSQL para formato legível"""
-    try:
-        if hasattr(data, 'strftime'):
-            return data.strftime('%Y-%m-%d')
-        elif isinstance(data, str):
-            return data[:10] if len(data) >= 10 else data
-        return str(data)
-    except:
-        return "Data inválida"
-
-def processar_timestamp_postgresql(timestamp):
-    """Processa timestamp do PostgreSQL para análise"""
-    try:
-        if hasattr(timestamp, 'date'):
-            return timestamp.date()
-        elif hasattr(timestamp, 'strftime'):
-            return timestamp
-        elif isinstance(timestamp, str):
-            return datetime.datetime.strptime(timestamp[:10], '%Y-%m-%d').date()
-        return timestamp
-    except:
-        return datetime.datetime.now().date()      
+# A sessão guarda, por listagem, (filtros, cursor, direção) da página mostrada.
+# Mudou um filtro, a listagem volta para a primeira página.
+
+def pagina_da_sessao(chave, buscar, *filtros):
+    """Página atual da listagem `chave`: buscar(*filtros, cursor=..., direcao=...)"""
+    estado = st.session_state.get(f'pagina_{chave}')
+    if estado is None or estado[0] != filtros:
+        estado = (filtros, None, 'proximos')
+    pagina = buscar(*filtros, cursor=estado[1], direcao=estado[2])
+    if not pagina['itens'] and estado[1] is not None:
+        # Os registros daquele lado do cursor sumiram (exclusões) - recomeça do início
+        estado = (filtros, None, 'proximos')
+        pagina = buscar(*filtros, cursor=None, direcao='proximos')
+    st.session_state[f'pagina_{chave}'] = estado
+    return pagina
+
+def controles_pagina(chave, pagina):
+    """◀ Anteriores / Próximos ▶ - só aparecem quando existe página daquele lado"""
+    filtros = st.session_state[f'pagina_{chave}'][0]
+    col_anterior, col_proximo = st.columns(2)
+    with col_anterior:
+        if pagina['anterior'] is not None and st.button("◀ Anteriores", key=f"{chave}_anteriores", use_container_width=True):
+            st.session_state[f'pagina_{chave}'] = (filtros, pagina['anterior'], 'anteriores')
+            st.rerun()
+    with col_proximo:
+        if pagina['proximo'] is not None and st.button("Próximos ▶", key=f"{chave}_proximos", use_container_width=True):
+            st.session_state[f'pagina_{chave}'] = (filtros, pagina['proximo'], 'proximos')
+            st.rerun()
 # =============================================
 # CONFIGURAÇÃO DA PÁGINA - DEVE SER O PRIMEIRO COMANDO
 # =============================================
@@ -174,31 +214,6 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-def atualizar_margem_veiculo(veiculo_id, nova_margem):
-    """Atualiza a margem de negociação de um veículo"""
-    conn = sqlite3.connect("canal_automotivo.db")
-    cursor = conn.cursor()
-    
-    # Buscar preço de entrada
-    cursor.execute('SELECT preco_entrada FROM veiculos WHERE id = ?', (veiculo_id,))
-    resultado = cursor.fetchone()
-    
-    if resultado:
-        preco_entrada = resultado[0]
-        novo_preco_venda = preco_entrada * (1 + nova_margem/100)
-        
-        # Atualizar no banco
-        cursor.execute('''
-            UPDATE veiculos 
-            SET preco_venda = ?, margem_negociacao = ? 
-            WHERE id = ?
-        ''', (novo_preco_venda, nova_margem, veiculo_id))
-        
-        conn.commit()
-    
-    conn.close()
-    return True
-    
 def gerar_papel_timbrado(texto, nome_arquivo="documento_timbrado.png", margem_esquerda=50, margem_direita=50, margem_topo=200, espacamento_linhas=8):
     """Gera um documento com papel timbrado personalizado.
     - quebra o texto automaticamente por largura,
@@ -710,46 +725,60 @@ def login_seguro(username, password):
 
 # Importar funções de hash UMA VEZ no topo
 from auth import hash_password, verify_password
+from pool_conexoes import obter_pool
+from migracoes import VERSAO_ATUAL, migrar, versao_atual
+from armazenamento_blobs import obter_armazenamento
+import consultas
+import kpi_snapshot
+import cronograma_parcelas
+import painel
+import variantes_foto
 
 class Database:
+    # Versão que este código espera - migrações pendentes rodam uma única vez no boot
+    SCHEMA_VERSAO = VERSAO_ATUAL
+
     def __init__(self):
         self.db_path = "canal_automotivo.db"
-        self.init_db()
-        self.criar_coluna_foto()
-        
-    def atualizar_estrutura_banco(self):
-        """Atualiza a estrutura do banco se necessário - CORRIGIDO PARA POSTGRESQL"""
+        # Dialeto decidido uma vez pelo pool; o catálogo de SQL é compilado para ele aqui
+        self.dialeto = obter_pool().dialeto
+        self.sql = consultas.para(self.dialeto)
+        # Fotos e documentos ficam no armazenamento de arquivos; o banco guarda hash/tamanho/mime
+        self.armazenamento = obter_armazenamento()
+        # Versão de cada tabela para os caches get_*_cache; a geração separa instâncias
+        # recriadas no mesmo processo (ex: recarga do código em desenvolvimento)
+        self._geracao = time.time_ns()
+        self._versoes = {}
+        self._versoes_lock = threading.Lock()
+        self.inicializar_schema()
+
+    def schema_pronto(self):
+        """Verifica o marcador de versão - evita rodar DDL quando o banco já está atualizado"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            # Verificar se a coluna margem_negociacao existe
-            if os.getenv('DATABASE_URL'):  # PostgreSQL
-                cursor.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'veiculos' AND column_name = 'margem_negociacao'
-                """)
-                colunas = [col[0] for col in cursor.fetchall()]
-            else:  # SQLite
-                cursor.execute("PRAGMA table_info(veiculos)")
-                colunas = [col[1] for col in cursor.fetchall()]
-            
-            if 'margem_negociacao' not in colunas:
-                print("🔄 Adicionando coluna 'margem_negociacao'...")
-                if os.getenv('DATABASE_URL'):
-                    cursor.execute('ALTER TABLE veiculos ADD COLUMN margem_negociacao REAL DEFAULT 30')
-                else:
-                    cursor.execute('ALTER TABLE veiculos ADD COLUMN margem_negociacao REAL DEFAULT 30')
-                conn.commit()
-                print("✅ Coluna 'margem_negociacao' adicionada!")
-                
-        except Exception as e:
-            print(f"❌ Erro ao atualizar estrutura: {e}")
-            conn.rollback()
+            return versao_atual(conn) >= self.SCHEMA_VERSAO
         finally:
             conn.close()
-            
+
+    def inicializar_schema(self):
+        """Aplica as migrações pendentes só se o marcador de versão estiver desatualizado"""
+        if self.schema_pronto():
+            print(f"✅ Schema já na versão {self.SCHEMA_VERSAO} - pulando migrações")
+            return
+        
+        self.init_db()
+        
+    def versao(self, *tabelas):
+        """Versão atual das tabelas - faz parte da chave dos caches get_*_cache"""
+        return (self._geracao,) + tuple(self._versoes.get(tabela, 0) for tabela in tabelas)
+
+    def invalidar(self, *tabelas):
+        """Chamado pelos métodos de escrita logo após o commit"""
+        with self._versoes_lock:
+            for tabela in tabelas:
+                self._versoes[tabela] = self._versoes.get(tabela, 0) + 1
+
     def get_sqlalchemy_connection(self):
         """Retorna conexão SQLAlchemy para pandas"""
         database_url = os.getenv('DATABASE_URL')
@@ -760,434 +789,34 @@ class Database:
             # Para SQLite local
             return f"sqlite:///{self.db_path}"    
     def get_connection(self):
-        """Conecta ao banco de dados correto"""
-        
-        database_url = os.getenv('DATABASE_URL')
-        
-        if database_url and database_url.startswith('postgresql://'):
-            print("✅ Conectando ao PostgreSQL...")
-            try:
-                conn = psycopg2.connect(database_url, sslmode='require')
-                print("🎉 PostgreSQL conectado com sucesso!")
-                return conn
-            except Exception as e:
-                print(f"❌ Erro PostgreSQL: {e}")
-        
-        print("🔄 Usando SQLite...")
-        return sqlite3.connect(self.db_path)
+        """Empresta uma conexão do pool do processo - conn.close() devolve ao pool"""
+        return obter_pool().obter()
     
     def init_db(self):
+        """Aplica as migrações pendentes (migracoes.py) e garante o usuário admin"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        # Verificar se estamos usando PostgreSQL
-        usando_postgres = os.getenv('DATABASE_URL') is not None
+        try:
+            print(f"🗄️  Migrando schema para: {'PostgreSQL' if self.dialeto == 'postgres' else 'SQLite'}")
+            migrar(conn, self.dialeto)
         
-        print(f"🗄️  Criando tabelas para: {'PostgreSQL' if usando_postgres else 'SQLite'}")
-    
-        # Tabela de veículos
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS veiculos (
-                    id SERIAL PRIMARY KEY,
-                    modelo TEXT NOT NULL,
-                    ano INTEGER NOT NULL,
-                    marca TEXT NOT NULL,
-                    cor TEXT NOT NULL,
-                    preco_entrada REAL NOT NULL,
-                    preco_venda REAL NOT NULL,
-                    fornecedor TEXT NOT NULL,
-                    km INTEGER,
-                    placa TEXT,
-                    chassi TEXT,
-                    combustivel TEXT,
-                    cambio TEXT,
-                    portas INTEGER,
-                    observacoes TEXT,
-                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'Em estoque'
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS veiculos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    modelo TEXT NOT NULL,
-                    ano INTEGER NOT NULL,
-                    marca TEXT NOT NULL,
-                    cor TEXT NOT NULL,
-                    preco_entrada REAL NOT NULL,
-                    preco_venda REAL NOT NULL,
-                    fornecedor TEXT NOT NULL,
-                    km INTEGER,
-                    placa TEXT,
-                    chassi TEXT,
-                    combustivel TEXT,
-                    cambio TEXT,
-                    portas INTEGER,
-                    observacoes TEXT,
-                    data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    status TEXT DEFAULT 'Em estoque'
-                )
-            ''')
-    
-        # Tabela de gastos
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS gastos (
-                    id SERIAL PRIMARY KEY,
-                    veiculo_id INTEGER NOT NULL,
-                    tipo_gasto TEXT NOT NULL,
-                    valor REAL NOT NULL,
-                    data DATE NOT NULL,
-                    descricao TEXT,
-                    categoria TEXT,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS gastos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    veiculo_id INTEGER NOT NULL,
-                    tipo_gasto TEXT NOT NULL,
-                    valor REAL NOT NULL,
-                    data DATE NOT NULL,
-                    descricao TEXT,
-                    categoria TEXT,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-    
-        # Tabela de vendas
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS vendas (
-                    id SERIAL PRIMARY KEY,
-                    veiculo_id INTEGER NOT NULL,
-                    comprador_nome TEXT NOT NULL,
-                    comprador_cpf TEXT,
-                    comprador_endereco TEXT,
-                    valor_venda REAL NOT NULL,
-                    data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    contrato_path TEXT,
-                    status TEXT DEFAULT 'Concluída',
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS vendas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    veiculo_id INTEGER NOT NULL,
-                    comprador_nome TEXT NOT NULL,
-                    comprador_cpf TEXT,
-                    comprador_endereco TEXT,
-                    valor_venda REAL NOT NULL,
-                    data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    contrato_path TEXT,
-                    status TEXT DEFAULT 'Concluída',
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-    
-        # Tabela de documentos
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS documentos (
-                    id SERIAL PRIMARY KEY,
-                    veiculo_id INTEGER NOT NULL,
-                    nome_documento TEXT NOT NULL,
-                    tipo_documento TEXT NOT NULL,
-                    arquivo BYTEA,
-                    data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    observacoes TEXT,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS documentos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    veiculo_id INTEGER NOT NULL,
-                    nome_documento TEXT NOT NULL,
-                    tipo_documento TEXT NOT NULL,
-                    arquivo BLOB,
-                    data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    observacoes TEXT,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-    
-        # Tabela de fluxo de caixa
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS fluxo_caixa (
-                    id SERIAL PRIMARY KEY,
-                    data DATE NOT NULL,
-                    descricao TEXT NOT NULL,
-                    tipo TEXT NOT NULL,
-                    categoria TEXT,
-                    valor REAL NOT NULL,
-                    veiculo_id INTEGER,
-                    status TEXT DEFAULT 'Pendente',
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS fluxo_caixa (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    data DATE NOT NULL,
-                    descricao TEXT NOT NULL,
-                    tipo TEXT NOT NULL,
-                    categoria TEXT,
-                    valor REAL NOT NULL,
-                    veiculo_id INTEGER,
-                    status TEXT DEFAULT 'Pendente',
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-    
-        # Tabela de contatos
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS contatos (
-                    id SERIAL PRIMARY KEY,
-                    nome TEXT NOT NULL,
-                    telefone TEXT,
-                    email TEXT,
-                    tipo TEXT,
-                    veiculo_interesse TEXT,
-                    data_contato DATE,
-                    status TEXT DEFAULT 'Novo',
-                    observacoes TEXT,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS contatos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    nome TEXT NOT NULL,
-                    telefone TEXT,
-                    email TEXT,
-                    tipo TEXT,
-                    veiculo_interesse TEXT,
-                    data_contato DATE,
-                    status TEXT DEFAULT 'Novo',
-                    observacoes TEXT,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-    
-        # Tabela de usuários
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id SERIAL PRIMARY KEY,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    nome TEXT NOT NULL,
-                    email TEXT,
-                    nivel_acesso TEXT DEFAULT 'usuario',
-                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS usuarios (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    username TEXT UNIQUE NOT NULL,
-                    password_hash TEXT NOT NULL,
-                    nome TEXT NOT NULL,
-                    email TEXT,
-                    nivel_acesso TEXT DEFAULT 'usuario',
-                    data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            ''')
-    
-        # Tabela de financiamentos
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS financiamentos (
-                    id SERIAL PRIMARY KEY,
-                    veiculo_id INTEGER NOT NULL,
-                    tipo_financiamento TEXT NOT NULL,
-                    valor_total REAL NOT NULL,
-                    valor_entrada REAL,
-                    num_parcelas INTEGER,
-                    data_contrato DATE,
-                    status TEXT DEFAULT 'Ativo',
-                    observacoes TEXT,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS financiamentos (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    veiculo_id INTEGER NOT NULL,
-                    tipo_financiamento TEXT NOT NULL,
-                    valor_total REAL NOT NULL,
-                    valor_entrada REAL,
-                    num_parcelas INTEGER,
-                    data_contrato DATE,
-                    status TEXT DEFAULT 'Ativo',
-                    observacoes TEXT,
-                    data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
-                )
-            ''')
-    
-        # Tabela de parcelas
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS parcelas (
-                    id SERIAL PRIMARY KEY,
-                    financiamento_id INTEGER NOT NULL,
-                    numero_parcela INTEGER NOT NULL,
-                    valor_parcela REAL NOT NULL,
-                    data_vencimento DATE NOT NULL,
-                    data_pagamento DATE,
-                    status TEXT DEFAULT 'Pendente',
-                    forma_pagamento TEXT,
-                    observacoes TEXT,
-                    arquivo_comprovante BYTEA,
-                    FOREIGN KEY (financiamento_id) REFERENCES financiamentos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS parcelas (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    financiamento_id INTEGER NOT NULL,
-                    numero_parcela INTEGER NOT NULL,
-                    valor_parcela REAL NOT NULL,
-                    data_vencimento DATE NOT NULL,
-                    data_pagamento DATE,
-                    status TEXT DEFAULT 'Pendente',
-                    forma_pagamento TEXT,
-                    observacoes TEXT,
-                    arquivo_comprovante BLOB,
-                    FOREIGN KEY (financiamento_id) REFERENCES financiamentos (id)
-                )
-            ''')
-    
-        # Tabela de documentos financeiros
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS documentos_financeiros (
-                    id SERIAL PRIMARY KEY,
-                    veiculo_id INTEGER,
-                    financiamento_id INTEGER,
-                    tipo_documento TEXT NOT NULL,
-                    nome_arquivo TEXT NOT NULL,
-                    arquivo BYTEA NOT NULL,
-                    data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    observacoes TEXT,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id),
-                    FOREIGN KEY (financiamento_id) REFERENCES financiamentos (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS documentos_financeiros (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    veiculo_id INTEGER,
-                    financiamento_id INTEGER,
-                    tipo_documento TEXT NOT NULL,
-                    nome_arquivo TEXT NOT NULL,
-                    arquivo BLOB NOT NULL,
-                    data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    observacoes TEXT,
-                    FOREIGN KEY (veiculo_id) REFERENCES veiculos (id),
-                    FOREIGN KEY (financiamento_id) REFERENCES financiamentos (id)
-                )
-            ''')
-    
-        # Tabela de logs de acesso
-        if usando_postgres:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs_acesso (
-                    id SERIAL PRIMARY KEY,
-                    usuario_id INTEGER,
-                    username TEXT,
-                    data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ip_address TEXT,
-                    sucesso BOOLEAN,
-                    FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-                )
-            ''')
-        else:
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS logs_acesso (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    usuario_id INTEGER,
-                    username TEXT,
-                    data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ip_address TEXT,
-                    sucesso BOOLEAN,
-                    FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
-                )
-            ''')
-    
-        # Inserir usuário admin se não existir
-        if usando_postgres:
-            cursor.execute('''
-                INSERT INTO usuarios (username, password_hash, nome, nivel_acesso)
-                SELECT 'admin', %s, 'Administrador', 'admin'
-                WHERE NOT EXISTS (SELECT 1 FROM usuarios WHERE username = 'admin')
-            ''', (hash_password('admin123'),))
-        else:
-            cursor.execute('''
-                INSERT OR IGNORE INTO usuarios (username, password_hash, nome, nivel_acesso)
-                VALUES (?, ?, ?, ?)
-            ''', ('admin', hash_password('admin123'), 'Administrador', 'admin'))
+            # Inserir usuário admin se não existir
+            self.sql.executar(conn, 'usuarios.inserir_se_nao_existe',
+                              ('admin', hash_password('admin123'), 'Administrador', 'admin', 'admin'))
+            
+            conn.commit()
+        finally:
+            conn.close()
 
     def salvar_foto_veiculo(self, veiculo_id, foto_bytes):
         """Salva foto do veículo de forma segura - VERSÃO CORRIGIDA"""
         conn = None
         try:
             conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            # ✅ CORREÇÃO: Verificar se a coluna 'foto' existe de forma mais robusta
-            if os.getenv('DATABASE_URL'):
-                # PostgreSQL - Verificar coluna
-                cursor.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'veiculos' AND column_name = 'foto'
-                """)
-                colunas = [col[0] for col in cursor.fetchall()]
-            else:
-                # SQLite - Verificar coluna
-                cursor.execute("PRAGMA table_info(veiculos)")
-                colunas = [col[1] for col in cursor.fetchall()]
-            
-            # Se a coluna não existir, adicionar
-            if 'foto' not in colunas:
-                print("🔄 Criando coluna 'foto' antes de salvar...")
-                if os.getenv('DATABASE_URL'):
-                    cursor.execute('ALTER TABLE veiculos ADD COLUMN foto BYTEA')
-                else:
-                    cursor.execute('ALTER TABLE veiculos ADD COLUMN foto BLOB')
-                conn.commit()
-                print("✅ Coluna 'foto' criada com sucesso!")
             
+            # As colunas foto_hash/_tamanho/_mime são garantidas pela migração 7 (migracoes.py)
             # ✅ CORREÇÃO CRÍTICA: Verificar se o veículo existe antes de atualizar
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('SELECT id FROM veiculos WHERE id = %s', (veiculo_id,))
-            else:
-                cursor.execute('SELECT id FROM veiculos WHERE id = ?', (veiculo_id,))
-            
-            veiculo_existe = cursor.fetchone()
+            veiculo_existe = self.sql.buscar_um(conn, 'veiculos.existe', (veiculo_id,))
             
             if not veiculo_existe:
                 print(f"❌ Veículo ID {veiculo_id} não encontrado!")
@@ -1197,14 +826,14 @@ class Database:
             if foto_bytes and len(foto_bytes) > 0:
                 print(f"📸 Salvando foto ({len(foto_bytes)} bytes) para veículo {veiculo_id}...")
                 
-                if os.getenv('DATABASE_URL'):
-                    # ✅ PostgreSQL: Converter para psycopg2.Binary para BYTEA
-                    cursor.execute('UPDATE veiculos SET foto = %s WHERE id = %s', (psycopg2.Binary(foto_bytes), veiculo_id))
-                else:
-                    # SQLite: manter como bytes
-                    cursor.execute('UPDATE veiculos SET foto = ? WHERE id = ?', (foto_bytes, veiculo_id))
+                # Conteúdo vai para o armazenamento; foto repetida reaproveita o mesmo arquivo
+                blob = self.armazenamento.salvar(foto_bytes)
+                self.sql.executar(conn, 'veiculos.salvar_foto', (blob.hash, blob.tamanho, blob.mime, veiculo_id))
                 
                 conn.commit()
+                self.invalidar('veiculos')
+                # Card/detalhe em WebP e JPEG são gerados em segundo plano - o formulário não espera
+                variantes_foto.agendar(veiculo_id, blob.hash, lambda: self.invalidar('fotos_variantes'))
                 print("✅ Foto salva com sucesso!")
                 return True
             else:
@@ -1220,72 +849,31 @@ class Database:
             if conn:
                 conn.close()
     
+    def get_fotos_variante(self, variante, formato):
+        """{veiculo_id: hash} da variante pedida para os veículos que já a têm"""
+        conn = self.get_connection()
+        
+        try:
+            return dict(self.sql.executar(conn, 'fotos_variantes.por_variante', (variante, formato)).fetchall())
+        except Exception as e:
+            print(f"❌ Erro ao buscar variantes das fotos: {e}")
+            return {}
+        finally:
+            conn.close()
+    
     def get_foto_veiculo(self, veiculo_id):
         """Busca a foto do veículo"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('SELECT foto FROM veiculos WHERE id = %s', (veiculo_id,))
-            else:
-                cursor.execute('SELECT foto FROM veiculos WHERE id = ?', (veiculo_id,))
-            
-            resultado = cursor.fetchone()
-            return resultado[0] if resultado and resultado[0] else None
+            resultado = self.sql.buscar_um(conn, 'veiculos.foto', (veiculo_id,))
+            return self.armazenamento.ler(resultado[0]) if resultado and resultado[0] else None
         except Exception as e:
             print(f"Erro ao buscar foto: {e}")
             return None
         finally:
             conn.close()
     
-    def criar_coluna_foto(self):
-        """Cria a coluna foto se não existir - VERSÃO MAIS ROBUSTA"""
-        conn = None
-        try:
-            conn = self.get_connection()
-            cursor = conn.cursor()
-            
-            print("🔍 Verificando coluna 'foto'...")
-            
-            # Verificar se a coluna 'foto' existe
-            if os.getenv('DATABASE_URL'):
-                # PostgreSQL
-                cursor.execute("""
-                    SELECT column_name 
-                    FROM information_schema.columns 
-                    WHERE table_name = 'veiculos' AND column_name = 'foto'
-                """)
-                resultado = cursor.fetchall()
-                colunas = [col[0] for col in resultado] if resultado else []
-            else:
-                # SQLite
-                cursor.execute("PRAGMA table_info(veiculos)")
-                resultado = cursor.fetchall()
-                colunas = [col[1] for col in resultado] if resultado else []
-            
-            print(f"📊 Colunas encontradas: {colunas}")
-            
-            if 'foto' not in colunas:
-                print("🔄 Criando coluna 'foto'...")
-                if os.getenv('DATABASE_URL'):
-                    cursor.execute('ALTER TABLE veiculos ADD COLUMN foto BYTEA')
-                    print("✅ Coluna 'foto' criada no PostgreSQL!")
-                else:
-                    cursor.execute('ALTER TABLE veiculos ADD COLUMN foto BLOB')
-                    print("✅ Coluna 'foto' criada no SQLite!")
-                conn.commit()
-            else:
-                print("✅ Coluna 'foto' já existe")
-                
-        except Exception as e:
-            print(f"❌ Erro ao verificar/criar coluna foto: {e}")
-            if conn:
-                conn.rollback()
-        finally:
-            if conn:
-                conn.close()     
-
     # =============================================
     # MÉTODOS ORIGINAIS - ADAPTADOS PARA AMBOS OS BANCOS
     # =============================================
@@ -1293,42 +881,41 @@ class Database:
     def get_veiculos(self, filtro_status=None):
         """Busca veículos - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            query = '''
-                SELECT 
-                    v.id, v.modelo, v.ano, v.marca, v.cor, 
-                    v.preco_entrada, v.preco_venda, v.fornecedor, 
-                    v.km, v.placa, v.chassi, v.combustivel, 
-                    v.cambio, v.portas, v.observacoes, 
-                    v.data_cadastro, v.status,
-                    COALESCE(v.margem_negociacao, 30) as margem_negociacao
-                FROM veiculos v
-            '''
-            
-            if filtro_status and filtro_status != 'Todos':
-                query += f" WHERE v.status = '{filtro_status}'"
-            
-            query += ' ORDER BY v.data_cadastro DESC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            # Converter para dicionários
-            veiculos = []
-            for row in resultados:
-                veiculo = dict(zip(colunas, row))
-                veiculos.append(veiculo)
-            
-            return veiculos
+            status = filtro_status if filtro_status != 'Todos' else None
+            return self.sql.listar_filtrado(conn, 'veiculos.listar', {'status': status})
             
         except Exception as e:
             print(f"❌ Erro ao buscar veículos: {e}")
             return []
         finally:
             conn.close()
+
+    def _pagina(self, nome, filtros, limite, cursor, direcao):
+        """Página por cursor de uma listagem - ver Consultas.listar_pagina"""
+        conn = self.get_connection()
+
+        try:
+            return self.sql.listar_pagina(conn, nome, filtros, limite, cursor, direcao)
+
+        except Exception as e:
+            print(f"❌ Erro ao paginar {nome}: {e}")
+            conn.rollback()
+            return {'itens': [], 'anterior': None, 'proximo': None}
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _filtros_veiculos(filtro_status, marca):
+        return {
+            'status': filtro_status if filtro_status != 'Todos' else None,
+            'marca': f"%{marca.lower()}%" if marca else None,
+        }
+
+    def get_veiculos_pagina(self, filtro_status=None, marca=None, limite=20, cursor=None, direcao='proximos'):
+        """Uma página de veículos, mais recentes primeiro"""
+        return self._pagina('veiculos.listar', self._filtros_veiculos(filtro_status, marca), limite, cursor, direcao)
     
     def add_veiculo(self, veiculo_data):
         """Adiciona veículo com tratamento robusto de erros"""
@@ -1336,7 +923,6 @@ class Database:
         print(f"📦 Dados recebidos: {veiculo_data}")
         
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         # Calcular preço de venda
         preco_venda = veiculo_data['preco_venda']
@@ -1346,44 +932,24 @@ class Database:
         print(f"💰 Margem: {margem}% | Preço venda: R$ {preco_venda:,.2f}")
         
         try:
-            # VERIFICAR qual banco estamos usando
-            usando_postgres = os.getenv('DATABASE_URL') is not None
-            print(f"🗄️  Banco: {'PostgreSQL' if usando_postgres else 'SQLite'}")
-            
-            if usando_postgres:
-                # ✅ PostgreSQL
-                cursor.execute('''
-                    INSERT INTO veiculos 
-                    (modelo, ano, marca, cor, preco_entrada, preco_venda, fornecedor, km, placa, chassi, renavam, combustivel, cambio, portas, observacoes, margem_negociacao)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (
-                    veiculo_data['modelo'], veiculo_data['ano'], veiculo_data['marca'],
-                    veiculo_data['cor'], veiculo_data['preco_entrada'], preco_venda,
-                    veiculo_data['fornecedor'], veiculo_data['km'], veiculo_data['placa'],
-                    veiculo_data['chassi'], veiculo_data.get('renavam', ''),
-                    veiculo_data['combustivel'], veiculo_data['cambio'],
-                    veiculo_data['portas'], veiculo_data['observacoes'], margem
-                ))
-                veiculo_id = cursor.fetchone()[0]
-                print(f"✅ PostgreSQL - Veículo cadastrado com ID: {veiculo_id}")
-            else:
-                # ✅ SQLite
-                cursor.execute('''
-                    INSERT INTO veiculos 
-                    (modelo, ano, marca, cor, preco_entrada, preco_venda, fornecedor, km, placa, chassi, renavam, combustivel, cambio, portas, observacoes, margem_negociacao)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    veiculo_data['modelo'], veiculo_data['ano'], veiculo_data['marca'],
-                    veiculo_data['cor'], veiculo_data['preco_entrada'], preco_venda,
-                    veiculo_data['fornecedor'], veiculo_data['km'], veiculo_data['placa'],
-                    veiculo_data['chassi'], veiculo_data['combustivel'], veiculo_data['cambio'],
-                    veiculo_data['portas'], veiculo_data['observacoes'], margem
-                ))
-                veiculo_id = cursor.lastrowid
-                print(f"✅ SQLite - Veículo cadastrado com ID: {veiculo_id}")
+            print(f"🗄️  Banco: {'PostgreSQL' if self.dialeto == 'postgres' else 'SQLite'}")
+            
+            veiculo_id = self.sql.inserir(conn, 'veiculos.inserir', (
+                veiculo_data['modelo'], veiculo_data['ano'], veiculo_data['marca'],
+                veiculo_data['cor'], veiculo_data['preco_entrada'], preco_venda,
+                veiculo_data['fornecedor'], veiculo_data['km'], veiculo_data['placa'],
+                veiculo_data['chassi'], veiculo_data.get('renavam', ''),
+                veiculo_data['combustivel'], veiculo_data['cambio'],
+                veiculo_data['portas'], veiculo_data['observacoes'], margem
+            ))
+            print(f"✅ Veículo cadastrado com ID: {veiculo_id}")
+            kpi_snapshot.ajustar(self.sql, conn, kpi_snapshot.somar(
+                {'veiculos_total': 1},
+                kpi_snapshot.delta_status(None, 'Em estoque', veiculo_data['preco_entrada'])
+            ))
             
             conn.commit()
+            self.invalidar('veiculos')
             print("💾 Commit realizado com sucesso!")
             return veiculo_id
             
@@ -1396,61 +962,38 @@ class Database:
     
     def update_veiculo_status(self, veiculo_id, status):
         conn = self.get_connection()
-        cursor = conn.cursor()
         
-        if os.getenv('DATABASE_URL'):
-            cursor.execute('UPDATE veiculos SET status = %s WHERE id = %s', (status, veiculo_id))
-        else:
-            cursor.execute('UPDATE veiculos SET status = ? WHERE id = ?', (status, veiculo_id))
+        atual = self.sql.buscar_um(conn, 'veiculos.status_e_preco', (veiculo_id,))
+        self.sql.executar(conn, 'veiculos.atualizar_status', (status, veiculo_id))
+        if atual:
+            kpi_snapshot.ajustar(self.sql, conn, kpi_snapshot.delta_status(atual[0], status, atual[1]))
             
         conn.commit()
+        self.invalidar('veiculos')
         conn.close()
         return True
     
     def update_veiculo(self, veiculo_id, veiculo_data):
         """Atualiza os dados de um veículo existente - suporta SQLite e PostgreSQL"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            usando_postgres = os.getenv('DATABASE_URL') is not None
-            
-            if usando_postgres:
-                cursor.execute('''
-                    UPDATE veiculos SET
-                        modelo = %s, ano = %s, marca = %s, cor = %s,
-                        preco_entrada = %s, preco_venda = %s, margem_negociacao = %s,
-                        fornecedor = %s, km = %s, placa = %s, chassi = %s,
-                        combustivel = %s, cambio = %s, portas = %s, observacoes = %s
-                    WHERE id = %s
-                ''', (
-                    veiculo_data['modelo'], veiculo_data['ano'], veiculo_data['marca'],
-                    veiculo_data['cor'], veiculo_data['preco_entrada'], veiculo_data['preco_venda'],
-                    veiculo_data.get('margem_negociacao', 15),
-                    veiculo_data['fornecedor'], veiculo_data['km'], veiculo_data['placa'],
-                    veiculo_data['chassi'], veiculo_data['combustivel'], veiculo_data['cambio'],
-                    veiculo_data['portas'], veiculo_data['observacoes'],
-                    veiculo_id
-                ))
-            else:
-                cursor.execute('''
-                    UPDATE veiculos SET
-                        modelo = ?, ano = ?, marca = ?, cor = ?,
-                        preco_entrada = ?, preco_venda = ?, margem_negociacao = ?,
-                        fornecedor = ?, km = ?, placa = ?, chassi = ?,
-                        combustivel = ?, cambio = ?, portas = ?, observacoes = ?
-                    WHERE id = ?
-                ''', (
-                    veiculo_data['modelo'], veiculo_data['ano'], veiculo_data['marca'],
-                    veiculo_data['cor'], veiculo_data['preco_entrada'], veiculo_data['preco_venda'],
-                    veiculo_data.get('margem_negociacao', 15),
-                    veiculo_data['fornecedor'], veiculo_data['km'], veiculo_data['placa'],
-                    veiculo_data['chassi'], veiculo_data['combustivel'], veiculo_data['cambio'],
-                    veiculo_data['portas'], veiculo_data['observacoes'],
-                    veiculo_id
-                ))
+            atual = self.sql.buscar_um(conn, 'veiculos.status_e_preco', (veiculo_id,))
+            self.sql.executar(conn, 'veiculos.atualizar', (
+                veiculo_data['modelo'], veiculo_data['ano'], veiculo_data['marca'],
+                veiculo_data['cor'], veiculo_data['preco_entrada'], veiculo_data['preco_venda'],
+                veiculo_data.get('margem_negociacao', 15),
+                veiculo_data['fornecedor'], veiculo_data['km'], veiculo_data['placa'],
+                veiculo_data['chassi'], veiculo_data['combustivel'], veiculo_data['cambio'],
+                veiculo_data['portas'], veiculo_data['observacoes'],
+                veiculo_id
+            ))
+            # Preço de compra alterado muda o capital empatado no estoque
+            if atual and atual[0] == 'Em estoque':
+                kpi_snapshot.ajustar(self.sql, conn, {'capital_estoque': veiculo_data['preco_entrada'] - (atual[1] or 0)})
             
             conn.commit()
+            self.invalidar('veiculos')
             print(f"✅ Veículo {veiculo_id} atualizado com sucesso!")
             return True
             
@@ -1461,34 +1004,41 @@ class Database:
         finally:
             conn.close()
 
+    def get_veiculos_com_custos(self, filtro_status=None):
+        """Veículos com total de gastos, custo total e margem atual calculados em uma única consulta"""
+        conn = self.get_connection()
+        
+        try:
+            status = filtro_status if filtro_status != 'Todos' else None
+            return self._calcular_margem(self.sql.listar_filtrado(conn, 'veiculos.listar_com_custos', {'status': status}))
+            
+        except Exception as e:
+            print(f"❌ Erro ao buscar veículos com custos: {e}")
+            return []
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _calcular_margem(veiculos):
+        for veiculo in veiculos:
+            custo_total = veiculo['custo_total'] or 0
+            veiculo['margem_atual'] = ((veiculo['preco_venda'] - custo_total) / custo_total * 100) if custo_total > 0 else 0
+        return veiculos
+
+    def get_veiculos_com_custos_pagina(self, filtro_status=None, marca=None, limite=20, cursor=None, direcao='proximos'):
+        """Uma página de get_veiculos_com_custos, mais recentes primeiro"""
+        pagina = self._pagina('veiculos.listar_com_custos', self._filtros_veiculos(filtro_status, marca),
+                              limite, cursor, direcao)
+        self._calcular_margem(pagina['itens'])
+        return pagina
+
     # Métodos para gastos
     def get_gastos(self, veiculo_id=None):
         """Busca gastos - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            query = '''
-                SELECT g.*, v.marca, v.modelo 
-                FROM gastos g 
-                LEFT JOIN veiculos v ON g.veiculo_id = v.id
-            '''
-            
-            if veiculo_id:
-                query += f' WHERE g.veiculo_id = {veiculo_id}'
-            
-            query += ' ORDER BY g.data DESC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            gastos = []
-            for row in resultados:
-                gasto = dict(zip(colunas, row))
-                gastos.append(gasto)
-            
-            return gastos
+            return self.sql.listar_filtrado(conn, 'gastos.listar', {'veiculo_id': veiculo_id})
             
         except Exception as e:
             print(f"❌ Erro ao buscar gastos: {e}")
@@ -1498,26 +1048,15 @@ class Database:
     
     def add_gasto(self, gasto_data):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if os.getenv('DATABASE_URL'):
-            cursor.execute('''
-                INSERT INTO gastos (veiculo_id, tipo_gasto, valor, data, descricao, categoria)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (
-                gasto_data['veiculo_id'], gasto_data['tipo_gasto'], gasto_data['valor'],
-                gasto_data['data'], gasto_data['descricao'], gasto_data.get('categoria', 'Outros')
-            ))
-        else:
-            cursor.execute('''
-                INSERT INTO gastos (veiculo_id, tipo_gasto, valor, data, descricao, categoria)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                gasto_data['veiculo_id'], gasto_data['tipo_gasto'], gasto_data['valor'],
-                gasto_data['data'], gasto_data['descricao'], gasto_data.get('categoria', 'Outros')
-            ))
+        
+        self.sql.executar(conn, 'gastos.inserir', (
+            gasto_data['veiculo_id'], gasto_data['tipo_gasto'], gasto_data['valor'],
+            gasto_data['data'], gasto_data['descricao'], gasto_data.get('categoria', 'Outros')
+        ))
+        kpi_snapshot.ajustar(self.sql, conn, {'despesas': gasto_data['valor']})
         
         conn.commit()
+        self.invalidar('gastos')
         conn.close()
         return True
     
@@ -1525,75 +1064,41 @@ class Database:
     def get_vendas(self):
         """Busca vendas - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            query = '''
-                SELECT 
-                    v.id,
-                    v.veiculo_id,
-                    v.comprador_nome,
-                    v.comprador_cpf,
-                    v.comprador_endereco,
-                    v.valor_venda,
-                    v.data_venda,
-                    v.contrato_path,
-                    v.status,
-                    vei.marca,
-                    vei.modelo, 
-                    vei.ano, 
-                    vei.cor
-                FROM vendas v 
-                LEFT JOIN veiculos vei ON v.veiculo_id = vei.id 
-                ORDER BY v.data_venda DESC
-            '''
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            vendas = []
-            for row in resultados:
-                venda = dict(zip(colunas, row))
-                vendas.append(venda)
-            
-            return vendas
+            return self.sql.listar_filtrado(conn, 'vendas.listar', {})
             
         except Exception as e:
             print(f"❌ Erro ao buscar vendas: {e}")
             return []
         finally:
             conn.close()
+
+    def get_historico_vendas_pagina(self, limite=20, cursor=None, direcao='proximos'):
+        """Uma página de vendas, mais recentes primeiro, com tipo_pagamento, num_parcelas
+        e valor_entrada do financiamento do veículo (LEFT JOIN - À Vista quando não há)"""
+        return self._pagina('vendas.historico', {}, limite, cursor, direcao)
     
     def add_venda(self, venda_data):
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('''
-                    INSERT INTO vendas (veiculo_id, comprador_nome, comprador_cpf, comprador_endereco, valor_venda, contrato_path)
-                    VALUES (%s, %s, %s, %s, %s, %s)
-                ''', (
-                    venda_data['veiculo_id'], venda_data['comprador_nome'], venda_data['comprador_cpf'],
-                    venda_data['comprador_endereco'], venda_data['valor_venda'], venda_data.get('contrato_path')
-                ))
-            else:
-                cursor.execute('''
-                    INSERT INTO vendas (veiculo_id, comprador_nome, comprador_cpf, comprador_endereco, valor_venda, contrato_path)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                ''', (
-                    venda_data['veiculo_id'], venda_data['comprador_nome'], venda_data['comprador_cpf'],
-                    venda_data['comprador_endereco'], venda_data['valor_venda'], venda_data.get('contrato_path')
-                ))
+            atual = self.sql.buscar_um(conn, 'veiculos.status_e_preco', (venda_data['veiculo_id'],))
+            self.sql.executar(conn, 'vendas.inserir', (
+                venda_data['veiculo_id'], venda_data['comprador_nome'], venda_data['comprador_cpf'],
+                venda_data['comprador_endereco'], venda_data['valor_venda'], venda_data.get('contrato_path')
+            ))
             
             # ✅ CORREÇÃO CRÍTICA: Atualizar status do veículo para Vendido
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('UPDATE veiculos SET status = %s WHERE id = %s', ('Vendido', venda_data['veiculo_id']))
-            else:
-                cursor.execute('UPDATE veiculos SET status = ? WHERE id = ?', ('Vendido', venda_data['veiculo_id']))
+            self.sql.executar(conn, 'veiculos.atualizar_status', ('Vendido', venda_data['veiculo_id']))
+            
+            kpi_snapshot.ajustar(self.sql, conn, kpi_snapshot.somar(
+                {'receitas': venda_data['valor_venda'], 'qtd_vendas': 1},
+                kpi_snapshot.delta_status(atual[0], 'Vendido', atual[1]) if atual else {}
+            ))
             
             conn.commit()
+            self.invalidar('vendas', 'veiculos')
             return True
             
         except Exception as e:
@@ -1605,61 +1110,55 @@ class Database:
     
     # Métodos para documentos
     def get_documentos(self, veiculo_id=None):
-        """Busca documentos - VERSÃO CORRIGIDA"""
+        """Lista só os metadados dos documentos (sem o arquivo)"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            query = '''
-                SELECT d.*, v.marca, v.modelo 
-                FROM documentos d 
-                LEFT JOIN veiculos v ON d.veiculo_id = v.id
-            '''
-            if veiculo_id:
-                query += f' WHERE d.veiculo_id = {veiculo_id}'
-            query += ' ORDER BY d.data_upload DESC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            documentos = []
-            for row in resultados:
-                documento = dict(zip(colunas, row))
-                documentos.append(documento)
-            
-            return documentos
+            return self.sql.listar_filtrado(conn, 'documentos.listar', {'veiculo_id': veiculo_id})
             
         except Exception as e:
             print(f"❌ Erro ao buscar documentos: {e}")
             return []
         finally:
             conn.close()
+
+    def get_documentos_pagina(self, veiculo_id=None, limite=20, cursor=None, direcao='proximos'):
+        """Uma página dos metadados dos documentos, mais recentes primeiro"""
+        return self._pagina('documentos.listar', {'veiculo_id': veiculo_id}, limite, cursor, direcao)
+    
+    def get_documento_arquivo(self, documento_id):
+        """Busca o arquivo de um documento - só na hora do download.
+        'arquivo' vem aberto para leitura em partes; quem chama fecha."""
+        conn = self.get_connection()
+        
+        try:
+            documentos = self.sql.listar(conn, 'documentos.arquivo', (documento_id,))
+            if not documentos or not documentos[0]['arquivo_hash']:
+                return None
+            documento = documentos[0]
+            documento['arquivo'] = self.armazenamento.abrir(documento['arquivo_hash'])
+            return documento
+            
+        except Exception as e:
+            print(f"❌ Erro ao buscar arquivo do documento: {e}")
+            return None
+        finally:
+            conn.close()
     
     def add_documento(self, documento_data):
+        # 'arquivo' pode ser bytes ou o arquivo enviado (lido em partes)
+        arquivo = documento_data['arquivo']
+        blob = self.armazenamento.salvar(arquivo, getattr(arquivo, 'name', None))
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if os.getenv('DATABASE_URL'):
-            cursor.execute('''
-                INSERT INTO documentos (veiculo_id, nome_documento, tipo_documento, arquivo, observacoes)
-                VALUES (%s, %s, %s, %s, %s)
-            ''', (
-                documento_data['veiculo_id'], documento_data['nome_documento'], 
-                documento_data['tipo_documento'], documento_data['arquivo'],
-                documento_data.get('observacoes', '')
-            ))
-        else:
-            cursor.execute('''
-                INSERT INTO documentos (veiculo_id, nome_documento, tipo_documento, arquivo, observacoes)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (
-                documento_data['veiculo_id'], documento_data['nome_documento'], 
-                documento_data['tipo_documento'], documento_data['arquivo'],
-                documento_data.get('observacoes', '')
-            ))
+        
+        self.sql.executar(conn, 'documentos.inserir', (
+            documento_data['veiculo_id'], documento_data['nome_documento'], 
+            documento_data['tipo_documento'], blob.hash, blob.tamanho, blob.mime,
+            documento_data.get('observacoes', '')
+        ))
         
         conn.commit()
+        self.invalidar('documentos')
         conn.close()
         return True
     
@@ -1667,66 +1166,47 @@ class Database:
     def get_fluxo_caixa(self, data_inicio=None, data_fim=None):
         """Busca fluxo de caixa - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            query = '''
-                SELECT fc.*, v.marca, v.modelo 
-                FROM fluxo_caixa fc 
-                LEFT JOIN veiculos v ON fc.veiculo_id = v.id
-            '''
-            conditions = []
-            if data_inicio:
-                conditions.append(f"fc.data >= '{data_inicio}'")
-            if data_fim:
-                conditions.append(f"fc.data <= '{data_fim}'")
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            query += ' ORDER BY fc.data DESC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            fluxo = []
-            for row in resultados:
-                item = dict(zip(colunas, row))
-                fluxo.append(item)
-            
-            return fluxo
+            return self.sql.listar_filtrado(conn, 'fluxo_caixa.listar', self._filtros_periodo(data_inicio, data_fim))
             
         except Exception as e:
             print(f"❌ Erro ao buscar fluxo de caixa: {e}")
             return []
         finally:
             conn.close()
+
+    @staticmethod
+    def _filtros_periodo(data_inicio, data_fim):
+        return {
+            'data_inicio': str(data_inicio) if data_inicio else None,
+            'data_fim': str(data_fim) if data_fim else None,
+        }
+
+    def get_fluxo_caixa_pagina(self, data_inicio=None, data_fim=None, limite=20, cursor=None, direcao='proximos'):
+        """Uma página das movimentações do período, mais recentes primeiro"""
+        return self._pagina('fluxo_caixa.listar', self._filtros_periodo(data_inicio, data_fim), limite, cursor, direcao)
+
+    def get_resumo_fluxo_caixa(self, data_inicio, data_fim):
+        """Entradas, saídas e quantidade de movimentações do período"""
+        linhas = self._listar_agregado('fluxo_caixa.resumo_periodo', (str(data_inicio), str(data_fim)))
+        if linhas:
+            return linhas[0]
+        return {'entradas': 0, 'saidas': 0, 'qtd': 0}
     
     def add_fluxo_caixa(self, fluxo_data):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if os.getenv('DATABASE_URL'):
-            cursor.execute('''
-                INSERT INTO fluxo_caixa (data, descricao, tipo, categoria, valor, veiculo_id, status)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                fluxo_data['data'], fluxo_data['descricao'], fluxo_data['tipo'],
-                fluxo_data['categoria'], fluxo_data['valor'], 
-                fluxo_data.get('veiculo_id'), fluxo_data.get('status', 'Pendente')
-            ))
-        else:
-            cursor.execute('''
-                INSERT INTO fluxo_caixa (data, descricao, tipo, categoria, valor, veiculo_id, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                fluxo_data['data'], fluxo_data['descricao'], fluxo_data['tipo'],
-                fluxo_data['categoria'], fluxo_data['valor'], 
-                fluxo_data.get('veiculo_id'), fluxo_data.get('status', 'Pendente')
-            ))
+        
+        self.sql.executar(conn, 'fluxo_caixa.inserir', (
+            fluxo_data['data'], fluxo_data['descricao'], fluxo_data['tipo'],
+            fluxo_data['categoria'], fluxo_data['valor'], 
+            fluxo_data.get('veiculo_id'), fluxo_data.get('status', 'Pendente')
+        ))
+        if fluxo_data['tipo'] == 'Saída' and fluxo_data['categoria'] != 'Vendas':
+            kpi_snapshot.ajustar(self.sql, conn, {'outras_despesas': fluxo_data['valor']})
         
         conn.commit()
+        self.invalidar('fluxo_caixa')
         conn.close()
         return True
     
@@ -1734,52 +1214,31 @@ class Database:
     def get_contatos(self):
         """Busca contatos - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            query = 'SELECT * FROM contatos ORDER BY data_contato DESC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            contatos = []
-            for row in resultados:
-                contato = dict(zip(colunas, row))
-                contatos.append(contato)
-            
-            return contatos
+            return self.sql.listar_filtrado(conn, 'contatos.listar', {})
             
         except Exception as e:
             print(f"❌ Erro ao buscar contatos: {e}")
             return []
         finally:
             conn.close()
+
+    def get_contatos_pagina(self, limite=20, cursor=None, direcao='proximos'):
+        """Uma página de contatos, mais recentes primeiro"""
+        return self._pagina('contatos.listar', {}, limite, cursor, direcao)
     
     def add_contato(self, contato_data):
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if os.getenv('DATABASE_URL'):
-            cursor.execute('''
-                INSERT INTO contatos (nome, telefone, email, tipo, veiculo_interesse, data_contato, observacoes)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ''', (
-                contato_data['nome'], contato_data.get('telefone'), contato_data.get('email'),
-                contato_data['tipo'], contato_data.get('veiculo_interesse'), 
-                contato_data.get('data_contato'), contato_data.get('observacoes')
-            ))
-        else:
-            cursor.execute('''
-                INSERT INTO contatos (nome, telefone, email, tipo, veiculo_interesse, data_contato, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                contato_data['nome'], contato_data.get('telefone'), contato_data.get('email'),
-                contato_data['tipo'], contato_data.get('veiculo_interesse'), 
-                contato_data.get('data_contato'), contato_data.get('observacoes')
-            ))
+        
+        self.sql.executar(conn, 'contatos.inserir', (
+            contato_data['nome'], contato_data.get('telefone'), contato_data.get('email'),
+            contato_data['tipo'], contato_data.get('veiculo_interesse'), 
+            contato_data.get('data_contato'), contato_data.get('observacoes')
+        ))
         
         conn.commit()
+        self.invalidar('contatos')
         conn.close()
         return True
         
@@ -1788,22 +1247,13 @@ class Database:
     def verificar_login(self, username, password):
         """Verifica login - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        # Verificar se estamos usando PostgreSQL
-        usando_postgres = os.getenv('DATABASE_URL') is not None
         
         print(f"🔐 MÉTODO verificar_login CHAMADO:")
         print(f"   Username: '{username}'")
-        print(f"   Banco: {'PostgreSQL' if usando_postgres else 'SQLite'}")
+        print(f"   Banco: {'PostgreSQL' if self.dialeto == 'postgres' else 'SQLite'}")
         
         try:
-            if usando_postgres:
-                cursor.execute('SELECT * FROM usuarios WHERE username = %s', (username,))
-            else:
-                cursor.execute('SELECT * FROM usuarios WHERE username = ?', (username,))
-            
-            usuario = cursor.fetchone()
+            usuario = self.sql.buscar_um(conn, 'usuarios.por_username', (username,))
             
             if usuario:
                 print(f"✅ Usuário encontrado no banco: {usuario[1]}")
@@ -1831,73 +1281,62 @@ class Database:
             return None
         finally:
             conn.close()
+
+    def update_senha(self, usuario_id, nova_senha):
+        """Grava o hash da nova senha do usuário"""
+        conn = self.get_connection()
+        
+        try:
+            self.sql.executar(conn, 'usuarios.atualizar_senha', (hash_password(nova_senha), usuario_id))
+            conn.commit()
+            self.invalidar('usuarios')
+            return True
+        except Exception as e:
+            print(f"❌ Erro ao alterar senha: {e}")
+            conn.rollback()
+            return False
+        finally:
+            conn.close()
+
     # Métodos para financiamentos
     def add_financiamento(self, financiamento_data):
         """Adiciona financiamento e marca veículo como VENDIDO"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('''
-                    INSERT INTO financiamentos 
-                    (veiculo_id, tipo_financiamento, valor_total, valor_entrada, num_parcelas, data_contrato, observacoes)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                ''', (
-                    financiamento_data['veiculo_id'],
-                    financiamento_data['tipo_financiamento'],
-                    financiamento_data['valor_total'],
-                    financiamento_data.get('valor_entrada', 0),
-                    financiamento_data.get('num_parcelas', 1),
-                    financiamento_data.get('data_contrato'),
-                    financiamento_data.get('observacoes', '')
-                ))
-                financiamento_id = cursor.fetchone()[0]
-            else:
-                cursor.execute('''
-                    INSERT INTO financiamentos 
-                    (veiculo_id, tipo_financiamento, valor_total, valor_entrada, num_parcelas, data_contrato, observacoes)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    financiamento_data['veiculo_id'],
-                    financiamento_data['tipo_financiamento'],
-                    financiamento_data['valor_total'],
-                    financiamento_data.get('valor_entrada', 0),
-                    financiamento_data.get('num_parcelas', 1),
-                    financiamento_data.get('data_contrato'),
-                    financiamento_data.get('observacoes', '')
-                ))
-                financiamento_id = cursor.lastrowid
+            atual = self.sql.buscar_um(conn, 'veiculos.status_e_preco', (financiamento_data['veiculo_id'],))
+            financiamento_id = self.sql.inserir(conn, 'financiamentos.inserir', (
+                financiamento_data['veiculo_id'],
+                financiamento_data['tipo_financiamento'],
+                financiamento_data['valor_total'],
+                financiamento_data.get('valor_entrada', 0),
+                financiamento_data.get('num_parcelas', 1),
+                financiamento_data.get('data_contrato'),
+                financiamento_data.get('observacoes', '')
+            ))
             
             # ✅ CORREÇÃO CRÍTICA: Atualizar status do veículo para VENDIDO
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('UPDATE veiculos SET status = %s WHERE id = %s', 
-                             ('Vendido', financiamento_data['veiculo_id']))
-            else:
-                cursor.execute('UPDATE veiculos SET status = ? WHERE id = ?', 
-                             ('Vendido', financiamento_data['veiculo_id']))
+            self.sql.executar(conn, 'veiculos.atualizar_status', ('Vendido', financiamento_data['veiculo_id']))
+            deltas = kpi_snapshot.delta_status(atual[0], 'Vendido', atual[1]) if atual else {}
             
-            # Criar parcelas automaticamente se for parcelado
+            # Criar parcelas automaticamente se for parcelado - cronograma inteiro em um INSERT
             if financiamento_data.get('num_parcelas', 1) > 1:
-                valor_parcela = (financiamento_data['valor_total'] - financiamento_data.get('valor_entrada', 0)) / financiamento_data['num_parcelas']
-                data_contrato = datetime.datetime.strptime(financiamento_data['data_contrato'], '%Y-%m-%d') if isinstance(financiamento_data['data_contrato'], str) else financiamento_data['data_contrato']
+                parcelas = cronograma_parcelas.gerar(
+                    financiamento_id,
+                    financiamento_data['valor_total'] - financiamento_data.get('valor_entrada', 0),
+                    financiamento_data['num_parcelas'],
+                    financiamento_data['data_contrato'],
+                )
+                self.sql.inserir_lote(conn, 'parcelas.inserir_lote', parcelas)
                 
-                for i in range(financiamento_data['num_parcelas']):
-                    data_vencimento = data_contrato + datetime.timedelta(days=30*(i+1))
-                    
-                    if os.getenv('DATABASE_URL'):
-                        cursor.execute('''
-                            INSERT INTO parcelas (financiamento_id, numero_parcela, valor_parcela, data_vencimento)
-                            VALUES (%s, %s, %s, %s)
-                        ''', (financiamento_id, i+1, valor_parcela, data_vencimento))
-                    else:
-                        cursor.execute('''
-                            INSERT INTO parcelas (financiamento_id, numero_parcela, valor_parcela, data_vencimento)
-                            VALUES (?, ?, ?, ?)
-                        ''', (financiamento_id, i+1, valor_parcela, data_vencimento))
+                deltas = kpi_snapshot.somar(deltas, {
+                    'total_pendente': sum(parcela[2] for parcela in parcelas),
+                    'parcelas_pendentes': len(parcelas),
+                })
             
+            kpi_snapshot.ajustar(self.sql, conn, deltas)
             conn.commit()
+            self.invalidar('financiamentos', 'parcelas', 'veiculos')
             return financiamento_id
             
         except Exception as e:
@@ -1910,47 +1349,9 @@ class Database:
     def get_financiamentos(self, veiculo_id=None):
         """Busca financiamentos - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            # Verificar se estamos usando PostgreSQL
-            usando_postgres = os.getenv('DATABASE_URL') is not None
-            
-            query = '''
-                SELECT f.*, v.marca, v.modelo, v.ano, v.placa,
-            '''
-            
-            if usando_postgres:
-                query += '''
-                    (SELECT COUNT(*) FROM parcelas p WHERE p.financiamento_id = f.id AND p.status = 'Pendente') as parcelas_pendentes,
-                    (SELECT SUM(p.valor_parcela) FROM parcelas p WHERE p.financiamento_id = f.id AND p.status = 'Pendente') as total_pendente
-                '''
-            else:
-                query += '''
-                    (SELECT COUNT(*) FROM parcelas p WHERE p.financiamento_id = f.id AND p.status = "Pendente") as parcelas_pendentes,
-                    (SELECT SUM(p.valor_parcela) FROM parcelas p WHERE p.financiamento_id = f.id AND p.status = "Pendente") as total_pendente
-                '''
-            
-            query += '''
-                FROM financiamentos f
-                LEFT JOIN veiculos v ON f.veiculo_id = v.id
-            '''
-            
-            if veiculo_id:
-                query += f' WHERE f.veiculo_id = {veiculo_id}'
-            
-            query += ' ORDER BY f.data_contrato DESC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            financiamentos = []
-            for row in resultados:
-                financiamento = dict(zip(colunas, row))
-                financiamentos.append(financiamento)
-            
-            return financiamentos
+            return self.sql.listar_filtrado(conn, 'financiamentos.listar', {'veiculo_id': veiculo_id})
             
         except Exception as e:
             print(f"❌ Erro ao buscar financiamentos: {e}")
@@ -1961,43 +1362,12 @@ class Database:
     def get_parcelas(self, financiamento_id=None, status=None):
         """Busca parcelas - VERSÃO CORRIGIDA"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            # Verificar se estamos usando PostgreSQL
-            usando_postgres = os.getenv('DATABASE_URL') is not None
-            
-            query = '''
-                SELECT p.*, f.tipo_financiamento, v.marca, v.modelo
-                FROM parcelas p
-                LEFT JOIN financiamentos f ON p.financiamento_id = f.id
-                LEFT JOIN veiculos v ON f.veiculo_id = v.id
-            '''
-            
-            conditions = []
-            if financiamento_id:
-                conditions.append(f"p.financiamento_id = {financiamento_id}")
-            if status:
-                if usando_postgres:
-                    conditions.append(f"p.status = '{status}'")
-                else:
-                    conditions.append(f'p.status = "{status}"')
-            
-            if conditions:
-                query += " WHERE " + " AND ".join(conditions)
-            
-            query += ' ORDER BY p.data_vencimento ASC'
-            
-            cursor.execute(query)
-            colunas = [desc[0] for desc in cursor.description]
-            resultados = cursor.fetchall()
-            
-            parcelas = []
-            for row in resultados:
-                parcela = dict(zip(colunas, row))
-                parcelas.append(parcela)
-            
-            return parcelas
+            return self.sql.listar_filtrado(conn, 'parcelas.listar', {
+                'financiamento_id': financiamento_id,
+                'status': status,
+            })
             
         except Exception as e:
             print(f"❌ Erro ao buscar parcelas: {e}")
@@ -2005,28 +1375,33 @@ class Database:
         finally:
             conn.close()
 
+    def get_parcelas_pagina(self, financiamento_id=None, status=None, vencimento_antes=None, vencimento_ate=None,
+                            limite=20, cursor=None, direcao='proximos'):
+        """Uma página de parcelas, vencimento mais próximo primeiro"""
+        return self._pagina('parcelas.listar', {
+            'financiamento_id': financiamento_id,
+            'status': status,
+            'vencimento_antes': str(vencimento_antes) if vencimento_antes else None,
+            'vencimento_ate': str(vencimento_ate) if vencimento_ate else None,
+        }, limite, cursor, direcao)
+
     def update_parcela_status(self, parcela_id, status, data_pagamento=None, forma_pagamento=None):
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
-            # Verificar se estamos usando PostgreSQL
-            usando_postgres = os.getenv('DATABASE_URL') is not None
-            
-            if usando_postgres:
-                cursor.execute('''
-                    UPDATE parcelas 
-                    SET status = %s, data_pagamento = %s, forma_pagamento = %s
-                    WHERE id = %s
-                ''', (status, data_pagamento, forma_pagamento, parcela_id))
-            else:
-                cursor.execute('''
-                    UPDATE parcelas 
-                    SET status = ?, data_pagamento = ?, forma_pagamento = ?
-                    WHERE id = ?
-                ''', (status, data_pagamento, forma_pagamento, parcela_id))
+            atual = self.sql.buscar_um(conn, 'parcelas.status_e_valor', (parcela_id,))
+            self.sql.executar(conn, 'parcelas.atualizar_status', (status, data_pagamento, forma_pagamento, parcela_id))
+            
+            # Parcela entrando ou saindo de 'Pendente' move o total a receber
+            if atual and (atual[0] == 'Pendente') != (status == 'Pendente'):
+                sinal = 1 if status == 'Pendente' else -1
+                kpi_snapshot.ajustar(self.sql, conn, {
+                    'total_pendente': sinal * (atual[1] or 0),
+                    'parcelas_pendentes': sinal,
+                })
             
             conn.commit()
+            self.invalidar('parcelas')
             return True
             
         except Exception as e:
@@ -2038,70 +1413,52 @@ class Database:
 
     # Método para documentos financeiros
     def add_documento_financeiro(self, documento_data):
+        blob = self.armazenamento.salvar(documento_data['arquivo'], documento_data['nome_arquivo'])
         conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        if os.getenv('DATABASE_URL'):
-            cursor.execute('''
-                INSERT INTO documentos_financeiros 
-                (veiculo_id, financiamento_id, tipo_documento, nome_arquivo, arquivo, observacoes)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (
-                documento_data.get('veiculo_id'),
-                documento_data.get('financiamento_id'),
-                documento_data['tipo_documento'],
-                documento_data['nome_arquivo'],
-                documento_data['arquivo'],
-                documento_data.get('observacoes', '')
-            ))
-        else:
-            cursor.execute('''
-                INSERT INTO documentos_financeiros 
-                (veiculo_id, financiamento_id, tipo_documento, nome_arquivo, arquivo, observacoes)
-                VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                documento_data.get('veiculo_id'),
-                documento_data.get('financiamento_id'),
-                documento_data['tipo_documento'],
-                documento_data['nome_arquivo'],
-                documento_data['arquivo'],
-                documento_data.get('observacoes', '')
-            ))
+        
+        # arquivo é NOT NULL no schema antigo: fica vazio, o conteúdo está no armazenamento
+        self.sql.executar(conn, 'documentos_financeiros.inserir', (
+            documento_data.get('veiculo_id'),
+            documento_data.get('financiamento_id'),
+            documento_data['tipo_documento'],
+            documento_data['nome_arquivo'],
+            b'',
+            blob.hash, blob.tamanho, blob.mime,
+            documento_data.get('observacoes', '')
+        ))
         
         conn.commit()
+        self.invalidar('documentos_financeiros')
         conn.close()
         return True
     
     def delete_veiculo(self, veiculo_id):
         """Exclui um veículo e seus registros relacionados"""
         conn = self.get_connection()
-        cursor = conn.cursor()
         
         try:
             # Primeiro verificar se o veículo existe e não foi vendido
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('SELECT status FROM veiculos WHERE id = %s', (veiculo_id,))
-            else:
-                cursor.execute('SELECT status FROM veiculos WHERE id = ?', (veiculo_id,))
-            
-            resultado = cursor.fetchone()
+            resultado = self.sql.buscar_um(conn, 'veiculos.status_e_preco', (veiculo_id,))
             if not resultado:
                 return False, "Veículo não encontrado"
             
             if resultado[0] == 'Vendido':
                 return False, "Não é possível excluir veículos vendidos"
             
+            total_gastos = self.sql.buscar_um(conn, 'gastos.total_do_veiculo', (veiculo_id,))[0]
+            
             # Excluir registros relacionados
-            if os.getenv('DATABASE_URL'):
-                cursor.execute('DELETE FROM gastos WHERE veiculo_id = %s', (veiculo_id,))
-                cursor.execute('DELETE FROM documentos WHERE veiculo_id = %s', (veiculo_id,))
-                cursor.execute('DELETE FROM veiculos WHERE id = %s', (veiculo_id,))
-            else:
-                cursor.execute('DELETE FROM gastos WHERE veiculo_id = ?', (veiculo_id,))
-                cursor.execute('DELETE FROM documentos WHERE veiculo_id = ?', (veiculo_id,))
-                cursor.execute('DELETE FROM veiculos WHERE id = ?', (veiculo_id,))
+            self.sql.executar(conn, 'gastos.excluir_por_veiculo', (veiculo_id,))
+            self.sql.executar(conn, 'documentos.excluir_por_veiculo', (veiculo_id,))
+            self.sql.executar(conn, 'fotos_variantes.excluir_por_veiculo', (veiculo_id,))
+            self.sql.executar(conn, 'veiculos.excluir', (veiculo_id,))
+            kpi_snapshot.ajustar(self.sql, conn, kpi_snapshot.somar(
+                {'veiculos_total': -1, 'despesas': -(total_gastos or 0)},
+                kpi_snapshot.delta_status(resultado[0], None, resultado[1])
+            ))
             
             conn.commit()
+            self.invalidar('gastos', 'documentos', 'fotos_variantes', 'veiculos')
             return True, "Veículo excluído com sucesso"
             
         except Exception as e:
@@ -2109,44 +1466,124 @@ class Database:
             print(f"Erro ao excluir veículo: {e}")
             return False, f"Erro ao excluir: {str(e)}"
         finally:
-            conn.close()    
-            
+            conn.close()
+
+    def get_estoque_painel(self):
+        """Estoque atual do painel como DataFrame, lido do cursor coluna a coluna"""
+        conn = self.get_connection()
+
+        try:
+            return self.sql.dataframe(conn, 'veiculos.estoque_painel')
+
+        except Exception as e:
+            print(f"❌ Erro ao carregar estoque do painel: {e}")
+            conn.rollback()
+            return pd.DataFrame()
+        finally:
+            conn.close()
+
+    # Agregados do dashboard - SUM/COUNT/GROUP BY feitos no banco
+    def _listar_agregado(self, nome, params=()):
+        conn = self.get_connection()
+
+        try:
+            return self.sql.listar(conn, nome, params)
+
+        except Exception as e:
+            print(f"❌ Erro ao calcular {nome}: {e}")
+            conn.rollback()
+            return []
+        finally:
+            conn.close()
+
+    def get_kpi_snapshot(self):
+        """KPIs materializados em kpi_snapshot - leitura de uma única linha"""
+        conn = self.get_connection()
+
+        try:
+            snapshot = kpi_snapshot.ler(self.sql, conn)
+            if snapshot is None:
+                print("⚠️ kpi_snapshot vazio - calculando do zero")
+                snapshot = kpi_snapshot.calcular(self.sql, conn)
+            return snapshot
+
+        except Exception as e:
+            print(f"❌ Erro ao ler kpi_snapshot: {e}")
+            conn.rollback()
+            return kpi_snapshot.calcular(self.sql, conn)
+        finally:
+            conn.close()
+
+    def get_gastos_por_categoria(self):
+        """{categoria: total} - sem categoria conta como 'Outros'"""
+        return {linha['categoria']: linha['total'] for linha in self._listar_agregado('gastos.por_categoria')}
+
+    def get_gastos_por_veiculo(self):
+        """{veiculo_id: total de gastos}"""
+        return {linha['veiculo_id']: linha['total'] for linha in self._listar_agregado('gastos.por_veiculo')}
+
+    def get_vendas_periodos(self, hoje, dias=30):
+        """Faturamento e quantidade dos últimos `dias` e dos `dias` anteriores"""
+        inicio = hoje - datetime.timedelta(days=dias)
+        inicio_anterior = inicio - datetime.timedelta(days=dias)
+        amanha = hoje + datetime.timedelta(days=1)
+        linhas = self._listar_agregado('vendas.periodos', (
+            str(inicio), str(inicio), str(inicio), str(inicio), str(inicio_anterior), str(amanha)
+        ))
+        if linhas:
+            return linhas[0]
+        return {'faturamento_atual': 0, 'qtd_vendas': 0, 'faturamento_anterior': 0, 'qtd_anterior': 0}
+
+    def get_tempo_medio_giro(self):
+        """Dias médios entre cadastro e venda (só vendas com pelo menos 1 dia)"""
+        linhas = self._listar_agregado('vendas.tempo_medio_giro')
+        return float(next(iter(linhas[0].values())) or 0) if linhas else 0.0
+
+    def get_rentabilidade_vendidos(self):
+        """Lucro, soma das margens e quantidade por marca/modelo dos veículos vendidos"""
+        return self._listar_agregado('vendas.rentabilidade_por_modelo')
+
+    def get_resumo_parcelas_pendentes(self, hoje):
+        """Total pendente, total vencido e atraso médio (dias) das parcelas pendentes"""
+        linhas = self._listar_agregado('parcelas.resumo_pendentes', (str(hoje), str(hoje), str(hoje)))
+        if linhas:
+            return linhas[0]
+        return {'total_pendente': 0, 'total_vencido': 0, 'dias_medio_atraso': None}
+
+    def get_resumo_vencimentos(self, hoje, ate):
+        """Parcelas pendentes: quantas vencidas até hoje, total com vencimento até `ate` e total geral"""
+        linhas = self._listar_agregado('parcelas.resumo_vencimentos', (str(hoje), str(ate)))
+        if linhas:
+            return linhas[0]
+        return {'qtd_vencidas': 0, 'total_ate': 0, 'total_pendente': 0}
+
+    def get_parcelas_pendentes_por_mes(self):
+        """{'AAAA-MM': total} das parcelas pendentes por mês de vencimento"""
+        return {linha['mes']: linha['total'] for linha in self._listar_agregado('parcelas.pendentes_por_mes')}
+
+    def get_totais_financiamentos_ativos(self):
+        """Quantidade e valor total dos financiamentos ativos"""
+        linhas = self._listar_agregado('financiamentos.ativos')
+        return linhas[0] if linhas else {'qtd': 0, 'total': 0}
 
-# Instância global do banco
-db = Database()
-db.atualizar_estrutura_banco()  
 
 # =============================================
 # DEBUG - VERIFICAR O QUE ESTÁ ACONTECENDO
 # =============================================
 
-def debug_database():
+def debug_database(banco):
     """Verifica o estado do banco e usuários"""
     print("🔍 INICIANDO DEBUG DO BANCO...")
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    conn = banco.get_connection()
     
     # Verificar se a tabela usuarios existe
     try:
-        # ✅ CORREÇÃO: Usar a query correta para cada banco
-        if os.getenv('DATABASE_URL'):
-            # PostgreSQL
-            cursor.execute("""
-                SELECT table_name 
-                FROM information_schema.tables 
-                WHERE table_schema = 'public' AND table_name = 'usuarios'
-            """)
-        else:
-            # SQLite
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='usuarios'")
-        
-        tabela_existe = cursor.fetchone()
+        tabela_existe = banco.sql.buscar_um(conn, 'usuarios.tabela_existe')
         print(f"📊 Tabela 'usuarios' existe: {tabela_existe is not None}")
         
         # Verificar usuários na tabela
-        cursor.execute('SELECT * FROM usuarios')
-        usuarios = cursor.fetchall()
+        usuarios = banco.sql.executar(conn, 'usuarios.listar').fetchall()
         
         print(f"👥 Usuários encontrados: {len(usuarios)}")
         for usuario in usuarios:
@@ -2157,23 +1594,18 @@ def debug_database():
     
     conn.close()
 
-def criar_usuario_admin_seguro():
+def criar_usuario_admin_seguro(banco):
     """Garante que existe um admin seguro"""
     print("🔄 Verificando usuário admin...")
     
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    conn = banco.get_connection()
     
     try:
-        cursor.execute("SELECT COUNT(*) FROM usuarios WHERE username = 'admin'")
-        admin_existe = cursor.fetchone()[0]
+        admin_existe = banco.sql.buscar_um(conn, 'usuarios.contar_por_username', ('admin',))[0]
         
         if admin_existe == 0:
             from auth import hash_password
-            cursor.execute('''
-                INSERT INTO usuarios (username, password_hash, nome, nivel_acesso)
-                VALUES (?, ?, ?, ?)
-            ''', ('admin', hash_password('Admin123!'), 'Administrador', 'admin'))
+            banco.sql.executar(conn, 'usuarios.inserir', ('admin', hash_password('Admin123!'), 'Administrador', 'admin'))
             conn.commit()
             print("✅ Admin criado: admin / Admin123!")
         else:
@@ -2184,37 +1616,44 @@ def criar_usuario_admin_seguro():
     
     conn.close()
 
-# Executar debug
-debug_database()
-criar_usuario_admin_seguro()  # ← NOVA FUNÇÃO
-debug_database()
-
-def criar_usuario_admin_se_necessario():
+def criar_usuario_admin_se_necessario(banco):
     """Cria usuário admin se não existir no banco"""
-    conn = db.get_connection()
-    cursor = conn.cursor()
+    conn = banco.get_connection()
     
     # Verificar se existe algum usuário
-    cursor.execute('SELECT COUNT(*) FROM usuarios')
-    count = cursor.fetchone()[0]
+    count = banco.sql.buscar_um(conn, 'usuarios.contar')[0]
     
     if count == 0:
         # Banco vazio - criar usuário admin
         print("⚠️  Banco vazio - criando usuário admin...")
         from auth import hash_password
         
-        cursor.execute('''
-            INSERT INTO usuarios (username, password_hash, nome, nivel_acesso)
-            VALUES (?, ?, ?, ?)
-        ''', ('admin', hash_password('admin123'), 'Administrador', 'admin'))
+        banco.sql.executar(conn, 'usuarios.inserir', ('admin', hash_password('admin123'), 'Administrador', 'admin'))
         
         conn.commit()
         print("✅ Usuário admin criado com sucesso!")
     
     conn.close()
 
-# Executar na inicialização
-criar_usuario_admin_se_necessario()
+# =============================================
+# INSTÂNCIA GLOBAL DO BANCO - UMA VEZ POR PROCESSO
+# =============================================
+
+@st.cache_resource(show_spinner=False)
+def inicializar_banco():
+    """Cria o Database, o schema e o admin uma única vez por processo do servidor.
+    
+    O Streamlit reexecuta este script a cada interação; com cache_resource as
+    próximas execuções (e as outras sessões) recebem a mesma instância sem DDL.
+    """
+    banco = Database()
+    debug_database(banco)
+    criar_usuario_admin_seguro(banco)
+    debug_database(banco)
+    criar_usuario_admin_se_necessario(banco)
+    return banco
+
+db = inicializar_banco()
 
 # =============================================
 # CSS COMPLETO - DESIGN PREMIUM
@@ -2589,62 +2028,6 @@ if not check_auth():
 # FUNÇÕES DO SISTEMA
 # =============================================
 
-def calcular_dre():
-    """Calcula DRE com cache para performance"""
-    vendas = get_vendas_cache(db)
-    gastos = get_gastos_cache(db)
-    fluxo = get_fluxo_caixa_cache(db)
-    
-    receitas = sum(v['valor_venda'] for v in vendas)
-    despesas = sum(g['valor'] for g in gastos)
-    outras_despesas = sum(f['valor'] for f in fluxo if f['tipo'] == 'Saída' and f['categoria'] != 'Vendas')
-    
-    lucro_bruto = receitas - despesas
-    lucro_liquido = lucro_bruto - outras_despesas
-    
-    return {
-        'receitas': receitas,
-        'despesas': despesas,
-        'outras_despesas': outras_despesas,
-        'lucro_bruto': lucro_bruto,
-        'lucro_liquido': lucro_liquido
-    }
-
-def calcular_estatisticas_veiculos():
-    """Calcula estatísticas com cache para performance"""
-    veiculos = get_veiculos_cache(db)
-    vendas = get_vendas_cache(db)
-    gastos = get_gastos_cache(db)
-    
-    # Estatísticas básicas
-    total_veiculos = len(veiculos)
-    veiculos_estoque = len([v for v in veiculos if v['status'] == 'Em estoque'])
-    veiculos_vendidos = len([v for v in veiculos if v['status'] == 'Vendido'])
-    
-    # Gastos por veículo
-    gastos_por_veiculo = {}
-    for gasto in gastos:
-        veiculo_id = gasto['veiculo_id']
-        if veiculo_id not in gastos_por_veiculo:
-            gastos_por_veiculo[veiculo_id] = 0
-        gastos_por_veiculo[veiculo_id] += gasto['valor']
-    
-    # Gastos por categoria
-    gastos_por_categoria = {}
-    for gasto in gastos:
-        categoria = gasto['categoria'] or 'Outros'
-        if categoria not in gastos_por_categoria:
-            gastos_por_categoria[categoria] = 0
-        gastos_por_categoria[categoria] += gasto['valor']
-    
-    return {
-        'total_veiculos': total_veiculos,
-        'veiculos_estoque': veiculos_estoque,
-        'veiculos_vendidos': veiculos_vendidos,
-        'gastos_por_categoria': gastos_por_categoria,
-        'gastos_por_veiculo': gastos_por_veiculo
-    }
-
 def gerar_contrato_venda(dados_venda):
     """Gera contrato de compra e venda automático formatado"""
     
@@ -2874,7 +2257,6 @@ with tab1:
     # =============================================
     
     # "Importar" as funções globais para uso local
-    processar_timestamp_postgresql = globals()['processar_timestamp_postgresql']
     formatar_data = globals()['formatar_data']
     
     st.markdown("""
@@ -2885,370 +2267,25 @@ with tab1:
     """, unsafe_allow_html=True)
     
     # =============================================
-    # FUNÇÃO AUXILIAR PARA PROCESSAR DATAS
-    # =============================================
-    def processar_data(data):
-        """Processa data para comparação (wrapper da função global)"""
-        return processar_timestamp_postgresql(data)
-    
-    # =============================================
-    # FUNÇÕES AUXILIARES PARA O DASHBOARD
-    # =============================================
-    
-    def calcular_metricas_periodo(dias=30):
-        """Calcula métricas comparativas com período anterior"""
-        hoje = datetime.datetime.now()
-        data_inicio = hoje - datetime.timedelta(days=dias)
-        data_anterior_inicio = data_inicio - datetime.timedelta(days=dias)
-        
-        # Buscar vendas do período atual e anterior
-        todas_vendas = db.get_vendas()
-        vendas_periodo = []
-        vendas_anterior = []
-        
-        for venda in todas_vendas:
-            data_venda = venda['data_venda']
-            if hasattr(data_venda, 'date'):
-                data_venda = data_venda.date()
-            elif isinstance(data_venda, str):
-                data_venda = datetime.datetime.strptime(data_venda[:10], '%Y-%m-%d').date()
-            
-            if data_inicio.date() <= data_venda <= hoje.date():
-                vendas_periodo.append(venda)
-            elif data_anterior_inicio.date() <= data_venda < data_inicio.date():
-                vendas_anterior.append(venda)
-        
-        faturamento_atual = sum(v['valor_venda'] for v in vendas_periodo)
-        faturamento_anterior = sum(v['valor_venda'] for v in vendas_anterior)
-        
-        # Calcular variação
-        if faturamento_anterior > 0:
-            variacao = ((faturamento_atual - faturamento_anterior) / faturamento_anterior) * 100
-        else:
-            variacao = 100 if faturamento_atual > 0 else 0
-        
-        return {
-            'faturamento_atual': faturamento_atual,
-            'faturamento_anterior': faturamento_anterior,
-            'variacao': variacao,
-            'qtd_vendas': len(vendas_periodo),
-            'qtd_anterior': len(vendas_anterior)
-        }
-
-    def calcular_giro_estoque():
-        """Calcula métricas de giro de estoque"""
-        veiculos = db.get_veiculos()
-        vendas = db.get_vendas()
-        
-        # Calcular tempo médio em estoque para vendidos
-        tempos_estoque = []
-        for venda in vendas:
-            veiculo = next((v for v in veiculos if v['id'] == venda['veiculo_id']), None)
-            if veiculo:
-                data_cadastro = veiculo['data_cadastro']
-                data_venda = venda['data_venda']
-                
-                data_cadastro = processar_timestamp_postgresql(data_cadastro)
-                data_venda = processar_timestamp_postgresql(data_venda)
-                
-                dias = (data_venda - data_cadastro).days
-                if dias > 0:
-                    tempos_estoque.append(dias)
-        
-        tempo_medio = sum(tempos_estoque) / len(tempos_estoque) if tempos_estoque else 0
-        
-        # Classificar veículos atuais por tempo
-        hoje = datetime.datetime.now().date()
-        estoque_atual = [v for v in veiculos if v['status'] == 'Em estoque']
-        
-        faixas = {
-            '0-30 dias': [],
-            '31-60 dias': [],
-            '61+ dias': []
-        }
-        
-        for veiculo in estoque_atual:
-            data_cadastro = processar_timestamp_postgresql(veiculo['data_cadastro'])
-            dias_estoque = (hoje - data_cadastro).days
-            
-            if dias_estoque <= 30:
-                faixas['0-30 dias'].append(veiculo)
-            elif dias_estoque <= 60:
-                faixas['31-60 dias'].append(veiculo)
-            else:
-                faixas['61+ dias'].append(veiculo)
-        
-        return {
-            'tempo_medio': tempo_medio,
-            'faixas': faixas,
-            'total_estoque': len(estoque_atual)
-        }
-
-    def calcular_alarmes():
-        """Gera alertas inteligentes"""
-        veiculos = db.get_veiculos()
-        vendas = db.get_vendas()
-        gastos = db.get_gastos()
-        metricas_periodo = calcular_metricas_periodo(30)
-        
-        alertas = []
-        
-        # Alerta 1: Veículos parados > 45 dias
-        hoje = datetime.datetime.now().date()
-        veiculos_parados = []
-        capital_parado = 0
-        
-        for veiculo in [v for v in veiculos if v['status'] == 'Em estoque']:
-            data_cadastro = processar_timestamp_postgresql(veiculo['data_cadastro'])
-            dias = (hoje - data_cadastro).days
-            if dias > 45:
-                veiculos_parados.append(veiculo)
-                capital_parado += veiculo['preco_entrada']
-        
-        if veiculos_parados:
-            alertas.append({
-                'tipo': 'critico',
-                'icone': '⚠️',
-                'mensagem': f"{len(veiculos_parados)} veículos acima de 45 dias em estoque (R$ {capital_parado:,.0f} em capital parado)"
-            })
-        
-        # Alerta 2: Margem em queda
-        dre = calcular_dre()
-        if dre['lucro_liquido'] > 0:
-            margem_atual = (dre['lucro_liquido'] / dre['receitas'] * 100) if dre['receitas'] > 0 else 0
-            if margem_atual < 10:
-                alertas.append({
-                    'tipo': 'atencao',
-                    'icone': '📉',
-                    'mensagem': f"Margem em {margem_atual:.1f}% - abaixo da meta recomendada (15%)"
-                })
-        
-        # Alerta 3: Queda de vendas
-        if metricas_periodo['variacao'] < 0:
-            alertas.append({
-                'tipo': 'atencao',
-                'icone': '⬇️',
-                'mensagem': f"Vendas caíram {abs(metricas_periodo['variacao']):.1f}% vs período anterior"
-            })
-        
-        # Alerta 4: Modelo de maior giro no estoque atual
-        if veiculos:
-            modelos_estoque = {}
-            for veiculo in [v for v in veiculos if v['status'] == 'Em estoque']:
-                modelo = f"{veiculo['marca']} {veiculo['modelo']}"
-                if modelo not in modelos_estoque:
-                    modelos_estoque[modelo] = 0
-                modelos_estoque[modelo] += 1
-            
-            if modelos_estoque:
-                top_modelo = max(modelos_estoque, key=modelos_estoque.get)
-                alertas.append({
-                    'tipo': 'positivo',
-                    'icone': '🔥',
-                    'mensagem': f"Modelo {top_modelo} tem {modelos_estoque[top_modelo]} unidades em estoque"
-                })
-        
-        return alertas
-
-    def calcular_rentabilidade_inteligente(tipo_analise="Vendidos"):
-        """Ranking de rentabilidade por modelo/marca - com opção de análise"""
-        veiculos = db.get_veiculos()
-        vendas = db.get_vendas()
-        gastos = db.get_gastos()
-        
-        modelos = {}
-        marcas = {}
-        
-        if tipo_analise == "Vendidos":
-            # Analisar veículos já vendidos (histórico real)
-            for veiculo in veiculos:
-                if veiculo['status'] == 'Vendido':
-                    # Calcular custo total
-                    gastos_veiculo = [g for g in gastos if g['veiculo_id'] == veiculo['id']]
-                    total_gastos = sum(g['valor'] for g in gastos_veiculo)
-                    custo_total = veiculo['preco_entrada'] + total_gastos
-                    
-                    # Buscar venda
-                    venda = next((v for v in vendas if v['veiculo_id'] == veiculo['id']), None)
-                    if venda:
-                        lucro = venda['valor_venda'] - custo_total
-                        margem = (lucro / custo_total * 100) if custo_total > 0 else 0
-                        
-                        # Por modelo
-                        modelo_key = f"{veiculo['marca']} {veiculo['modelo']}"
-                        if modelo_key not in modelos:
-                            modelos[modelo_key] = {'lucro_total': 0, 'margens': [], 'qtd': 0, 'preco_medio': 0}
-                        modelos[modelo_key]['lucro_total'] += lucro
-                        modelos[modelo_key]['margens'].append(margem)
-                        modelos[modelo_key]['qtd'] += 1
-                        modelos[modelo_key]['preco_medio'] = (modelos[modelo_key]['preco_medio'] * (modelos[modelo_key]['qtd'] - 1) + venda['valor_venda']) / modelos[modelo_key]['qtd']
-                        
-                        # Por marca
-                        if veiculo['marca'] not in marcas:
-                            marcas[veiculo['marca']] = {'lucro_total': 0, 'margens': [], 'qtd': 0}
-                        marcas[veiculo['marca']]['lucro_total'] += lucro
-                        marcas[veiculo['marca']]['margens'].append(margem)
-                        marcas[veiculo['marca']]['qtd'] += 1
-        
-        else:  # Em Estoque - analisar potencial
-            for veiculo in veiculos:
-                if veiculo['status'] == 'Em estoque':
-                    # Calcular custo total
-                    gastos_veiculo = [g for g in gastos if g['veiculo_id'] == veiculo['id']]
-                    total_gastos = sum(g['valor'] for g in gastos_veiculo)
-                    custo_total = veiculo['preco_entrada'] + total_gastos
-                    
-                    # Calcular margem potencial (baseada no preço de venda atual)
-                    lucro_potencial = veiculo['preco_venda'] - custo_total
-                    margem_potencial = (lucro_potencial / custo_total * 100) if custo_total > 0 else 0
-                    
-                    # Por modelo
-                    modelo_key = f"{veiculo['marca']} {veiculo['modelo']}"
-                    if modelo_key not in modelos:
-                        modelos[modelo_key] = {'lucro_total': 0, 'margens': [], 'qtd': 0, 'investimento_total': 0}
-                    modelos[modelo_key]['lucro_total'] += lucro_potencial
-                    modelos[modelo_key]['margens'].append(margem_potencial)
-                    modelos[modelo_key]['qtd'] += 1
-                    modelos[modelo_key]['investimento_total'] += custo_total
-                    
-                    # Por marca
-                    if veiculo['marca'] not in marcas:
-                        marcas[veiculo['marca']] = {'lucro_total': 0, 'margens': [], 'qtd': 0, 'investimento_total': 0}
-                    marcas[veiculo['marca']]['lucro_total'] += lucro_potencial
-                    marcas[veiculo['marca']]['margens'].append(margem_potencial)
-                    marcas[veiculo['marca']]['qtd'] += 1
-                    marcas[veiculo['marca']]['investimento_total'] += custo_total
-        
-        # Calcular médias
-        for modelo in modelos:
-            modelos[modelo]['margem_media'] = sum(modelos[modelo]['margens']) / len(modelos[modelo]['margens']) if modelos[modelo]['margens'] else 0
-        
-        for marca in marcas:
-            marcas[marca]['margem_media'] = sum(marcas[marca]['margens']) / len(marcas[marca]['margens']) if marcas[marca]['margens'] else 0
-        
-        return {
-            'modelos': modelos,
-            'marcas': marcas
-        }
-
-    def gerar_recomendacoes():
-        """Gera recomendações automáticas baseadas em dados de estoque e vendas"""
-        recomendacoes = []
-        rentabilidade_vendidos = calcular_rentabilidade_inteligente("Vendidos")
-        rentabilidade_estoque = calcular_rentabilidade_inteligente("Em Estoque")
-        giro = calcular_giro_estoque()
-        veiculos = db.get_veiculos()
-        gastos = db.get_gastos()
-        
-        # Recomendação 1: Modelo com melhor margem histórica para priorizar compras
-        if rentabilidade_vendidos['modelos']:
-            top_modelo_historico = max(rentabilidade_vendidos['modelos'].items(), key=lambda x: x[1]['margem_media'])
-            recomendacoes.append({
-                'icone': '📈',
-                'titulo': 'Foco em compras',
-                'descricao': f"Modelo {top_modelo_historico[0]} tem melhor margem histórica ({top_modelo_historico[1]['margem_media']:.1f}%)"
-            })
-        
-        # Recomendação 2: Veículos com melhor margem potencial no estoque
-        if rentabilidade_estoque['modelos']:
-            top_modelo_estoque = max(rentabilidade_estoque['modelos'].items(), key=lambda x: x[1]['margem_media'])
-            recomendacoes.append({
-                'icone': '💰',
-                'titulo': 'Priorizar vendas',
-                'descricao': f"Modelo {top_modelo_estoque[0]} tem melhor margem potencial no estoque"
-            })
-        
-        # Recomendação 3: Reduzir preço de modelos lentos
-        veiculos_lentos = giro['faixas']['61+ dias']
-        if veiculos_lentos:
-            # Calcular preço médio dos lentos
-            preco_medio_lentos = sum(v['preco_venda'] for v in veiculos_lentos) / len(veiculos_lentos)
-            recomendacoes.append({
-                'icone': '🏷️',
-                'titulo': 'Acelerar giro',
-                'descricao': f"Reduzir preço de {len(veiculos_lentos)} veículos parados (média R$ {preco_medio_lentos:,.0f})"
-            })
-        
-        # Recomendação 4: Modelos com baixo desempenho para revisar estratégia
-        modelos_ruins = [m for m in rentabilidade_estoque['modelos'].items() if m[1]['margem_media'] < 5 and m[1]['qtd'] > 0]
-        if modelos_ruins:
-            pior_modelo = min(rentabilidade_estoque['modelos'].items(), key=lambda x: x[1]['margem_media'])
-            recomendacoes.append({
-                'icone': '⚠️',
-                'titulo': 'Revisar estratégia',
-                'descricao': f"Modelo {pior_modelo[0]} com margem potencial baixa ({pior_modelo[1]['margem_media']:.1f}%)"
-            })
-        
-        return recomendacoes[:4]
-
-    def calcular_saude_financeira():
-        """Calcula indicadores de saúde financeira"""
-        financiamentos = db.get_financiamentos()
-        parcelas = db.get_parcelas()
-        
-        hoje = datetime.datetime.now().date()
-        
-        total_financiado = sum(f['valor_total'] for f in financiamentos if f['status'] == 'Ativo')
-        carteira_ativa = len([f for f in financiamentos if f['status'] == 'Ativo'])
-        
-        parcelas_pendentes = [p for p in parcelas if p['status'] == 'Pendente']
-        parcelas_vencidas = [p for p in parcelas_pendentes if p['data_vencimento'] and processar_timestamp_postgresql(p['data_vencimento']) < hoje]
-        
-        total_pendente = sum(p['valor_parcela'] for p in parcelas_pendentes)
-        total_vencido = sum(p['valor_parcela'] for p in parcelas_vencidas)
-        
-        taxa_inadimplencia = (total_vencido / total_pendente * 100) if total_pendente > 0 else 0
-        
-        dias_atraso = []
-        for p in parcelas_vencidas:
-            dias = (hoje - processar_timestamp_postgresql(p['data_vencimento'])).days
-            dias_atraso.append(dias)
-        
-        dias_medio_atraso = sum(dias_atraso) / len(dias_atraso) if dias_atraso else 0
-        
-        previsao = []
-        for i in range(1, 4):
-            mes = hoje.replace(day=1) + datetime.timedelta(days=32*i)
-            mes = mes.replace(day=1)
-            
-            valor_mes = sum(
-                p['valor_parcela'] for p in parcelas_pendentes
-                if processar_timestamp_postgresql(p['data_vencimento']).year == mes.year and
-                processar_timestamp_postgresql(p['data_vencimento']).month == mes.month
-            )
-            previsao.append({
-                'mes': mes.strftime('%b/%Y'),
-                'valor': valor_mes
-            })
-        
-        return {
-            'total_financiado': total_financiado,
-            'carteira_ativa': carteira_ativa,
-            'taxa_inadimplencia': taxa_inadimplencia,
-            'dias_medio_atraso': dias_medio_atraso,
-            'previsao': previsao,
-            'total_pendente': total_pendente
-        }
-
-    # =============================================
-    # BUSCAR TODOS OS DADOS NECESSÁRIOS
+    # TODOS OS INDICADORES EM UMA PASSADA (painel.py)
     # =============================================
+    # Cada tabela é lida uma vez e os KPIs saem de um único cálculo vetorizado,
+    # em cache até a próxima escrita em qualquer uma das tabelas envolvidas.
     
-    veiculos = db.get_veiculos()
-    vendas = db.get_vendas()
-    dre = calcular_dre()
-    stats = calcular_estatisticas_veiculos()
-    metricas_periodo = calcular_metricas_periodo(30)
-    giro = calcular_giro_estoque()
-    alertas = calcular_alarmes()
+    indicadores = get_painel_cache(db, datetime.date.today())
+    dre = indicadores.dre
+    stats = indicadores.stats
+    metricas_periodo = indicadores.metricas_periodo
+    giro = indicadores.giro
+    alertas = indicadores.alertas
     
     # Estado para o seletor de análise
     if 'tipo_analise_rentabilidade' not in st.session_state:
         st.session_state.tipo_analise_rentabilidade = "Vendidos"
     
-    rentabilidade = calcular_rentabilidade_inteligente(st.session_state.tipo_analise_rentabilidade)
-    recomendacoes = gerar_recomendacoes()
-    saude = calcular_saude_financeira()
+    rentabilidade = indicadores.rentabilidade[st.session_state.tipo_analise_rentabilidade]
+    recomendacoes = indicadores.recomendacoes
+    saude = indicadores.saude
 
     # =============================================
     # BLOCO 1 – KPIs ESTRATÉGICOS (Topo da Página)
@@ -3640,8 +2677,8 @@ with tab1:
     st.markdown("---")
     
     # Cálculos e formatação (mantidos conforme seu código)
-    total_investido_estoque = sum(v['preco_entrada'] for v in veiculos if v['status'] == 'Em estoque')
-    total_potencial_estoque = sum(v['preco_venda'] for v in veiculos if v['status'] == 'Em estoque')
+    total_investido_estoque = indicadores.estoque['investido']
+    total_potencial_estoque = indicadores.estoque['potencial']
     
     lucro_formatado = f"R$ {dre['lucro_liquido']:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
     investido_formatado = f"R$ {total_investido_estoque:,.2f}".replace(',', 'X').replace('.', ',').replace('X', '.')
@@ -4095,24 +3132,33 @@ with tab2:
         with col_filtro2:
             filtro_marca = st.text_input("Filtrar por marca")
         
-        # Lista de veículos
-        veiculos = get_veiculos_cache(db, filtro_status if filtro_status != "Todos" else None)
+        # Uma página por vez, com o custo total já somado no banco e o filtro de marca no WHERE
+        pagina_veiculos = pagina_da_sessao(
+            'estoque', partial(get_veiculos_com_custos_pagina_cache, db, limite=10),
+            filtro_status if filtro_status != "Todos" else None, filtro_marca.strip() or None
+        )
+        veiculos = pagina_veiculos['itens']
         
-        if filtro_marca:
-            veiculos = [v for v in veiculos if filtro_marca.lower() in v['marca'].lower()]
+        # Miniatura do card (menor variante) - veículos sem variante ainda ficam sem foto na lista
+        FOTO_LISTA_LARGURA = 320
+        fotos_card = get_fotos_variante_cache(db, variantes_foto.variante_que_cabe(FOTO_LISTA_LARGURA), 'webp')
         
         for veiculo in veiculos:
             # Criar uma chave única para o expander baseada no ID do veículo
             expander_key = f"expander_{veiculo['id']}"
             
             with st.expander(f"{veiculo['marca']} {veiculo['modelo']} - {veiculo['ano']} - {veiculo['cor']}", expanded=False):
-                # Calcular gastos totais do veículo
-                gastos_veiculo = db.get_gastos(veiculo['id'])
-                total_gastos = sum(g['valor'] for g in gastos_veiculo)
-                custo_total = veiculo['preco_entrada'] + total_gastos
+                # Gastos totais, custo e margem atual vêm prontos de get_veiculos_com_custos
+                total_gastos = veiculo['total_gastos']
+                custo_total = veiculo['custo_total']
+                margem_atual = veiculo['margem_atual']
 
-                # Calcular margem atual (baseada no preço de negociação atual)
-                margem_atual = ((veiculo['preco_venda'] - custo_total) / custo_total) * 100 if custo_total > 0 else 0
+                if veiculo['id'] in fotos_card:
+                    try:
+                        st.image(ler_blob_cache(db, fotos_card[veiculo['id']]), width=FOTO_LISTA_LARGURA)
+                    except FileNotFoundError:
+                        # Variante registrada sem arquivo no armazenamento - o card segue sem foto
+                        print(f"⚠️ Miniatura do veículo {veiculo['id']} não encontrada no armazenamento")
 
                 # Exibir informações do veículo
                 col_info1, col_info2 = st.columns(2)
@@ -4161,8 +3207,11 @@ with tab2:
                 else:
                     st.error(f"**❌ Margem Real: +{margem_real:.1f}%**")
 
-                # Gastos detalhados (código existente continua igual)
-                if gastos_veiculo:
+                # Gastos detalhados - só consulta o banco quando o usuário pede para ver
+                if veiculo['qtd_gastos'] and st.checkbox(
+                    f"💰 Ver gastos detalhados ({veiculo['qtd_gastos']})", key=f"ver_gastos_{veiculo['id']}"
+                ):
+                    gastos_veiculo = get_gastos_cache(db, veiculo['id'])
                     st.markdown("#### 💰 Gastos Detalhados")
                     for i, gasto in enumerate(gastos_veiculo):
                         data_gasto_formatada = formatar_data(gasto['data'])
@@ -4231,14 +3280,13 @@ with tab2:
                                         'veiculo_id': veiculo['id'],
                                         'tipo_documento': 'Nota Fiscal',
                                         'nome_arquivo': arquivo_nota.name,
-                                        'arquivo': arquivo_nota.getvalue(),
+                                        'arquivo': arquivo_nota,
                                         'observacoes': f"Nota fiscal do gasto: {descricao_gasto}"
                                     }
                                     db.add_documento_financeiro(documento_data)
                                 
                                 if success:
                                     st.session_state[f"{gasto_form_key}_submitted"] = True
-                                    forcar_atualizacao_gastos()
                                     resetar_formulario()
                                     
                                     st.success("✅ Gasto adicionado com sucesso! Os dados serão atualizados automaticamente.")
@@ -4278,7 +3326,6 @@ with tab2:
                             success = db.update_veiculo_status(veiculo['id'], novo_status)
                             if success:
                                 st.success("✅ Status atualizado!")
-                                forcar_atualizacao_gastos()
                                 st.rerun()
 
                 with col_btn3:
@@ -4305,7 +3352,6 @@ with tab2:
                             sucesso, mensagem = db.delete_veiculo(veiculo['id'])
                             if sucesso:
                                 st.session_state[delete_key] = False
-                                forcar_atualizacao_gastos()
                                 st.success("✅ " + mensagem)
                                 time.sleep(1)
                                 st.rerun()
@@ -4401,7 +3447,6 @@ with tab2:
                                 sucesso_edit = db.update_veiculo(veiculo['id'], dados_editados)
                                 if sucesso_edit:
                                     st.session_state[edit_key] = False
-                                    forcar_atualizacao_gastos()
                                     st.success("✅ Veículo atualizado com sucesso!")
                                     time.sleep(1)
                                     st.rerun()
@@ -4412,6 +3457,8 @@ with tab2:
                             st.session_state[edit_key] = False
                             st.rerun()
 
+        controles_pagina('estoque', pagina_veiculos)
+
 with tab3:
     # ABA UNIFICADA VENDAS + FINANCIAMENTOS
     st.markdown("""
@@ -4429,7 +3476,7 @@ with tab3:
                 
         with col_venda1:
             st.markdown("#### 👤 Dados da Venda")
-            veiculos_estoque = [v for v in db.get_veiculos() if v['status'] == 'Em estoque']
+            veiculos_estoque = [v for v in get_veiculos_cache(db) if v['status'] == 'Em estoque']
             
             if veiculos_estoque:
                 veiculos_options = [f"{v['id']} - {v['marca']} {v['modelo']} ({v['ano']})" for v in veiculos_estoque]
@@ -4444,7 +3491,7 @@ with tab3:
                         
                         if veiculo:
                             # Calcular custos
-                            gastos_veiculo = db.get_gastos(veiculo_id)
+                            gastos_veiculo = get_gastos_cache(db, veiculo_id)
                             total_gastos = sum(g['valor'] for g in gastos_veiculo)
                             custo_total = veiculo['preco_entrada'] + total_gastos
                             
@@ -4666,27 +3713,9 @@ with tab3:
     with sub_tab2:
         st.markdown("#### 📋 Histórico Completo de Vendas")
         
-        vendas = db.get_vendas()
-        financiamentos = db.get_financiamentos()
-        
-        # Combinar dados de vendas e financiamentos
-        vendas_completas = []
-        for venda in vendas:
-            venda_completa = venda.copy()
-            # Buscar financiamento correspondente
-            financiamento = next((f for f in financiamentos if f['veiculo_id'] == venda['veiculo_id']), None)
-            if financiamento:
-                venda_completa['tipo_pagamento'] = financiamento['tipo_financiamento']
-                venda_completa['num_parcelas'] = financiamento['num_parcelas']
-                venda_completa['valor_entrada'] = financiamento['valor_entrada']
-            else:
-                venda_completa['tipo_pagamento'] = 'À Vista'
-                venda_completa['num_parcelas'] = 1
-                venda_completa['valor_entrada'] = venda['valor_venda']
-            
-            vendas_completas.append(venda_completa)
+        pagina_vendas = pagina_da_sessao('vendas', partial(get_historico_vendas_pagina_cache, db, limite=15))
         
-        for venda in vendas_completas[:15]:
+        for venda in pagina_vendas['itens']:
             data_venda_formatada = formatar_data(venda.get('data_venda'))
             
             st.markdown(f"""
@@ -4710,35 +3739,38 @@ with tab3:
                 </div>
             </div>
             """, unsafe_allow_html=True)
+        
+        controles_pagina('vendas', pagina_vendas)
     
     with sub_tab3:
         st.markdown("#### 📅 Gestão de Parcelas")
         
         # ✅ CORREÇÃO: Cálculo "Receber Este Mês" - Próximos 30 dias
-        parcelas = db.get_parcelas()
         hoje = datetime.datetime.now().date()
         data_fim_mes = hoje + datetime.timedelta(days=30)
         
-        parcelas_pendentes = [p for p in parcelas if p['status'] == 'Pendente']
-        parcelas_vencidas = [p for p in parcelas_pendentes if p['data_vencimento'] and processar_timestamp_postgresql(p['data_vencimento']) < hoje]
-        parcelas_este_mes = [p for p in parcelas_pendentes if p['data_vencimento'] and processar_timestamp_postgresql(p['data_vencimento']) <= data_fim_mes]
+        # Métricas somadas no banco; as listas trazem só a página mostrada
+        resumo_parcelas = get_resumo_vencimentos_cache(db, hoje, data_fim_mes)
+        buscar_parcelas = partial(get_parcelas_pagina_cache, db, limite=10)
+        pagina_vencidas = pagina_da_sessao('parcelas_vencidas', buscar_parcelas, 'Pendente', hoje, None)
+        pagina_este_mes = pagina_da_sessao('parcelas_este_mes', buscar_parcelas, 'Pendente', None, data_fim_mes)
         
         # Métricas
         col_met1, col_met2, col_met3 = st.columns(3)
         with col_met1:
-            st.metric("⏰ Vencidas", len(parcelas_vencidas))
+            st.metric("⏰ Vencidas", resumo_parcelas['qtd_vencidas'])
         with col_met2:
-            st.metric("💰 Este Mês", f"R$ {sum(p['valor_parcela'] for p in parcelas_este_mes):,.2f}")
+            st.metric("💰 Este Mês", f"R$ {resumo_parcelas['total_ate']:,.2f}")
         with col_met3:
-            st.metric("🏦 Total Pendente", f"R$ {sum(p['valor_parcela'] for p in parcelas_pendentes):,.2f}")
+            st.metric("🏦 Total Pendente", f"R$ {resumo_parcelas['total_pendente']:,.2f}")
         
         col_parc1, col_parc2 = st.columns(2)
         
         with col_parc1:
             st.markdown("##### ⏰ Parcelas Vencidas")
             
-            for parcela in parcelas_vencidas[:10]:
-                dias_vencido = (hoje - processar_timestamp_postgresql(parcela['data_vencimento'])).days
+            for parcela in pagina_vencidas['itens']:
+                dias_vencido = (hoje - parcela['data_vencimento']).days
                 
                 st.markdown(f"""
                 <div style="padding: 1rem; margin: 0.5rem 0; background: rgba(231, 76, 60, 0.1); border-radius: 8px;">
@@ -4751,12 +3783,13 @@ with tab3:
                     </div>
                 </div>
                 """, unsafe_allow_html=True)
+            controles_pagina('parcelas_vencidas', pagina_vencidas)
         
         with col_parc2:
             st.markdown("##### 📈 Próximas Parcelas (30 dias)")
             
-            for parcela in parcelas_este_mes[:10]:
-                dias_restantes = (processar_timestamp_postgresql(parcela['data_vencimento']) - hoje).days
+            for parcela in pagina_este_mes['itens']:
+                dias_restantes = (parcela['data_vencimento'] - hoje).days
                 
                 st.markdown(f"""
                 <div style="padding: 1rem; margin: 0.5rem 0; background: rgba(243, 156, 18, 0.1); border-radius: 8px;">
@@ -4768,7 +3801,8 @@ with tab3:
                         R$ {parcela['valor_parcela']:,.2f}
                     </div>
                 </div>
-                """, unsafe_allow_html=True)      
+                """, unsafe_allow_html=True)
+            controles_pagina('parcelas_este_mes', pagina_este_mes)
 
 with tab4:
     # DOCUMENTOS
@@ -4784,7 +3818,7 @@ with tab4:
     with col_doc1:
         st.markdown("#### 📤 Novo Documento")
         with st.form("novo_documento_form", clear_on_submit=True):
-            veiculos_options = [f"{v['id']} - {v['marca']} {v['modelo']} ({v['ano']})" for v in db.get_veiculos()]
+            veiculos_options = [f"{v['id']} - {v['marca']} {v['modelo']} ({v['ano']})" for v in get_veiculos_cache(db)]
             veiculo_selecionado = st.selectbox("Veículo*", veiculos_options)
             
             nome_documento = st.text_input("Nome do Documento*", placeholder="Nota Fiscal de Compra")
@@ -4806,7 +3840,7 @@ with tab4:
                         'veiculo_id': int(veiculo_selecionado.split(" - ")[0]),
                         'nome_documento': nome_documento,
                         'tipo_documento': tipo_documento,
-                        'arquivo': arquivo.getvalue(),
+                        'arquivo': arquivo,
                         'observacoes': observacoes
                     }
                     success = db.add_documento(documento_data)
@@ -4819,10 +3853,12 @@ with tab4:
     with col_doc2:
         st.markdown("#### 📋 Documentos Salvos")
         
-        documentos = db.get_documentos()
+        # Uma página por vez (cursor na sessão)
+        pagina_documentos = pagina_da_sessao('documentos', partial(get_documentos_pagina_cache, db, limite=8), None)
+        documentos = pagina_documentos['itens']
         
         if documentos:
-            for doc in documentos[:8]:
+            for doc in documentos:
                 # ✅ CORREÇÃO: Usar função auxiliar para data
                 data_upload_formatada = formatar_data(doc['data_upload'])
                 
@@ -4842,16 +3878,26 @@ with tab4:
                 </div>
                 """, unsafe_allow_html=True)
                 
-                # Botão para download
+                # Dois cliques de propósito: a listagem não abre nenhum arquivo, só o primeiro
+                # clique lê o documento. O st.download_button (Streamlit 1.28) não aceita
+                # gerador - o arquivo inteiro fica na memória do servidor até o download;
+                # a leitura em partes vale para a gravação e para as rotas Flask (/foto).
                 if st.button("📥 Download", key=f"down_{doc['id']}", use_container_width=True):
-                    # Criar download do arquivo
-                    st.download_button(
-                        label="Baixar Arquivo",
-                        data=doc['arquivo'],
-                        file_name=f"{doc['nome_documento']}.{doc['tipo_documento'].lower()}",
-                        mime="application/octet-stream",
-                        key=f"dl_{doc['id']}"
-                    )
+                    documento = db.get_documento_arquivo(doc['id'])
+                    if documento:
+                        with documento['arquivo'] as arquivo:
+                            conteudo = arquivo.read()
+                        st.download_button(
+                            label="Baixar Arquivo",
+                            data=conteudo,
+                            file_name=f"{doc['nome_documento']}.{doc['tipo_documento'].lower()}",
+                            mime=documento['arquivo_mime'] or "application/octet-stream",
+                            key=f"dl_{doc['id']}"
+                        )
+                    else:
+                        st.error("❌ Arquivo não encontrado")
+            
+            controles_pagina('documentos', pagina_documentos)
         else:
             st.info("📝 Nenhum documento salvo ainda.")
 
@@ -4872,9 +3918,9 @@ with tab5:
         data_fim = st.date_input("Data Fim", value=datetime.datetime.now())
     
     # Métricas do período
-    fluxo_periodo = db.get_fluxo_caixa(data_inicio, data_fim)
-    entradas = sum(f['valor'] for f in fluxo_periodo if f['tipo'] == 'Entrada')
-    saidas = sum(f['valor'] for f in fluxo_periodo if f['tipo'] == 'Saída')
+    resumo_fluxo = get_resumo_fluxo_caixa_cache(db, data_inicio, data_fim)
+    entradas = resumo_fluxo['entradas']
+    saidas = resumo_fluxo['saidas']
     saldo = entradas - saidas
     
     col_met1, col_met2, col_met3, col_met4 = st.columns(4)
@@ -4885,7 +3931,7 @@ with tab5:
     with col_met3:
         st.metric("⚖️ Saldo", f"R$ {saldo:,.2f}", delta=f"R$ {saldo:,.2f}")
     with col_met4:
-        st.metric("📊 Movimentações", len(fluxo_periodo))
+        st.metric("📊 Movimentações", resumo_fluxo['qtd'])
     
     col_fc1, col_fc2 = st.columns(2)
     
@@ -4896,7 +3942,7 @@ with tab5:
             
             if tipo == "Saída":
                 # Para saídas, permitir associar a veículo
-                veiculos_options = ["Não associado"] + [f"{v['id']} - {v['marca']} {v['modelo']}" for v in db.get_veiculos()]
+                veiculos_options = ["Não associado"] + [f"{v['id']} - {v['marca']} {v['modelo']}" for v in get_veiculos_cache(db)]
                 veiculo_associado = st.selectbox("Associar a Veículo", veiculos_options)
                 categoria = st.selectbox("Categoria*", [
                     "Pneus", "Manutenção", "Documentação", "Combustível", 
@@ -4949,7 +3995,8 @@ with tab5:
     with col_fc2:
         st.markdown("#### 📋 Últimas Movimentações")
         
-        for mov in fluxo_periodo[:10]:
+        pagina_fluxo = pagina_da_sessao('fluxo_caixa', partial(get_fluxo_caixa_pagina_cache, db, limite=10), data_inicio, data_fim)
+        for mov in pagina_fluxo['itens']:
             cor = "#27AE60" if mov['tipo'] == 'Entrada' else "#E74C3C"
             veiculo_info = f" • {mov['marca']} {mov['modelo']}" if mov['marca'] else ""
             
@@ -4971,6 +4018,8 @@ with tab5:
                 </div>
             </div>
             """, unsafe_allow_html=True)
+        
+        controles_pagina('fluxo_caixa', pagina_fluxo)
 
 with tab6:
     # CONTATOS
@@ -5019,9 +4068,9 @@ with tab6:
     with col_ctt2:
         st.markdown("#### 📋 Lista de Contatos")
         
-        contatos = db.get_contatos()
+        pagina_contatos = pagina_da_sessao('contatos', partial(get_contatos_pagina_cache, db, limite=10))
         
-        for contato in contatos[:10]:
+        for contato in pagina_contatos['itens']:
             # ✅ CORREÇÃO: Usar função auxiliar para data
             data_contato_formatada = formatar_data(contato['data_contato'])
             
@@ -5046,6 +4095,8 @@ with tab6:
                 </div>
             </div>
             """, unsafe_allow_html=True)
+        
+        controles_pagina('contatos', pagina_contatos)
 
 with tab7:
     st.markdown("""
@@ -5103,17 +4154,12 @@ with tab7:
                     if nova_senha == confirmar_senha:
                         if len(nova_senha) >= 6:
                             # Atualizar senha
-                            conn = sqlite3.connect(db.db_path)
-                            cursor = conn.cursor()
-                            cursor.execute('''
-                                UPDATE usuarios SET password_hash = ? WHERE id = ?
-                            ''', (hash_password(nova_senha), usuario['id']))
-                            conn.commit()
-                            conn.close()
-                            
-                            st.success("✅ Senha alterada com sucesso!")
-                            st.info("🔒 Sua senha foi atualizada com segurança")
-                            resetar_formulario()
+                            if db.update_senha(usuario['id'], nova_senha):
+                                st.success("✅ Senha alterada com sucesso!")
+                                st.info("🔒 Sua senha foi atualizada com segurança")
+                                resetar_formulario()
+                            else:
+                                st.error("❌ Erro ao alterar a senha")
                         else:
                             st.error("❌ A senha deve ter pelo menos 6 caracteres")
                     else:
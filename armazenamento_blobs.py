@@ -0,0 +1,260 @@
+# =============================================
+# ARMAZENAMENTO DE ARQUIVOS ENDEREÇADO POR CONTEÚDO
+# =============================================
+# Fotos e documentos ficam fora do banco: cada arquivo é gravado uma única vez
+# sob o SHA-256 do seu conteúdo e o banco guarda só hash, tamanho e mime.
+# Arquivos iguais (ex: a mesma nota fiscal enviada duas vezes) ocupam espaço
+# uma vez só. A leitura é em partes, sem carregar o arquivo inteiro na memória.
+#
+# Configuração via variáveis de ambiente:
+#   BLOB_BACKEND   implementação em BACKENDS (padrão 'local')
+#   BLOB_DIR       pasta do backend local (padrão 'blobs') - app e vitrine
+#                  precisam enxergar a mesma pasta (ex: volume compartilhado)
+#
+# Uso: python armazenamento_blobs.py limpar   (remove arquivos sem referência há mais de CARENCIA_LIMPEZA)
+
+import datetime
+import hashlib
+import mimetypes
+import os
+import shutil
+import tempfile
+import threading
+
+TAMANHO_PARTE = 64 * 1024
+
+# Quem grava (salvar_foto_veiculo, add_documento, variantes_foto) salva o arquivo antes do
+# commit do registro que o referencia: a limpeza só remove o que já passou desse prazo
+CARENCIA_LIMPEZA = datetime.timedelta(hours=24)
+
+# Assinaturas dos formatos que o sistema recebe (upload aceita pdf/jpg/png/doc/docx)
+ASSINATURAS = [
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'%PDF', 'application/pdf'),
+    (b'GIF8', 'image/gif'),
+    (b'PK\x03\x04', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    (b'\xd0\xcf\x11\xe0', 'application/msword'),
+]
+
+
+def detectar_mime(inicio, nome_arquivo=None):
+    """Mime pelo começo do conteúdo; cai para a extensão do nome e depois para octet-stream"""
+    if inicio[:4] == b'RIFF' and inicio[8:12] == b'WEBP':
+        return 'image/webp'
+    for assinatura, mime in ASSINATURAS:
+        if inicio.startswith(assinatura):
+            return mime
+    if nome_arquivo:
+        mime, _ = mimetypes.guess_type(nome_arquivo)
+        if mime:
+            return mime
+    return 'application/octet-stream'
+
+
+class BlobSalvo:
+    """Resultado de salvar(): o que o banco precisa guardar"""
+
+    __slots__ = ('hash', 'tamanho', 'mime')
+
+    def __init__(self, hash, tamanho, mime):
+        self.hash = hash
+        self.tamanho = tamanho
+        self.mime = mime
+
+
+class ArmazenamentoBlobs:
+    """Interface dos backends - um armazenamento de objetos implementa os mesmos métodos"""
+
+    def salvar(self, origem, nome_arquivo=None):
+        """Grava bytes ou um arquivo aberto (lido em partes) e devolve um BlobSalvo"""
+        raise NotImplementedError
+
+    def abrir(self, hash_blob):
+        """Arquivo binário aberto para leitura (quem chama fecha)"""
+        raise NotImplementedError
+
+    def existe(self, hash_blob):
+        raise NotImplementedError
+
+    def modificado_em(self, hash_blob):
+        """datetime (UTC) da gravação - só metadado, o conteúdo não é lido"""
+        raise NotImplementedError
+
+    def remover(self, hash_blob):
+        raise NotImplementedError
+
+    def listar(self):
+        """Todos os hashes armazenados"""
+        raise NotImplementedError
+
+    def persistente(self):
+        """Se o conteúdo sobrevive a um novo deploy - sem isso o banco não pode abrir mão dos BLOBs"""
+        raise NotImplementedError
+
+    def conferir(self, hash_blob):
+        """Relê o arquivo e confere o SHA-256 - só depois disso a cópia no banco pode sair"""
+        if not self.existe(hash_blob):
+            return False
+        sha = hashlib.sha256()
+        for parte in self.ler_em_partes(hash_blob):
+            sha.update(parte)
+        return sha.hexdigest() == hash_blob
+
+    def ler_em_partes(self, hash_blob, tamanho_parte=TAMANHO_PARTE):
+        """Gerador com o conteúdo em pedaços - para respostas HTTP em streaming"""
+        with self.abrir(hash_blob) as arquivo:
+            while True:
+                parte = arquivo.read(tamanho_parte)
+                if not parte:
+                    break
+                yield parte
+
+    def ler(self, hash_blob):
+        """Conteúdo inteiro em memória - só para arquivos pequenos (ex: fotos)"""
+        with self.abrir(hash_blob) as arquivo:
+            return arquivo.read()
+
+
+def _partes(origem):
+    if isinstance(origem, (bytes, bytearray, memoryview)):
+        dados = bytes(origem)
+        for i in range(0, len(dados), TAMANHO_PARTE):
+            yield dados[i:i + TAMANHO_PARTE]
+        return
+    while True:
+        parte = origem.read(TAMANHO_PARTE)
+        if not parte:
+            break
+        yield parte
+
+
+class BlobsLocais(ArmazenamentoBlobs):
+    """Sistema de arquivos local: <pasta>/ab/cd/abcd...<sha256>"""
+
+    def __init__(self, pasta=None):
+        self.pasta = pasta or os.getenv('BLOB_DIR', 'blobs')
+        os.makedirs(self.pasta, exist_ok=True)
+
+    def _caminho(self, hash_blob):
+        if len(hash_blob) != 64 or any(c not in '0123456789abcdef' for c in hash_blob):
+            raise ValueError(f"hash inválido: {hash_blob!r}")
+        return os.path.join(self.pasta, hash_blob[:2], hash_blob[2:4], hash_blob)
+
+    def salvar(self, origem, nome_arquivo=None):
+        sha = hashlib.sha256()
+        tamanho = 0
+        inicio = b''
+
+        # Grava num temporário enquanto calcula o hash; o nome final só existe depois
+        descritor, temporario = tempfile.mkstemp(dir=self.pasta, prefix='.envio-')
+        try:
+            with os.fdopen(descritor, 'wb') as destino:
+                for parte in _partes(origem):
+                    if len(inicio) < 16:
+                        inicio += parte[:16 - len(inicio)]
+                    sha.update(parte)
+                    tamanho += len(parte)
+                    destino.write(parte)
+
+            hash_blob = sha.hexdigest()
+            caminho = self._caminho(hash_blob)
+            if os.path.exists(caminho):
+                os.remove(temporario)  # Mesmo conteúdo já armazenado
+                # Renova o mtime: a limpeza não pode apagar um arquivo antigo sem referência
+                # que acabou de ser reaproveitado e ainda espera o commit do registro
+                os.utime(caminho)
+            else:
+                os.makedirs(os.path.dirname(caminho), exist_ok=True)
+                os.replace(temporario, caminho)
+        except Exception:
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+
+        return BlobSalvo(hash_blob, tamanho, detectar_mime(inicio, nome_arquivo))
+
+    def abrir(self, hash_blob):
+        return open(self._caminho(hash_blob), 'rb')
+
+    def existe(self, hash_blob):
+        return os.path.exists(self._caminho(hash_blob))
+
+    def modificado_em(self, hash_blob):
+        # O arquivo nunca é reescrito (o nome é o hash do conteúdo): mtime = última gravação
+        segundos = int(os.stat(self._caminho(hash_blob)).st_mtime)
+        return datetime.datetime.fromtimestamp(segundos, datetime.timezone.utc)
+
+    def remover(self, hash_blob):
+        try:
+            os.remove(self._caminho(hash_blob))
+        except FileNotFoundError:
+            pass
+
+    def persistente(self):
+        # O padrão relativo 'blobs' cai no disco efêmero do container (Railway) e não é
+        # compartilhado entre app e vitrine: só um BLOB_DIR absoluto (volume montado) conta
+        return os.path.isabs(self.pasta)
+
+    def listar(self):
+        for _, _, arquivos in os.walk(self.pasta):
+            for nome in arquivos:
+                if len(nome) == 64 and not nome.startswith('.'):
+                    yield nome
+
+
+BACKENDS = {
+    'local': BlobsLocais,
+}
+
+_armazenamento = None
+_armazenamento_lock = threading.Lock()
+
+
+def obter_armazenamento():
+    """Backend único do processo, escolhido por BLOB_BACKEND"""
+    global _armazenamento
+    if _armazenamento is None:
+        with _armazenamento_lock:
+            if _armazenamento is None:
+                _armazenamento = BACKENDS[os.getenv('BLOB_BACKEND', 'local')]()
+    return _armazenamento
+
+
+def copiar_para(hash_blob, destino):
+    """Copia o blob em partes para um arquivo já aberto (ex: resposta de download)"""
+    with obter_armazenamento().abrir(hash_blob) as origem:
+        shutil.copyfileobj(origem, destino, TAMANHO_PARTE)
+
+
+if __name__ == '__main__':
+    import sys
+
+    import consultas
+    from pool_conexoes import obter_pool
+
+    if sys.argv[1:] != ['limpar']:
+        print("Uso: python armazenamento_blobs.py limpar")
+        sys.exit(2)
+
+    pool = obter_pool()
+    conn = pool.obter()
+    try:
+        referenciados = {linha[0] for linha in consultas.para(pool.dialeto).iterar(conn, 'blobs.referenciados')}
+    finally:
+        conn.close()
+
+    armazenamento = obter_armazenamento()
+    limite = datetime.datetime.now(datetime.timezone.utc) - CARENCIA_LIMPEZA
+    removidos = 0
+    for hash_blob in list(armazenamento.listar()):
+        if hash_blob in referenciados:
+            continue
+        try:
+            if armazenamento.modificado_em(hash_blob) > limite:
+                continue  # Pode ser um envio cujo registro ainda não foi gravado
+        except FileNotFoundError:
+            continue
+        armazenamento.remover(hash_blob)
+        removidos += 1
+    print(f"🧹 {removidos} arquivo(s) sem referência removido(s)")
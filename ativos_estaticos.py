@@ -0,0 +1,132 @@
+# =============================================
+# ARQUIVOS ESTÁTICOS DA VITRINE (CARREGADOS NO BOOT)
+# =============================================
+# Cada arquivo é lido e otimizado uma vez quando o worker sobe e fica em
+# memória sob uma URL com a impressão digital do conteúdo (/static/<hash>.<ext>).
+# Como a URL muda junto com o conteúdo, a resposta pode ser guardada pelo
+# navegador/CDN para sempre. Tipos de texto ganham versões gzip/brotli prontas.
+#
+# CSS e JS da vitrine ficam em vitrine.css/vitrine.js e são minificados aqui, sem
+# dependência extra: só comentários e espaços saem, nenhum nome é reescrito.
+
+import hashlib
+import io
+import os
+import re
+
+from PIL import Image
+
+from cache_respostas import comprimir
+
+PASTA_BASE = os.path.dirname(os.path.abspath(__file__))
+
+# nome: (arquivos candidatos em ordem, caixa máxima em pixels)
+IMAGENS = {
+    # Exibido a 40px de altura no cabeçalho - 4x cobre telas de alta densidade
+    'logo': (['logoca.png', 'logo-icon.png'], (160, 160)),
+    'favicon': (['logo-icon.png'], (64, 64)),
+}
+
+# nome: (arquivo, extensão servida, mime)
+TEXTOS = {
+    'css': ('vitrine.css', 'css', 'text/css; charset=utf-8'),
+    'js': ('vitrine.js', 'js', 'application/javascript; charset=utf-8'),
+}
+
+TIPOS_COMPRIMIVEIS = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+class Ativo:
+    __slots__ = ('nome', 'arquivo', 'mime', 'codificados', 'etag')
+
+    def __init__(self, nome, arquivo, mime, codificados, etag):
+        self.nome = nome
+        self.arquivo = arquivo
+        self.mime = mime
+        self.codificados = codificados
+        self.etag = etag
+
+    @property
+    def url(self):
+        return f"/static/{self.arquivo}"
+
+
+class AtivosEstaticos:
+    """Registro dos arquivos estáticos por nome lógico e por nome com hash"""
+
+    def __init__(self):
+        self.por_nome = {}
+        self.por_arquivo = {}
+
+    def registrar(self, nome, conteudo, extensao, mime):
+        impressao = hashlib.sha256(conteudo).hexdigest()[:16]
+        codificados = comprimir(conteudo) if mime.startswith(TIPOS_COMPRIMIVEIS) else {'': conteudo}
+        ativo = Ativo(nome, f"{impressao}.{extensao}", mime, codificados, impressao)
+        self.por_nome[nome] = ativo
+        self.por_arquivo[ativo.arquivo] = ativo
+        return ativo
+
+    def url(self, nome):
+        """URL do arquivo, ou None se ele não foi carregado"""
+        ativo = self.por_nome.get(nome)
+        return ativo.url if ativo else None
+
+    def buscar(self, arquivo):
+        return self.por_arquivo.get(arquivo)
+
+
+def otimizar_png(caminho, caixa):
+    """Reduz para caber na caixa e quantiza para paleta de 256 cores (mantém transparência)"""
+    with Image.open(caminho) as aberta:
+        imagem = aberta.convert('RGBA')
+    imagem.thumbnail(caixa, Image.Resampling.LANCZOS)
+    imagem = imagem.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+    saida = io.BytesIO()
+    imagem.save(saida, 'PNG', optimize=True)
+    return saida.getvalue()
+
+
+def carregar_imagens(ativos, imagens=IMAGENS, pasta=PASTA_BASE):
+    """Registra o primeiro candidato existente de cada imagem"""
+    for nome, (candidatos, caixa) in imagens.items():
+        for candidato in candidatos:
+            caminho = os.path.join(pasta, candidato)
+            if not os.path.exists(caminho):
+                continue
+            try:
+                ativo = ativos.registrar(nome, otimizar_png(caminho, caixa), 'png', 'image/png')
+                print(f"🖼️ {nome}: {candidato} ({os.path.getsize(caminho)} → {len(ativo.codificados[''])} bytes)")
+            except Exception as e:
+                print(f"⚠️ Não foi possível carregar {candidato}: {e}")
+            break
+
+
+def minificar_css(texto):
+    texto = re.sub(r'/\*.*?\*/', '', texto, flags=re.S)
+    texto = re.sub(r'\s+', ' ', texto)
+    # Espaço antes de ':' fica - em seletores ('a :hover') ele muda o significado
+    texto = re.sub(r'\s*([{};,>])\s*', r'\1', texto)
+    texto = re.sub(r':\s+', ':', texto)
+    return texto.replace(';}', '}').strip()
+
+
+def minificar_js(texto):
+    """Tira indentação, linhas vazias e comentários de linha inteira.
+
+    As quebras de linha ficam: o código depende da inserção automática de ';'.
+    """
+    linhas = (linha.strip() for linha in texto.splitlines())
+    return '\n'.join(linha for linha in linhas if linha and not linha.startswith('//'))
+
+
+MINIFICADORES = {'css': minificar_css, 'js': minificar_js}
+
+
+def carregar_textos(ativos, textos=TEXTOS, pasta=PASTA_BASE):
+    """Lê, minifica e registra o CSS/JS - um erro aqui derruba o boot, a página não funciona sem eles"""
+    for nome, (arquivo, extensao, mime) in textos.items():
+        with open(os.path.join(pasta, arquivo), encoding='utf-8') as origem:
+            original = origem.read()
+        ativo = ativos.registrar(nome, MINIFICADORES[extensao](original).encode('utf-8'), extensao, mime)
+        tamanhos = ' / '.join(f"{codificacao or 'original'} {len(corpo)}" for codificacao, corpo in ativo.codificados.items())
+        print(f"📦 {arquivo}: {len(original.encode('utf-8'))} → {tamanhos} bytes")
@@ -0,0 +1,127 @@
+# =============================================
+# CACHE DE RESPOSTAS PRONTAS (VITRINE)
+# =============================================
+# Guarda o corpo já renderizado de uma página junto com as versões gzip e
+# brotli, comprimidas uma única vez. A chave leva a versão do inventário:
+# quando ela muda, a chave nova não existe e a página é renderizada de novo.
+#
+# Duas camadas:
+#   - memória do processo (cada worker do gunicorn)
+#   - pasta opcional (VITRINE_CACHE_DIR), compartilhada pelos workers da
+#     máquina: o primeiro worker que renderiza uma versão grava, os outros leem
+#
+# brotli é opcional: sem o pacote, só gzip e sem compressão.
+
+import gzip
+import hashlib
+import os
+import tempfile
+import threading
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Entradas em memória por cache - versões antigas saem primeiro
+MAXIMO_ENTRADAS = 8
+
+# Extensão do arquivo em disco de cada codificação ('' = sem compressão)
+EXTENSOES = {'': '.html', 'gzip': '.gz', 'br': '.br'}
+
+
+def comprimir(corpo):
+    """{codificação: bytes} com o corpo original e as versões comprimidas disponíveis"""
+    codificados = {'': corpo, 'gzip': gzip.compress(corpo, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        codificados['br'] = brotli.compress(corpo, quality=11)
+    return codificados
+
+
+def escolher_codificacao(accept_encoding, disponiveis):
+    """br > gzip > sem compressão, conforme o Accept-Encoding do navegador"""
+    aceitas = {parte.split(';')[0].strip() for parte in (accept_encoding or '').lower().split(',')}
+    for codificacao in ('br', 'gzip'):
+        if codificacao in aceitas and codificacao in disponiveis:
+            return codificacao
+    return ''
+
+
+class RespostaPronta:
+    """Corpo renderizado em todas as codificações + ETag do conteúdo"""
+
+    __slots__ = ('codificados', 'etag')
+
+    def __init__(self, codificados):
+        self.codificados = codificados
+        self.etag = hashlib.sha256(codificados['']).hexdigest()[:32]
+
+
+class CacheRespostas:
+    def __init__(self, pasta=None):
+        self.pasta = pasta
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._entradas = {}
+        self._lock = threading.Lock()
+
+    def obter(self, chave, renderizar):
+        """RespostaPronta da chave; renderizar() -> str|bytes só roda quando nenhuma camada tem"""
+        entrada = self._entradas.get(chave)
+        if entrada is not None:
+            return entrada
+
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is None:
+                entrada = self._ler_disco(chave)
+            if entrada is None:
+                corpo = renderizar()
+                entrada = RespostaPronta(comprimir(corpo.encode('utf-8') if isinstance(corpo, str) else corpo))
+                self._gravar_disco(chave, entrada)
+            while len(self._entradas) >= MAXIMO_ENTRADAS:
+                self._entradas.pop(next(iter(self._entradas)))
+            self._entradas[chave] = entrada
+        return entrada
+
+    def _caminho(self, chave, codificacao):
+        return os.path.join(self.pasta, chave + EXTENSOES[codificacao])
+
+    def _ler_disco(self, chave):
+        if not self.pasta:
+            return None
+        codificados = {}
+        for codificacao in EXTENSOES:
+            try:
+                with open(self._caminho(chave, codificacao), 'rb') as arquivo:
+                    codificados[codificacao] = arquivo.read()
+            except FileNotFoundError:
+                if codificacao == '':
+                    return None
+        return RespostaPronta(codificados)
+
+    def _gravar_disco(self, chave, entrada):
+        if not self.pasta:
+            return
+        try:
+            # Comprimidas primeiro e o .html por último: quem acha o .html acha as outras
+            for codificacao in ('gzip', 'br', ''):
+                if codificacao not in entrada.codificados:
+                    continue
+                descritor, temporario = tempfile.mkstemp(dir=self.pasta, prefix='.gravando-')
+                with os.fdopen(descritor, 'wb') as arquivo:
+                    arquivo.write(entrada.codificados[codificacao])
+                os.replace(temporario, self._caminho(chave, codificacao))
+            self._limpar_disco(chave)
+        except OSError as e:
+            print(f"⚠️ Não foi possível gravar o cache em disco: {e}")
+
+    def _limpar_disco(self, chave_atual):
+        """Remove do disco as versões anteriores da mesma página (prefixo antes do '-v')"""
+        prefixo = chave_atual.split('-v')[0] + '-v'
+        for nome in os.listdir(self.pasta):
+            if nome.startswith(prefixo) and not nome.startswith(chave_atual + '.'):
+                try:
+                    os.remove(os.path.join(self.pasta, nome))
+                except FileNotFoundError:
+                    pass
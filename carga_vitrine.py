@@ -0,0 +1,131 @@
+# =============================================
+# TESTE DE CARGA DA VITRINE
+# =============================================
+# Clientes rápidos fazem requisições em sequência (conexão keep-alive) numa
+# mistura de páginas da API e da página inicial; clientes lentos enviam o
+# cabeçalho aos poucos, como celulares em rede ruim, e prendem quem os atende.
+# Mede requisições por segundo, latência (p50/p95) e erros.
+#
+# Uso:
+#   python carga_vitrine.py popular 300                       cadastra veículos de teste no banco do DATABASE_URL
+#   python carga_vitrine.py medir http://127.0.0.1:5000 [--duracao 20] [--clientes 32] [--lentos 8]
+#
+# Procedimento completo (banco local no lugar do Railway) no README, seção "Teste de carga".
+
+import argparse
+import http.client
+import random
+import socket
+import statistics
+import threading
+import time
+from urllib.parse import urlsplit
+
+CAMINHOS = [
+    '/api/veiculos',
+    '/api/veiculos?ordem=menor_preco',
+    '/api/veiculos?marca=Fiat&ordem=mais_novos',
+    '/api/veiculos?preco_max=80000&ano_min=2019',
+    '/',
+]
+
+MARCAS = ['Fiat', 'Volkswagen', 'Chevrolet', 'Toyota', 'Honda', 'Jeep', 'Hyundai', 'Renault']
+
+
+def popular(quantidade):
+    import consultas
+    from pool_conexoes import obter_pool
+
+    pool = obter_pool()
+    sql = consultas.para(pool.dialeto)
+    conn = pool.obter()
+    try:
+        for i in range(quantidade):
+            sql.executar(conn, 'veiculos.inserir', (
+                f'Modelo {i % 40}', random.randint(2012, 2025), random.choice(MARCAS), 'Prata',
+                random.randint(30000, 120000), random.randint(40000, 160000), 'Carga',
+                random.randint(0, 150000), f'TST{i:04d}', f'CHASSI{i:06d}', '', 'Flex',
+                random.choice(['Manual', 'Automático']), 4, 'Ar, Direção, Vidros', 10,
+            ))
+        conn.commit()
+    finally:
+        conn.close()
+    print(f"✅ {quantidade} veículos de teste cadastrados")
+
+
+def cliente_rapido(host, porta, fim, latencias, erros):
+    conn = http.client.HTTPConnection(host, porta, timeout=30)
+    while time.monotonic() < fim:
+        inicio = time.monotonic()
+        try:
+            conn.request('GET', random.choice(CAMINHOS), headers={'Accept-Encoding': 'gzip'})
+            resposta = conn.getresponse()
+            resposta.read()
+            if resposta.status != 200:
+                erros.append(resposta.status)
+            latencias.append(time.monotonic() - inicio)
+        except Exception as e:
+            erros.append(type(e).__name__)
+            conn.close()
+            conn = http.client.HTTPConnection(host, porta, timeout=30)
+    conn.close()
+
+
+def cliente_lento(host, porta, fim, intervalo=0.5):
+    """Manda uma linha do cabeçalho a cada `intervalo` segundos até o fim do teste"""
+    while time.monotonic() < fim:
+        try:
+            with socket.create_connection((host, porta), timeout=30) as sock:
+                sock.sendall(b'GET /api/veiculos HTTP/1.1\r\nHost: vitrine\r\n')
+                while time.monotonic() < fim:
+                    time.sleep(intervalo)
+                    sock.sendall(b'X-Lento: 1\r\n')
+                sock.sendall(b'\r\n')
+        except OSError:
+            time.sleep(intervalo)
+
+
+def medir(url, duracao, clientes, lentos):
+    partes = urlsplit(url)
+    host, porta = partes.hostname, partes.port or 80
+    latencias, erros = [], []
+
+    # Os lentos chegam primeiro e ocupam quem os atende
+    fim = time.monotonic() + duracao + 1
+    threads = [threading.Thread(target=cliente_lento, args=(host, porta, fim), daemon=True) for _ in range(lentos)]
+    for thread in threads:
+        thread.start()
+    time.sleep(1)
+
+    fim_rapidos = time.monotonic() + duracao
+    rapidos = [threading.Thread(target=cliente_rapido, args=(host, porta, fim_rapidos, latencias, erros))
+               for _ in range(clientes)]
+    for thread in rapidos:
+        thread.start()
+    for thread in rapidos:
+        thread.join()
+
+    ordenadas = sorted(latencias)
+    print(f"🌐 {url} - {duracao}s, {clientes} clientes rápidos, {lentos} lentos")
+    print(f"📈 {len(latencias) / duracao:.1f} req/s ({len(latencias)} respostas, {len(erros)} erros)")
+    if ordenadas:
+        p95 = ordenadas[int(len(ordenadas) * 0.95) - 1] if len(ordenadas) >= 20 else ordenadas[-1]
+        print(f"⏱️ p50 {statistics.median(ordenadas) * 1000:.1f} ms | p95 {p95 * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Teste de carga da vitrine')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    p_popular = comandos.add_parser('popular')
+    p_popular.add_argument('quantidade', type=int)
+    p_medir = comandos.add_parser('medir')
+    p_medir.add_argument('url')
+    p_medir.add_argument('--duracao', type=int, default=20)
+    p_medir.add_argument('--clientes', type=int, default=32)
+    p_medir.add_argument('--lentos', type=int, default=8)
+    args = parser.parse_args()
+
+    if args.comando == 'popular':
+        popular(args.quantidade)
+    else:
+        medir(args.url, args.duracao, args.clientes, args.lentos)
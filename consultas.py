@@ -0,0 +1,775 @@
+import datetime
+import itertools
+
+from psycopg2.extras import execute_values
+
+# =============================================
+# CATÁLOGO DE CONSULTAS - UM TEXTO, DOIS DIALETOS
+# =============================================
+# Cada consulta é escrita uma única vez com '?' como placeholder e compilada
+# no boot para o dialeto do pool ('%s' no PostgreSQL). Onde o SQL realmente
+# difere entre os bancos, a entrada é um dict {'postgres': ..., 'sqlite': ...}.
+# Marcadores disponíveis no texto:
+#   {retornando_id}   ' RETURNING id' no PostgreSQL (no SQLite usa-se lastrowid)
+#
+# As consultas em PREPARADAS usam PREPARE/EXECUTE no PostgreSQL: o plano é
+# montado uma vez por conexão do pool e reaproveitado nas próximas chamadas.
+#
+# Leitura do resultado:
+#   listar      lista de dicts (as telas alteram as linhas recebidas)
+#   iterar      gerador de Linha, em lotes - cursor no servidor no PostgreSQL
+#   dataframe   colunas preenchidas lote a lote direto no pandas, sem linha intermediária
+
+SQL = {
+    # ---------- veículos ----------
+    'veiculos.inserir': '''
+        INSERT INTO veiculos
+        (modelo, ano, marca, cor, preco_entrada, preco_venda, fornecedor, km, placa, chassi, renavam, combustivel, cambio, portas, observacoes, margem_negociacao)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?){retornando_id}
+    ''',
+    'veiculos.atualizar': '''
+        UPDATE veiculos SET
+            modelo = ?, ano = ?, marca = ?, cor = ?,
+            preco_entrada = ?, preco_venda = ?, margem_negociacao = ?,
+            fornecedor = ?, km = ?, placa = ?, chassi = ?,
+            combustivel = ?, cambio = ?, portas = ?, observacoes = ?
+        WHERE id = ?
+    ''',
+    'veiculos.atualizar_status': 'UPDATE veiculos SET status = ? WHERE id = ?',
+    'veiculos.status': 'SELECT status FROM veiculos WHERE id = ?',
+    'veiculos.status_e_preco': 'SELECT status, preco_entrada FROM veiculos WHERE id = ?',
+    'veiculos.existe': 'SELECT id FROM veiculos WHERE id = ?',
+    'veiculos.foto': 'SELECT foto_hash, foto_tamanho, foto_mime FROM veiculos WHERE id = ?',
+    'veiculos.salvar_foto': 'UPDATE veiculos SET foto_hash = ?, foto_tamanho = ?, foto_mime = ? WHERE id = ?',
+    'veiculos.excluir': 'DELETE FROM veiculos WHERE id = ?',
+
+    # ---------- gastos ----------
+    'gastos.inserir': '''
+        INSERT INTO gastos (veiculo_id, tipo_gasto, valor, data, descricao, categoria)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+    'gastos.excluir_por_veiculo': 'DELETE FROM gastos WHERE veiculo_id = ?',
+    'gastos.total_do_veiculo': 'SELECT COALESCE(SUM(valor), 0) FROM gastos WHERE veiculo_id = ?',
+
+    # ---------- vendas ----------
+    'vendas.inserir': '''
+        INSERT INTO vendas (veiculo_id, comprador_nome, comprador_cpf, comprador_endereco, valor_venda, contrato_path)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''',
+
+    # ---------- documentos ----------
+    'documentos.inserir': '''
+        INSERT INTO documentos
+        (veiculo_id, nome_documento, tipo_documento, arquivo_hash, arquivo_tamanho, arquivo_mime, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'documentos.excluir_por_veiculo': 'DELETE FROM documentos WHERE veiculo_id = ?',
+    'documentos.arquivo': '''
+        SELECT id, nome_documento, tipo_documento, arquivo_hash, arquivo_tamanho, arquivo_mime
+        FROM documentos WHERE id = ?
+    ''',
+
+    # ---------- fluxo de caixa ----------
+    'fluxo_caixa.inserir': '''
+        INSERT INTO fluxo_caixa (data, descricao, tipo, categoria, valor, veiculo_id, status)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+
+    # ---------- contatos ----------
+    'contatos.inserir': '''
+        INSERT INTO contatos (nome, telefone, email, tipo, veiculo_interesse, data_contato, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''',
+
+    # ---------- usuários ----------
+    'usuarios.por_username': 'SELECT * FROM usuarios WHERE username = ?',
+    'usuarios.listar': 'SELECT * FROM usuarios',
+    'usuarios.contar': 'SELECT COUNT(*) FROM usuarios',
+    'usuarios.contar_por_username': 'SELECT COUNT(*) FROM usuarios WHERE username = ?',
+    'usuarios.inserir': '''
+        INSERT INTO usuarios (username, password_hash, nome, nivel_acesso)
+        VALUES (?, ?, ?, ?)
+    ''',
+    'usuarios.inserir_se_nao_existe': '''
+        INSERT INTO usuarios (username, password_hash, nome, nivel_acesso)
+        SELECT ?, ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM usuarios WHERE username = ?)
+    ''',
+    'usuarios.atualizar_senha': 'UPDATE usuarios SET password_hash = ? WHERE id = ?',
+    'usuarios.tabela_existe': {
+        'postgres': '''
+            SELECT table_name
+            FROM information_schema.tables
+            WHERE table_schema = 'public' AND table_name = 'usuarios'
+        ''',
+        'sqlite': "SELECT name FROM sqlite_master WHERE type='table' AND name='usuarios'",
+    },
+
+    # ---------- financiamentos e parcelas ----------
+    'financiamentos.inserir': '''
+        INSERT INTO financiamentos
+        (veiculo_id, tipo_financiamento, valor_total, valor_entrada, num_parcelas, data_contrato, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?){retornando_id}
+    ''',
+    'parcelas.inserir': '''
+        INSERT INTO parcelas (financiamento_id, numero_parcela, valor_parcela, data_vencimento)
+        VALUES (?, ?, ?, ?)
+    ''',
+    # Cronograma inteiro em um INSERT (Consultas.inserir_lote): no PostgreSQL o execute_values
+    # expande o único placeholder em (...), (...), ...; no SQLite vai por executemany
+    'parcelas.inserir_lote': {
+        'postgres': 'INSERT INTO parcelas (financiamento_id, numero_parcela, valor_parcela, data_vencimento) VALUES ?',
+        'sqlite': 'INSERT INTO parcelas (financiamento_id, numero_parcela, valor_parcela, data_vencimento) VALUES (?, ?, ?, ?)',
+    },
+    'parcelas.status_e_valor': 'SELECT status, valor_parcela FROM parcelas WHERE id = ?',
+    'parcelas.atualizar_status': '''
+        UPDATE parcelas
+        SET status = ?, data_pagamento = ?, forma_pagamento = ?
+        WHERE id = ?
+    ''',
+    'documentos_financeiros.inserir': '''
+        INSERT INTO documentos_financeiros
+        (veiculo_id, financiamento_id, tipo_documento, nome_arquivo, arquivo,
+         arquivo_hash, arquivo_tamanho, arquivo_mime, observacoes)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+
+    # ---------- armazenamento de arquivos ----------
+    'blobs.referenciados': '''
+        SELECT foto_hash FROM veiculos WHERE foto_hash IS NOT NULL
+        UNION SELECT arquivo_hash FROM documentos WHERE arquivo_hash IS NOT NULL
+        UNION SELECT arquivo_hash FROM documentos_financeiros WHERE arquivo_hash IS NOT NULL
+        UNION SELECT hash FROM fotos_variantes
+    ''',
+
+    # ---------- variantes das fotos (variantes_foto.py) ----------
+    'fotos_variantes.inserir': '''
+        INSERT INTO fotos_variantes (veiculo_id, variante, formato, origem, hash, tamanho, largura, altura)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''',
+    'fotos_variantes.excluir_por_veiculo': 'DELETE FROM fotos_variantes WHERE veiculo_id = ?',
+    # Só variantes da foto atual - as de uma foto trocada são ignoradas até serem regeradas
+    'fotos_variantes.por_variante': '''
+        SELECT fv.veiculo_id, fv.hash
+        FROM fotos_variantes fv
+        JOIN veiculos v ON v.id = fv.veiculo_id AND v.foto_hash = fv.origem
+        WHERE fv.variante = ? AND fv.formato = ?
+    ''',
+    'fotos_variantes.pendentes': '''
+        SELECT v.id, v.foto_hash
+        FROM veiculos v
+        WHERE v.foto_hash IS NOT NULL
+        AND NOT EXISTS (SELECT 1 FROM fotos_variantes fv WHERE fv.veiculo_id = v.id AND fv.origem = v.foto_hash)
+    ''',
+
+    # ---------- agregados do dashboard (só totais trafegam, nunca as tabelas) ----------
+    'gastos.por_categoria': '''
+        SELECT COALESCE(NULLIF(categoria, ''), 'Outros') as categoria, SUM(valor) as total, COUNT(*) as qtd
+        FROM gastos
+        GROUP BY COALESCE(NULLIF(categoria, ''), 'Outros')
+        ORDER BY total DESC
+    ''',
+    'gastos.por_veiculo': '''
+        SELECT veiculo_id, SUM(valor) as total, COUNT(*) as qtd
+        FROM gastos
+        GROUP BY veiculo_id
+    ''',
+    # Janela atual [inicio, amanhã) e anterior [inicio_anterior, inicio) em uma varredura
+    'vendas.periodos': '''
+        SELECT
+            COALESCE(SUM(CASE WHEN data_venda >= ? THEN valor_venda END), 0) as faturamento_atual,
+            COUNT(CASE WHEN data_venda >= ? THEN 1 END) as qtd_vendas,
+            COALESCE(SUM(CASE WHEN data_venda < ? THEN valor_venda END), 0) as faturamento_anterior,
+            COUNT(CASE WHEN data_venda < ? THEN 1 END) as qtd_anterior
+        FROM vendas
+        WHERE data_venda >= ? AND data_venda < ?
+    ''',
+    'vendas.tempo_medio_giro': {
+        'postgres': '''
+            SELECT AVG(dias) FROM (
+                SELECT CAST(vd.data_venda AS DATE) - CAST(vei.data_cadastro AS DATE) as dias
+                FROM vendas vd
+                JOIN veiculos vei ON vei.id = vd.veiculo_id
+            ) t
+            WHERE dias > 0
+        ''',
+        'sqlite': '''
+            SELECT AVG(dias) FROM (
+                SELECT julianday(date(vd.data_venda)) - julianday(date(vei.data_cadastro)) as dias
+                FROM vendas vd
+                JOIN veiculos vei ON vei.id = vd.veiculo_id
+            ) t
+            WHERE dias > 0
+        ''',
+    },
+    # Por marca/modelo dos vendidos, usando a venda mais recente de cada veículo.
+    # soma_margens / qtd dá a margem média - e permite somar modelos em marcas.
+    'vendas.rentabilidade_por_modelo': '''
+        SELECT c.marca, c.modelo, COUNT(*) as qtd,
+            SUM(vd.valor_venda - c.custo_total) as lucro_total,
+            SUM(CASE WHEN c.custo_total > 0
+                THEN (vd.valor_venda - c.custo_total) / c.custo_total * 100 ELSE 0 END) as soma_margens,
+            SUM(vd.valor_venda) as total_vendido
+        FROM (
+            SELECT v.id, v.marca, v.modelo, v.preco_entrada + COALESCE(SUM(g.valor), 0) as custo_total
+            FROM veiculos v
+            LEFT JOIN gastos g ON g.veiculo_id = v.id
+            WHERE v.status = 'Vendido'
+            GROUP BY v.id, v.marca, v.modelo, v.preco_entrada
+        ) c
+        JOIN vendas vd ON vd.id = (SELECT MAX(v2.id) FROM vendas v2 WHERE v2.veiculo_id = c.id)
+        GROUP BY c.marca, c.modelo
+    ''',
+    'parcelas.resumo_pendentes': {
+        'postgres': '''
+            SELECT
+                COALESCE(SUM(valor_parcela), 0) as total_pendente,
+                COALESCE(SUM(CASE WHEN data_vencimento < ? THEN valor_parcela END), 0) as total_vencido,
+                AVG(CASE WHEN data_vencimento < ? THEN CAST(? AS DATE) - CAST(data_vencimento AS DATE) END) as dias_medio_atraso
+            FROM parcelas
+            WHERE status = 'Pendente'
+        ''',
+        'sqlite': '''
+            SELECT
+                COALESCE(SUM(valor_parcela), 0) as total_pendente,
+                COALESCE(SUM(CASE WHEN data_vencimento < ? THEN valor_parcela END), 0) as total_vencido,
+                AVG(CASE WHEN data_vencimento < ? THEN julianday(?) - julianday(date(data_vencimento)) END) as dias_medio_atraso
+            FROM parcelas
+            WHERE status = 'Pendente'
+        ''',
+    },
+    'parcelas.pendentes_por_mes': {
+        'postgres': '''
+            SELECT to_char(data_vencimento, 'YYYY-MM') as mes, SUM(valor_parcela) as total, COUNT(*) as qtd
+            FROM parcelas
+            WHERE status = 'Pendente'
+            GROUP BY to_char(data_vencimento, 'YYYY-MM')
+            ORDER BY mes
+        ''',
+        'sqlite': '''
+            SELECT strftime('%Y-%m', data_vencimento) as mes, SUM(valor_parcela) as total, COUNT(*) as qtd
+            FROM parcelas
+            WHERE status = 'Pendente'
+            GROUP BY strftime('%Y-%m', data_vencimento)
+            ORDER BY mes
+        ''',
+    },
+    # Estoque do painel - só as colunas de painel.COLUNAS_ESTOQUE, lido direto para um DataFrame
+    'veiculos.estoque_painel': '''
+        SELECT v.id, v.marca, v.modelo, v.status, v.preco_entrada, v.preco_venda, v.data_cadastro,
+            v.preco_entrada + COALESCE(g.total_gastos, 0) as custo_total
+        FROM veiculos v
+        LEFT JOIN (
+            SELECT veiculo_id, SUM(valor) as total_gastos
+            FROM gastos
+            GROUP BY veiculo_id
+        ) g ON g.veiculo_id = v.id
+        WHERE v.status = 'Em estoque'
+        ORDER BY v.data_cadastro DESC
+    ''',
+    # Métricas das telas paginadas - calculadas no banco, independentes da página mostrada
+    'fluxo_caixa.resumo_periodo': '''
+        SELECT
+            COALESCE(SUM(CASE WHEN tipo = 'Entrada' THEN valor END), 0) as entradas,
+            COALESCE(SUM(CASE WHEN tipo = 'Saída' THEN valor END), 0) as saidas,
+            COUNT(*) as qtd
+        FROM fluxo_caixa
+        WHERE data >= ? AND data <= ?
+    ''',
+    'parcelas.resumo_vencimentos': '''
+        SELECT
+            COUNT(CASE WHEN data_vencimento < ? THEN 1 END) as qtd_vencidas,
+            COALESCE(SUM(CASE WHEN data_vencimento <= ? THEN valor_parcela END), 0) as total_ate,
+            COALESCE(SUM(valor_parcela), 0) as total_pendente
+        FROM parcelas
+        WHERE status = 'Pendente'
+    ''',
+    'financiamentos.ativos': '''
+        SELECT COUNT(*) as qtd, COALESCE(SUM(valor_total), 0) as total
+        FROM financiamentos
+        WHERE status = 'Ativo'
+    ''',
+}
+
+# Listagens com filtros opcionais: (base, {filtro: condição}, ordenação).
+# Cada combinação de filtros vira uma entrada própria no catálogo, ex:
+# 'parcelas.listar', 'parcelas.listar:status', 'parcelas.listar:financiamento_id,status'
+# As listagens em PAGINADAS ganham também as variantes por cursor (ver PAGINADAS)
+COLUNAS_VEICULO = '''
+            v.id, v.modelo, v.ano, v.marca, v.cor,
+            v.preco_entrada, v.preco_venda, v.fornecedor,
+            v.km, v.placa, v.chassi, v.combustivel,
+            v.cambio, v.portas, v.observacoes,
+            v.data_cadastro, v.status,
+            COALESCE(v.margem_negociacao, 30) as margem_negociacao'''
+
+LISTAGENS = {
+    'veiculos.listar': (f'''
+        SELECT{COLUNAS_VEICULO}
+        FROM veiculos v
+    ''', {'status': 'v.status = ?', 'marca': 'LOWER(v.marca) LIKE ?'}, 'ORDER BY v.data_cadastro DESC'),
+    # Veículos + soma dos gastos em uma ida ao banco (lista de estoque sem N+1)
+    'veiculos.listar_com_custos': (f'''
+        SELECT{COLUNAS_VEICULO},
+            COALESCE(g.total_gastos, 0) as total_gastos,
+            COALESCE(g.qtd_gastos, 0) as qtd_gastos,
+            v.preco_entrada + COALESCE(g.total_gastos, 0) as custo_total
+        FROM veiculos v
+        LEFT JOIN (
+            SELECT veiculo_id, SUM(valor) as total_gastos, COUNT(*) as qtd_gastos
+            FROM gastos
+            GROUP BY veiculo_id
+        ) g ON g.veiculo_id = v.id
+    ''', {'status': 'v.status = ?', 'marca': 'LOWER(v.marca) LIKE ?'}, 'ORDER BY v.data_cadastro DESC'),
+    'vendas.listar': ('''
+        SELECT
+            v.id,
+            v.veiculo_id,
+            v.comprador_nome,
+            v.comprador_cpf,
+            v.comprador_endereco,
+            v.valor_venda,
+            v.data_venda,
+            v.contrato_path,
+            v.status,
+            vei.marca,
+            vei.modelo,
+            vei.ano,
+            vei.cor
+        FROM vendas v
+        LEFT JOIN veiculos vei ON v.veiculo_id = vei.id
+    ''', {}, 'ORDER BY v.data_venda DESC'),
+    # Vendas + resumo do financiamento mais recente do veículo (À Vista quando não há),
+    # resolvido no banco só para as linhas da página
+    'vendas.historico': ('''
+        SELECT
+            v.id,
+            v.veiculo_id,
+            v.comprador_nome,
+            v.valor_venda,
+            v.data_venda,
+            v.status,
+            vei.marca,
+            vei.modelo,
+            vei.ano,
+            COALESCE(f.tipo_financiamento, 'À Vista') as tipo_pagamento,
+            COALESCE(f.num_parcelas, 1) as num_parcelas,
+            COALESCE(f.valor_entrada, v.valor_venda) as valor_entrada
+        FROM vendas v
+        LEFT JOIN veiculos vei ON v.veiculo_id = vei.id
+        LEFT JOIN financiamentos f ON f.id = (
+            SELECT f2.id FROM financiamentos f2
+            WHERE f2.veiculo_id = v.veiculo_id
+            ORDER BY f2.data_contrato DESC, f2.id DESC
+            LIMIT 1
+        )
+    ''', {}, 'ORDER BY v.data_venda DESC'),
+    'gastos.listar': ('''
+        SELECT g.*, v.marca, v.modelo
+        FROM gastos g
+        LEFT JOIN veiculos v ON g.veiculo_id = v.id
+    ''', {'veiculo_id': 'g.veiculo_id = ?'}, 'ORDER BY g.data DESC'),
+    # Só metadados - o arquivo é buscado por id ('documentos.arquivo') na hora do download
+    'documentos.listar': ('''
+        SELECT d.id, d.veiculo_id, d.nome_documento, d.tipo_documento, d.data_upload, d.observacoes,
+            v.marca, v.modelo
+        FROM documentos d
+        LEFT JOIN veiculos v ON d.veiculo_id = v.id
+    ''', {'veiculo_id': 'd.veiculo_id = ?'}, 'ORDER BY d.data_upload DESC'),
+    'fluxo_caixa.listar': ('''
+        SELECT fc.*, v.marca, v.modelo
+        FROM fluxo_caixa fc
+        LEFT JOIN veiculos v ON fc.veiculo_id = v.id
+    ''', {'data_inicio': 'fc.data >= ?', 'data_fim': 'fc.data <= ?'}, 'ORDER BY fc.data DESC'),
+    'contatos.listar': ('''
+        SELECT c.*
+        FROM contatos c
+    ''', {}, 'ORDER BY c.data_contato DESC'),
+    'financiamentos.listar': ('''
+        SELECT f.*, v.marca, v.modelo, v.ano, v.placa,
+            (SELECT COUNT(*) FROM parcelas p WHERE p.financiamento_id = f.id AND p.status = 'Pendente') as parcelas_pendentes,
+            (SELECT SUM(p.valor_parcela) FROM parcelas p WHERE p.financiamento_id = f.id AND p.status = 'Pendente') as total_pendente
+        FROM financiamentos f
+        LEFT JOIN veiculos v ON f.veiculo_id = v.id
+    ''', {'veiculo_id': 'f.veiculo_id = ?'}, 'ORDER BY f.data_contrato DESC'),
+    'parcelas.listar': ('''
+        SELECT p.*, f.tipo_financiamento, v.marca, v.modelo
+        FROM parcelas p
+        LEFT JOIN financiamentos f ON p.financiamento_id = f.id
+        LEFT JOIN veiculos v ON f.veiculo_id = v.id
+    ''', {
+        'financiamento_id': 'p.financiamento_id = ?',
+        'status': 'p.status = ?',
+        'vencimento_antes': 'p.data_vencimento < ?',
+        'vencimento_ate': 'p.data_vencimento <= ?',
+    }, 'ORDER BY p.data_vencimento ASC'),
+}
+
+
+# Listagens paginadas por cursor (keyset): (coluna de data, coluna id, direção da ordenação).
+# Cada combinação de filtros ganha três variantes, todas com LIMIT ? no fim:
+#   '<chave>|inicio'      primeira página
+#   '<chave>|proximos'    continua depois do par (data, id) do cursor
+#   '<chave>|anteriores'  volta antes dele (ordem invertida - Consultas.listar_pagina desinverte)
+# O custo de uma página não depende de quantas vieram antes, ao contrário do OFFSET.
+PAGINADAS = {
+    'veiculos.listar': ('v.data_cadastro', 'v.id', 'DESC'),
+    'veiculos.listar_com_custos': ('v.data_cadastro', 'v.id', 'DESC'),
+    'vendas.historico': ('v.data_venda', 'v.id', 'DESC'),
+    'documentos.listar': ('d.data_upload', 'd.id', 'DESC'),
+    'fluxo_caixa.listar': ('fc.data', 'fc.id', 'DESC'),
+    'contatos.listar': ('c.data_contato', 'c.id', 'DESC'),
+    'parcelas.listar': ('p.data_vencimento', 'p.id', 'ASC'),
+}
+
+
+def _montar_listagem(base, condicoes, ordem):
+    where = ('\n        WHERE ' + ' AND '.join(condicoes)) if condicoes else ''
+    return f'{base.rstrip()}{where}\n        {ordem}'
+
+
+def _expandir_listagens():
+    for nome, (base, filtros, ordem) in LISTAGENS.items():
+        for n in range(len(filtros) + 1):
+            for combinacao in itertools.combinations(filtros, n):
+                chave = f"{nome}:{','.join(combinacao)}" if combinacao else nome
+                condicoes = [filtros[f] for f in combinacao]
+                SQL[chave] = _montar_listagem(base, condicoes, ordem)
+                if nome in PAGINADAS:
+                    data, id_, direcao = PAGINADAS[nome]
+                    inversa, depois, antes = ('ASC', '<', '>') if direcao == 'DESC' else ('DESC', '>', '<')
+                    variantes = {
+                        'inicio': (condicoes, direcao),
+                        'proximos': (condicoes + [f'({data}, {id_}) {depois} (?, ?)'], direcao),
+                        'anteriores': (condicoes + [f'({data}, {id_}) {antes} (?, ?)'], inversa),
+                    }
+                    for variante, (condicoes_pagina, sentido) in variantes.items():
+                        SQL[f'{chave}|{variante}'] = _montar_listagem(
+                            base, condicoes_pagina, f'ORDER BY {data} {sentido}, {id_} {sentido}'
+                        ) + '\n        LIMIT ?'
+
+
+_expandir_listagens()
+
+# KPIs materializados na linha única de kpi_snapshot: coluna -> cálculo do zero.
+# Os métodos de escrita do Database somam deltas a essas colunas na mesma
+# transação ('kpi_snapshot.ajustar'); o cálculo do zero serve para a
+# reconstrução e para a verificação de consistência (kpi_snapshot.py).
+KPI_SNAPSHOT = {
+    'receitas': 'SELECT COALESCE(SUM(valor_venda), 0) FROM vendas',
+    'qtd_vendas': 'SELECT COUNT(*) FROM vendas',
+    'despesas': 'SELECT COALESCE(SUM(valor), 0) FROM gastos',
+    'outras_despesas': ("SELECT COALESCE(SUM(valor), 0) FROM fluxo_caixa "
+                        "WHERE tipo = 'Saída' AND COALESCE(categoria, '') <> 'Vendas'"),
+    'veiculos_total': 'SELECT COUNT(*) FROM veiculos',
+    'veiculos_estoque': "SELECT COUNT(*) FROM veiculos WHERE status = 'Em estoque'",
+    'veiculos_vendidos': "SELECT COUNT(*) FROM veiculos WHERE status = 'Vendido'",
+    'capital_estoque': "SELECT COALESCE(SUM(preco_entrada), 0) FROM veiculos WHERE status = 'Em estoque'",
+    'total_pendente': "SELECT COALESCE(SUM(valor_parcela), 0) FROM parcelas WHERE status = 'Pendente'",
+    'parcelas_pendentes': "SELECT COUNT(*) FROM parcelas WHERE status = 'Pendente'",
+}
+
+
+def _gerar_kpi_snapshot():
+    colunas = list(KPI_SNAPSHOT)
+    SQL['kpi_snapshot.ler'] = f"SELECT {', '.join(colunas)}, atualizado_em FROM kpi_snapshot WHERE id = 1"
+    SQL['kpi_snapshot.calcular'] = 'SELECT\n' + ',\n'.join(
+        f'            ({calculo}) as {coluna}' for coluna, calculo in KPI_SNAPSHOT.items()
+    )
+    SQL['kpi_snapshot.criar_linha'] = '''
+        INSERT INTO kpi_snapshot (id)
+        SELECT 1
+        WHERE NOT EXISTS (SELECT 1 FROM kpi_snapshot WHERE id = 1)
+    '''
+    SQL['kpi_snapshot.reconstruir'] = 'UPDATE kpi_snapshot SET\n' + ',\n'.join(
+        f'            {coluna} = ({calculo})' for coluna, calculo in KPI_SNAPSHOT.items()
+    ) + ',\n            atualizado_em = CURRENT_TIMESTAMP\n        WHERE id = 1'
+    SQL['kpi_snapshot.ajustar'] = 'UPDATE kpi_snapshot SET\n' + ',\n'.join(
+        f'            {coluna} = {coluna} + ?' for coluna in colunas
+    ) + ',\n            atualizado_em = CURRENT_TIMESTAMP\n        WHERE id = 1'
+
+
+_gerar_kpi_snapshot()
+
+# Consultas mais quentes - PREPARE no PostgreSQL
+PREPARADAS = {'veiculos.listar', 'veiculos.listar:status', 'gastos.listar:veiculo_id'}
+
+MARCADORES = {
+    'postgres': {'retornando_id': ' RETURNING id'},
+    'sqlite': {'retornando_id': ''},
+}
+
+
+def compilar(texto, dialeto):
+    """Troca marcadores e placeholders do texto neutro pelo formato do dialeto"""
+    if isinstance(texto, dict):
+        texto = texto[dialeto]
+    texto = texto.format(**MARCADORES[dialeto])
+    if dialeto == 'postgres':
+        return texto.replace('%', '%%').replace('?', '%s')
+    return texto
+
+
+def _para_prepare(texto):
+    """'?' -> $1, $2... (formato do PREPARE do PostgreSQL)"""
+    partes = texto.split('?')
+    return partes[0] + ''.join(f'${i}{parte}' for i, parte in enumerate(partes[1:], start=1))
+
+
+# Linhas lidas por vez do cursor (fetchmany / itersize do cursor no servidor)
+LOTE = 500
+
+# Nomes únicos para os cursores no servidor - dois geradores abertos na mesma conexão não colidem
+_cursores = itertools.count()
+
+
+class Linha(tuple):
+    """Linha compacta: só os valores, numa tupla. Os nomes das colunas ficam na
+    classe, compartilhados por todas as linhas do mesmo resultado."""
+
+    __slots__ = ()
+    colunas = ()
+    _indices = {}
+
+    def __getitem__(self, chave):
+        if isinstance(chave, str):
+            return tuple.__getitem__(self, self._indices[chave])
+        return tuple.__getitem__(self, chave)
+
+    def get(self, coluna, padrao=None):
+        indice = self._indices.get(coluna)
+        return padrao if indice is None else tuple.__getitem__(self, indice)
+
+    def keys(self):
+        return self.colunas
+
+    def items(self):
+        return zip(self.colunas, self)
+
+    def como_dict(self):
+        return dict(zip(self.colunas, self))
+
+    def __repr__(self):
+        return f"Linha({', '.join(f'{c}={v!r}' for c, v in self.items())})"
+
+    def __reduce__(self):
+        # A classe é criada em tempo de execução - o pickle (st.cache_data) recria pelo esquema
+        return (_linha, (self.colunas, tuple(self)))
+
+
+_esquemas = {}
+
+
+def esquema_linha(colunas):
+    """Subclasse de Linha para esta sequência de colunas, criada uma vez por processo"""
+    colunas = tuple(colunas)
+    classe = _esquemas.get(colunas)
+    if classe is None:
+        # Coluna repetida (ex: SELECT p.*, f.id) - vale a primeira, como no dict(zip(...))
+        indices = {}
+        for indice, coluna in enumerate(colunas):
+            indices.setdefault(coluna, indice)
+        classe = _esquemas[colunas] = type('Linha', (Linha,), {'__slots__': (), 'colunas': colunas, '_indices': indices})
+    return classe
+
+
+def _linha(colunas, valores):
+    return esquema_linha(colunas)(valores)
+
+
+def _lotes(cursor, lote):
+    while True:
+        linhas = cursor.fetchmany(lote)
+        if not linhas:
+            return
+        yield linhas
+
+
+class Consultas:
+    """Catálogo compilado para um dialeto + o único caminho de execução do Database"""
+
+    def __init__(self, dialeto):
+        self.dialeto = dialeto
+        self.sql = {nome: compilar(texto, dialeto) for nome, texto in SQL.items()}
+        self.usar_prepare = dialeto == 'postgres'
+        self.preparadas = {}
+        if self.usar_prepare:
+            for nome in PREPARADAS:
+                texto = SQL[nome].format(**MARCADORES[dialeto])
+                nome_servidor = 'q_' + nome.replace('.', '_').replace(':', '_').replace(',', '_')
+                num_params = texto.count('?')
+                execute = f'EXECUTE {nome_servidor}'
+                if num_params:
+                    execute += ' (' + ', '.join(['%s'] * num_params) + ')'
+                self.preparadas[nome] = (nome_servidor, f'PREPARE {nome_servidor} AS {_para_prepare(texto)}', execute)
+
+    def _preparar(self, conn, cursor, nome):
+        """Devolve o EXECUTE da consulta, fazendo o PREPARE na primeira vez em cada conexão"""
+        nome_servidor, prepare, execute = self.preparadas[nome]
+        if nome_servidor in conn.preparadas:
+            return execute
+        # O PREPARE pode cair no meio da transação de quem chama: o SAVEPOINT desfaz só ele,
+        # sem perder as escritas ainda não confirmadas feitas antes na mesma conexão
+        cursor.execute('SAVEPOINT preparar')
+        try:
+            cursor.execute(prepare)
+        except Exception as e:
+            # Ex: PgBouncer em modo transação não mantém prepared statements
+            print(f"⚠️ PREPARE indisponível ({e}) - usando SQL direto")
+            cursor.execute('ROLLBACK TO SAVEPOINT preparar')
+            cursor.execute('RELEASE SAVEPOINT preparar')
+            self.usar_prepare = False
+            return self.sql[nome]
+        cursor.execute('RELEASE SAVEPOINT preparar')
+        conn.preparadas.add(nome_servidor)
+        return execute
+
+    def executar(self, conn, nome, params=()):
+        """Executa a consulta do catálogo e devolve o cursor"""
+        cursor = conn.cursor()
+        if self.usar_prepare and nome in self.preparadas:
+            cursor.execute(self._preparar(conn, cursor, nome), params)
+        else:
+            cursor.execute(self.sql[nome], params)
+        return cursor
+
+    def listar(self, conn, nome, params=()):
+        """Executa e converte as linhas em dicionários (lote a lote - sem a cópia do fetchall)"""
+        cursor = self.executar(conn, nome, params)
+        colunas = [desc[0] for desc in cursor.description]
+        linhas = []
+        for lote in _lotes(cursor, LOTE):
+            linhas.extend(dict(zip(colunas, row)) for row in lote)
+        return linhas
+
+    def _cursor_streaming(self, conn, nome, params, lote):
+        """Cursor do qual as linhas chegam aos poucos.
+
+        No PostgreSQL é um cursor nomeado (DECLARE no servidor): o resultado fica no
+        banco e vem `lote` linhas por ida. Não passa pelo PREPARE - o DECLARE não
+        aceita EXECUTE. No SQLite o cursor comum já lê sob demanda.
+        """
+        if self.dialeto == 'postgres':
+            cursor = conn.cursor(name=f"stream_{next(_cursores)}")
+            cursor.itersize = lote
+            cursor.execute(self.sql[nome], params)
+            return cursor
+        return self.executar(conn, nome, params)
+
+    def iterar(self, conn, nome, params=(), lote=LOTE):
+        """Gera as linhas como Linha, no máximo `lote` delas em memória por vez.
+
+        A conexão fica ocupada até o gerador terminar (ou ser fechado).
+        """
+        cursor = self._cursor_streaming(conn, nome, params, lote)
+        try:
+            classe = None
+            for linhas in _lotes(cursor, lote):
+                if classe is None:
+                    classe = esquema_linha(desc[0] for desc in cursor.description)
+                for row in linhas:
+                    yield classe(row)
+        finally:
+            cursor.close()
+
+    def dataframe(self, conn, nome, params=(), lote=LOTE):
+        """pandas.DataFrame do resultado, montado coluna a coluna a cada lote.
+
+        Nenhuma linha vira dict nem fica guardada além do lote atual; cada coluna
+        é uma lista só, que o pandas converte uma vez. Colunas de data saem como datetime64.
+        """
+        import pandas as pd  # só o app e o painel usam - a vitrine e as CLIs não carregam o pandas
+
+        cursor = self._cursor_streaming(conn, nome, params, lote)
+        try:
+            colunas = None
+            valores = None
+            for linhas in _lotes(cursor, lote):
+                if colunas is None:
+                    colunas = [desc[0] for desc in cursor.description]
+                    valores = [[] for _ in colunas]
+                for lista, coluna in zip(valores, zip(*linhas)):
+                    lista.extend(coluna)
+            if colunas is None:
+                # Sem linhas: o cursor nomeado só descreve as colunas depois do primeiro fetch
+                colunas = [desc[0] for desc in cursor.description or ()]
+                valores = [[] for _ in colunas]
+            dados = {}
+            for coluna, lista in zip(colunas, valores):
+                # Colunas de data (date/datetime nos dois dialetos) viram datetime64
+                primeiro = next((valor for valor in lista if valor is not None), None)
+                dados[coluna] = pd.to_datetime(lista) if isinstance(primeiro, datetime.date) else lista
+            return pd.DataFrame(dados)
+        finally:
+            cursor.close()
+
+    def _variante(self, nome, filtros):
+        """Chave da combinação de LISTAGENS com os filtros preenchidos (None/'' = sem filtro) e seus parâmetros"""
+        ativos = [f for f in LISTAGENS[nome][1] if filtros.get(f)]
+        chave = f"{nome}:{','.join(ativos)}" if ativos else nome
+        return chave, tuple(filtros[f] for f in ativos)
+
+    def listar_filtrado(self, conn, nome, filtros):
+        """Escolhe a variante de LISTAGENS conforme os filtros preenchidos"""
+        chave, params = self._variante(nome, filtros)
+        return self.listar(conn, chave, params)
+
+    def listar_pagina(self, conn, nome, filtros, limite, cursor=None, direcao='proximos'):
+        """Uma página de uma listagem de PAGINADAS.
+
+        cursor é o par (data, id) que veio em 'anterior' ou 'proximo' da página mostrada, e
+        direcao ('proximos'/'anteriores') diz para que lado seguir. Devolve
+        {'itens': [...], 'anterior': cursor ou None, 'proximo': cursor ou None}.
+        """
+        chave, params = self._variante(nome, filtros)
+        if cursor is None:
+            direcao = 'proximos'
+            itens = self.listar(conn, f'{chave}|inicio', params + (limite + 1,))
+        else:
+            itens = self.listar(conn, f'{chave}|{direcao}', params + tuple(cursor) + (limite + 1,))
+
+        # Um a mais só para saber se a lista continua nessa direção
+        tem_mais = len(itens) > limite
+        itens = itens[:limite]
+        if direcao == 'anteriores':
+            itens.reverse()
+        if not itens:
+            return {'itens': [], 'anterior': None, 'proximo': None}
+
+        coluna_data, coluna_id = (coluna.split('.')[-1] for coluna in PAGINADAS[nome][:2])
+        tem_anterior = tem_mais if direcao == 'anteriores' else cursor is not None
+        tem_proximo = tem_mais if direcao == 'proximos' else True
+        return {
+            'itens': itens,
+            'anterior': (itens[0][coluna_data], itens[0][coluna_id]) if tem_anterior else None,
+            'proximo': (itens[-1][coluna_data], itens[-1][coluna_id]) if tem_proximo else None,
+        }
+
+    def inserir_lote(self, conn, nome, linhas):
+        """INSERT de várias linhas numa ida ao banco (até LOTE linhas por comando no PostgreSQL)"""
+        cursor = conn.cursor()
+        if self.dialeto == 'postgres':
+            execute_values(cursor, self.sql[nome], linhas, page_size=LOTE)
+        else:
+            cursor.executemany(self.sql[nome], linhas)
+        return cursor
+
+    def buscar_um(self, conn, nome, params=()):
+        return self.executar(conn, nome, params).fetchone()
+
+    def inserir(self, conn, nome, params):
+        """INSERT que devolve o id gerado - RETURNING no PostgreSQL, lastrowid no SQLite"""
+        cursor = self.executar(conn, nome, params)
+        if self.dialeto == 'postgres':
+            return cursor.fetchone()[0]
+        return cursor.lastrowid
+
+
+_compiladas = {}
+
+
+def para(dialeto):
+    """Catálogo compilado uma única vez por dialeto no processo"""
+    if dialeto not in _compiladas:
+        _compiladas[dialeto] = Consultas(dialeto)
+    return _compiladas[dialeto]
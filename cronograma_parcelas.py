@@ -0,0 +1,114 @@
+# =============================================
+# CRONOGRAMA DE PARCELAS DOS FINANCIAMENTOS
+# =============================================
+# As parcelas vencem mês a mês no dia do contrato (ou no último dia dos meses mais
+# curtos: contrato em 31/01 vence 28/02, 31/03, 30/04...). Os valores são divididos
+# em centavos e somam exatamente o valor financiado; os centavos que sobram da divisão
+# vão para as primeiras parcelas. O cronograma inteiro é gravado em um INSERT
+# ('parcelas.inserir_lote') em vez de um por parcela.
+#
+# Uso:
+#   python cronograma_parcelas.py medir [--repeticoes 5]   compara INSERT por parcela x em lote
+#                                                          no banco do DATABASE_URL (tudo desfeito com ROLLBACK)
+
+import argparse
+import datetime
+import itertools
+import statistics
+import time
+
+import numpy as np
+
+QUANTIDADES_MEDIDAS = (1, 6, 12, 24, 36, 48, 60, 120)
+
+
+def vencimentos(data_contrato, num_parcelas):
+    """datetime.date de cada parcela, do mês seguinte ao contrato em diante"""
+    meses = np.datetime64(data_contrato, 'M') + np.arange(1, num_parcelas + 1)
+    no_dia = meses.astype('datetime64[D]') + (data_contrato.day - 1)
+    ultimo_dia = (meses + 1).astype('datetime64[D]') - 1
+    return np.minimum(no_dia, ultimo_dia).tolist()
+
+
+def valores(valor_financiado, num_parcelas):
+    """Valor de cada parcela em reais, com soma igual ao financiado (arredondado ao centavo)"""
+    base, resto = divmod(round(valor_financiado * 100), num_parcelas)
+    centavos = np.full(num_parcelas, base)
+    centavos[:resto] += 1
+    return (centavos / 100).tolist()
+
+
+def gerar(financiamento_id, valor_financiado, num_parcelas, data_contrato):
+    """Linhas (financiamento_id, numero_parcela, valor_parcela, data_vencimento) para 'parcelas.inserir_lote'"""
+    if isinstance(data_contrato, str):
+        data_contrato = datetime.date.fromisoformat(data_contrato[:10])
+    elif isinstance(data_contrato, datetime.datetime):
+        data_contrato = data_contrato.date()
+    return list(zip(
+        itertools.repeat(financiamento_id),
+        range(1, num_parcelas + 1),
+        valores(valor_financiado, num_parcelas),
+        vencimentos(data_contrato, num_parcelas),
+    ))
+
+
+def _por_parcela(sql, conn, financiamento_id, valor_financiado, num_parcelas, data_contrato):
+    """Como add_financiamento gravava antes: um INSERT por parcela, vencimentos de 30 em 30 dias"""
+    valor_parcela = valor_financiado / num_parcelas
+    for i in range(num_parcelas):
+        data_vencimento = data_contrato + datetime.timedelta(days=30 * (i + 1))
+        sql.executar(conn, 'parcelas.inserir', (financiamento_id, i + 1, valor_parcela, data_vencimento))
+
+
+def _em_lote(sql, conn, financiamento_id, valor_financiado, num_parcelas, data_contrato):
+    sql.inserir_lote(conn, 'parcelas.inserir_lote', gerar(financiamento_id, valor_financiado, num_parcelas, data_contrato))
+
+
+def medir(repeticoes):
+    import consultas
+    from pool_conexoes import obter_pool
+
+    pool = obter_pool()
+    sql = consultas.para(pool.dialeto)
+    conn = pool.obter()
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT MIN(id) FROM veiculos')
+        veiculo_id = cursor.fetchone()[0]
+        conn.rollback()
+        if veiculo_id is None:
+            print("❌ O benchmark precisa de ao menos um veículo cadastrado")
+            return
+
+        def cronometrar(gravar, num_parcelas):
+            tempos = []
+            for _ in range(repeticoes):
+                if pool.dialeto == 'sqlite' and not conn.in_transaction:
+                    conn.cursor().execute('BEGIN')
+                financiamento_id = sql.inserir(conn, 'financiamentos.inserir', (
+                    veiculo_id, 'Benchmark', 100000.0, 10000.0, num_parcelas, datetime.date(2025, 1, 31), ''
+                ))
+                inicio = time.perf_counter()
+                gravar(sql, conn, financiamento_id, 90000.0, num_parcelas, datetime.date(2025, 1, 31))
+                tempos.append(time.perf_counter() - inicio)
+                conn.rollback()
+            return statistics.median(tempos) * 1000
+
+        print(f"⏱️ Gravação das parcelas ({pool.dialeto}, mediana de {repeticoes})")
+        print(f"{'parcelas':>8} | {'por parcela':>12} | {'em lote':>9} | ganho")
+        for num_parcelas in QUANTIDADES_MEDIDAS:
+            antes = cronometrar(_por_parcela, num_parcelas)
+            depois = cronometrar(_em_lote, num_parcelas)
+            print(f"{num_parcelas:>8} | {antes:>9.2f} ms | {depois:>6.2f} ms | {antes / depois:.1f}x")
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Cronograma de parcelas')
+    comandos = parser.add_subparsers(dest='comando', required=True)
+    p_medir = comandos.add_parser('medir')
+    p_medir.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    medir(args.repeticoes)
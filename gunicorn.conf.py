@@ -0,0 +1,38 @@
+# =============================================
+# CONFIGURAÇÃO DO GUNICORN DA VITRINE
+# =============================================
+# Perfil escolhido por VITRINE_PERFIL:
+#   threads (padrão)  gthread - cada worker atende VITRINE_THREADS requisições ao mesmo
+#                     tempo; um cliente lento ocupa uma thread, não o worker inteiro
+#   gevent            milhares de conexões por worker; requer `pip install gevent psycogreen`
+#   sync              um cliente por worker (configuração antiga) - só para comparação
+#
+# Uso: gunicorn --config gunicorn.conf.py vitrine_railway:app
+
+import os
+
+PERFIL = os.getenv('VITRINE_PERFIL', 'threads')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = {'threads': 'gthread', 'gevent': 'gevent', 'sync': 'sync'}[PERFIL]
+threads = int(os.getenv('VITRINE_THREADS', '8')) if PERFIL == 'threads' else 1
+worker_connections = int(os.getenv('VITRINE_CONEXOES', '500'))
+keepalive = 5
+timeout = 30
+accesslog = '-'
+errorlog = '-'
+
+# Logo/favicon são otimizados uma vez no master e compartilhados com os workers.
+# O gevent só faz o monkey patch dentro do worker, então nesse perfil cada worker importa o app.
+preload_app = PERFIL != 'gevent'
+
+# Conexões do pool de cada worker: uma por thread, ou um limite fixo no gevent
+os.environ.setdefault('DB_POOL_MAX', str(threads if PERFIL != 'gevent' else 20))
+
+
+def post_fork(server, worker):
+    if PERFIL == 'gevent':
+        # psycopg2 bloqueia o processo inteiro sem o patch - com ele, cede para outras greenlets
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
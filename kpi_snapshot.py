@@ -0,0 +1,107 @@
+# =============================================
+# KPIs MATERIALIZADOS (TABELA kpi_snapshot)
+# =============================================
+# A linha única de kpi_snapshot guarda os totais do dashboard. Os métodos de
+# escrita do Database chamam ajustar() antes do commit, então a linha muda na
+# mesma transação da escrita e o dashboard lê tudo em uma consulta.
+#
+# Uso:
+#   python kpi_snapshot.py verificar     compara a linha com o cálculo do zero
+#   python kpi_snapshot.py reconstruir   recalcula a linha do zero (recuperação)
+
+import sys
+
+import consultas
+
+COLUNAS = list(consultas.KPI_SNAPSHOT)
+
+# Diferença aceita entre snapshot e cálculo do zero (arredondamento de REAL)
+TOLERANCIA = 0.01
+
+
+def delta_status(status_antigo, status_novo, preco_entrada):
+    """Deltas de contagem/capital quando um veículo sai de um status e entra em outro"""
+    deltas = {}
+    if status_antigo == status_novo:
+        return deltas
+    for status, sinal in ((status_antigo, -1), (status_novo, 1)):
+        if status == 'Em estoque':
+            deltas['veiculos_estoque'] = deltas.get('veiculos_estoque', 0) + sinal
+            deltas['capital_estoque'] = deltas.get('capital_estoque', 0) + sinal * (preco_entrada or 0)
+        elif status == 'Vendido':
+            deltas['veiculos_vendidos'] = deltas.get('veiculos_vendidos', 0) + sinal
+    return deltas
+
+
+def somar(*varios):
+    """Junta dicts de deltas somando as colunas repetidas"""
+    total = {}
+    for deltas in varios:
+        for coluna, valor in deltas.items():
+            total[coluna] = total.get(coluna, 0) + valor
+    return total
+
+
+def ajustar(sql, conn, deltas):
+    """Soma os deltas à linha do snapshot - sem commit, roda na transação de quem chamou"""
+    if not any(deltas.values()):
+        return
+    sql.executar(conn, 'kpi_snapshot.ajustar', tuple(deltas.get(coluna, 0) for coluna in COLUNAS))
+
+
+def ler(sql, conn):
+    """A linha do snapshot como dict (None se a tabela ainda não foi criada/preenchida)"""
+    linhas = sql.listar(conn, 'kpi_snapshot.ler')
+    return linhas[0] if linhas else None
+
+
+def calcular(sql, conn):
+    """Os mesmos KPIs calculados do zero sobre as tabelas"""
+    return sql.listar(conn, 'kpi_snapshot.calcular')[0]
+
+
+def reconstruir(sql, conn):
+    """Recalcula a linha do zero em uma única transação"""
+    sql.executar(conn, 'kpi_snapshot.criar_linha')
+    sql.executar(conn, 'kpi_snapshot.reconstruir')
+    conn.commit()
+
+
+def verificar(sql, conn):
+    """{coluna: (snapshot, calculado)} para cada KPI fora da tolerância - vazio se consistente"""
+    snapshot = ler(sql, conn) or {}
+    calculado = calcular(sql, conn)
+    conn.rollback()
+    divergencias = {}
+    for coluna in COLUNAS:
+        valor = snapshot.get(coluna)
+        if valor is None or abs(float(valor) - float(calculado[coluna] or 0)) > TOLERANCIA:
+            divergencias[coluna] = (valor, calculado[coluna])
+    return divergencias
+
+
+if __name__ == '__main__':
+    from pool_conexoes import obter_pool
+
+    comando = sys.argv[1] if len(sys.argv) > 1 else 'verificar'
+    if comando not in ('verificar', 'reconstruir'):
+        print("Uso: python kpi_snapshot.py [verificar|reconstruir]")
+        sys.exit(2)
+
+    pool = obter_pool()
+    sql = consultas.para(pool.dialeto)
+    conn = pool.obter()
+    try:
+        if comando == 'reconstruir':
+            reconstruir(sql, conn)
+            print("✅ kpi_snapshot reconstruído do zero")
+
+        divergencias = verificar(sql, conn)
+        if divergencias:
+            for coluna, (snapshot, calculado) in divergencias.items():
+                print(f"❌ {coluna}: snapshot={snapshot} calculado={calculado}")
+            print("⚠️ Snapshot inconsistente - rode: python kpi_snapshot.py reconstruir")
+            sys.exit(1)
+        print("✅ kpi_snapshot consistente com as tabelas")
+    finally:
+        conn.close()
@@ -0,0 +1,590 @@
+# =============================================
+# MIGRAÇÕES VERSIONADAS DO SCHEMA
+# =============================================
+# Cada migração é (numero, descricao, passos). Um passo pode ser:
+#   - SQL comum, com {pk} e {blob} trocados pelo tipo de cada dialeto
+#   - dict {'postgres': ..., 'sqlite': ...} quando o SQL difere entre os bancos
+#   - função(cursor, dialeto) para passos que precisam de lógica
+# Migrações aplicadas ficam registradas em schema_version e nunca rodam de novo.
+# Para mudar o schema, ACRESCENTE uma migração no fim da lista - não edite as antigas.
+#
+# Uso: python migracoes.py               (aplica as pendentes no banco do DATABASE_URL ou no SQLite local)
+#      python migracoes.py mover-blobs   (passa fotos/documentos ainda no banco para o armazenamento)
+
+from armazenamento_blobs import obter_armazenamento
+
+TIPOS = {
+    'postgres': {'pk': 'SERIAL PRIMARY KEY', 'blob': 'BYTEA'},
+    'sqlite': {'pk': 'INTEGER PRIMARY KEY AUTOINCREMENT', 'blob': 'BLOB'},
+}
+
+# Chave do pg_advisory_lock que serializa app e vitrine migrando ao mesmo tempo
+LOCK_MIGRACOES = 7245001
+
+
+def adicionar_coluna(tabela, coluna, tipo):
+    """ADD COLUMN idempotente - bancos antigos já podem ter a coluna criada pelo código legado"""
+    def passo(cursor, dialeto):
+        tipo_sql = tipo.format(**TIPOS[dialeto])
+        if dialeto == 'postgres':
+            cursor.execute(f'ALTER TABLE {tabela} ADD COLUMN IF NOT EXISTS {coluna} {tipo_sql}')
+            return
+        cursor.execute(f'PRAGMA table_info({tabela})')
+        if coluna not in [col[1] for col in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo_sql}')
+    return passo
+
+
+def criar_indices(indices):
+    """CREATE INDEX IF NOT EXISTS para cada (nome, tabela, colunas) - mesma sintaxe nos dois bancos"""
+    return [f'CREATE INDEX IF NOT EXISTS {nome} ON {tabela} ({colunas})' for nome, tabela, colunas in indices]
+
+
+def colunas_blob(tabela, prefixo):
+    return [
+        adicionar_coluna(tabela, f'{prefixo}_hash', 'TEXT'),
+        adicionar_coluna(tabela, f'{prefixo}_tamanho', 'INTEGER'),
+        adicionar_coluna(tabela, f'{prefixo}_mime', 'TEXT'),
+    ]
+
+
+# Colunas BLOB cujo conteúdo `python migracoes.py mover-blobs` passa para o armazenamento:
+# (tabela, coluna, prefixo das colunas _hash/_tamanho/_mime, coluna com o nome do arquivo, vazio)
+BLOBS_NO_BANCO = [
+    ('veiculos', 'foto', 'foto', None, None),
+    ('documentos', 'arquivo', 'arquivo', 'nome_documento', None),
+    # documentos_financeiros.arquivo é NOT NULL: fica b'' no lugar do conteúdo
+    ('documentos_financeiros', 'arquivo', 'arquivo', 'nome_arquivo', b''),
+]
+
+
+def avisar_blobs_no_banco(cursor, dialeto):
+    """Só conta - mover o conteúdo para fora do banco é um comando explícito, nunca o boot"""
+    pendentes = 0
+    for tabela, coluna, prefixo, _, _ in BLOBS_NO_BANCO:
+        cursor.execute(f'SELECT COUNT(*) FROM {tabela} WHERE {coluna} IS NOT NULL AND {prefixo}_hash IS NULL')
+        pendentes += cursor.fetchone()[0]
+    if pendentes:
+        print(f"⚠️ {pendentes} arquivo(s) ainda dentro do banco - com BLOB_DIR num volume persistente, "
+              f"rode: python migracoes.py mover-blobs")
+
+
+def mover_blobs(conn, dialeto):
+    """Passa o conteúdo das colunas de BLOBS_NO_BANCO para o armazenamento, uma linha por transação.
+    O BLOB só é trocado por `vazio` depois que o arquivo gravado é relido e confere com o hash."""
+    armazenamento = obter_armazenamento()
+    if not armazenamento.persistente():
+        raise RuntimeError("BLOB_DIR precisa ser um caminho absoluto num volume persistente, "
+                           "compartilhado por app e vitrine - nada foi movido")
+
+    p = '%s' if dialeto == 'postgres' else '?'
+    cursor = conn.cursor()
+    movidos = 0
+    for tabela, coluna, prefixo, coluna_nome, vazio in BLOBS_NO_BANCO:
+        nome = f', {coluna_nome}' if coluna_nome else ''
+
+        # Só os ids primeiro: cada BLOB é lido sozinho, nunca a tabela inteira na memória
+        cursor.execute(f'SELECT id FROM {tabela} WHERE {coluna} IS NOT NULL AND {prefixo}_hash IS NULL')
+        ids = [row[0] for row in cursor.fetchall()]
+        for registro_id in ids:
+            cursor.execute(f'SELECT {coluna}{nome} FROM {tabela} WHERE id = {p}', (registro_id,))
+            row = cursor.fetchone()
+            if not row or not row[0]:
+                continue
+            blob = armazenamento.salvar(row[0], row[1] if coluna_nome else None)
+            if not armazenamento.conferir(blob.hash):
+                raise RuntimeError(f"cópia de {tabela} {registro_id} não confere com {blob.hash} - "
+                                   f"o conteúdo continua no banco")
+            cursor.execute(
+                f'UPDATE {tabela} SET {prefixo}_hash = {p}, {prefixo}_tamanho = {p}, {prefixo}_mime = {p}, '
+                f'{coluna} = {p} WHERE id = {p}',
+                (blob.hash, blob.tamanho, blob.mime, vazio, registro_id)
+            )
+            conn.commit()
+            movidos += 1
+        if ids:
+            print(f"📦 {len(ids)} arquivo(s) de {tabela}.{coluna} movido(s) para o armazenamento")
+    return movidos
+
+
+# Índices das chaves estrangeiras e das colunas usadas em WHERE/ORDER BY das listagens
+INDICES_V6 = [
+    ('idx_veiculos_status_cadastro', 'veiculos', 'status, data_cadastro'),
+    ('idx_veiculos_cadastro', 'veiculos', 'data_cadastro'),
+    ('idx_gastos_veiculo_data', 'gastos', 'veiculo_id, data'),
+    ('idx_vendas_veiculo', 'vendas', 'veiculo_id'),
+    ('idx_vendas_data', 'vendas', 'data_venda'),
+    ('idx_documentos_veiculo_upload', 'documentos', 'veiculo_id, data_upload'),
+    ('idx_fluxo_caixa_data', 'fluxo_caixa', 'data'),
+    ('idx_financiamentos_veiculo', 'financiamentos', 'veiculo_id'),
+    ('idx_parcelas_financiamento', 'parcelas', 'financiamento_id'),
+    ('idx_parcelas_status_vencimento', 'parcelas', 'status, data_vencimento'),
+]
+
+
+def criar_gatilhos(gatilhos):
+    """Executa a lista de comandos do dialeto - a sintaxe de gatilhos não tem nada em comum"""
+    def passo(cursor, dialeto):
+        for comando in gatilhos[dialeto]:
+            cursor.execute(comando)
+    return passo
+
+
+_INCREMENTAR_VERSAO = 'UPDATE inventario_versao SET versao = versao + 1 WHERE id = 1'
+
+# Toda escrita em veiculos incrementa inventario_versao (PostgreSQL: uma vez por instrução)
+GATILHOS_INVENTARIO = {
+    'postgres': [
+        f'''
+        CREATE OR REPLACE FUNCTION incrementar_inventario_versao() RETURNS trigger AS $$
+        BEGIN
+            {_INCREMENTAR_VERSAO};
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql
+        ''',
+        'DROP TRIGGER IF EXISTS trg_veiculos_versao ON veiculos',
+        '''
+        CREATE TRIGGER trg_veiculos_versao
+        AFTER INSERT OR UPDATE OR DELETE ON veiculos
+        FOR EACH STATEMENT EXECUTE PROCEDURE incrementar_inventario_versao()
+        ''',
+    ],
+    'sqlite': [
+        f'''
+        CREATE TRIGGER IF NOT EXISTS trg_veiculos_versao_{operacao.lower()} AFTER {operacao} ON veiculos
+        BEGIN {_INCREMENTAR_VERSAO}; END
+        '''
+        for operacao in ('INSERT', 'UPDATE', 'DELETE')
+    ],
+}
+
+# Ordenações da vitrine (/api/veiculos): só veículos em estoque, id desempata o cursor
+INDICES_V9 = [
+    ('idx_veiculos_status_preco', 'veiculos', 'status, preco_venda, id'),
+    ('idx_veiculos_status_ano', 'veiculos', 'status, ano, id'),
+    ('idx_veiculos_status_marca', 'veiculos', 'status, marca'),
+]
+
+# Paginação por cursor (data, id) das listagens do app - consultas.PAGINADAS
+INDICES_V11 = [
+    ('idx_veiculos_cadastro_id', 'veiculos', 'data_cadastro, id'),
+    ('idx_veiculos_status_cadastro_id', 'veiculos', 'status, data_cadastro, id'),
+    ('idx_vendas_data_id', 'vendas', 'data_venda, id'),
+    ('idx_documentos_upload_id', 'documentos', 'data_upload, id'),
+    ('idx_fluxo_caixa_data_id', 'fluxo_caixa', 'data, id'),
+    ('idx_contatos_data_id', 'contatos', 'data_contato, id'),
+    ('idx_parcelas_status_vencimento_id', 'parcelas', 'status, data_vencimento, id'),
+]
+
+# Catálogo de todos os índices secundários criados pelas migrações, por número da migração.
+# relatorio_planos.py remove todos eles para obter o plano "antes": um índice novo entra aqui
+# e a migração o cria com criar_indices(INDICES[n]).
+INDICES = {
+    6: INDICES_V6,
+    9: INDICES_V9,
+    11: INDICES_V11,
+}
+
+# Uma data NULL ficaria fora da comparação (data, id) > (?, ?) e sumiria das páginas seguintes
+PREENCHER_DATAS = [
+    'UPDATE veiculos SET data_cadastro = CURRENT_TIMESTAMP WHERE data_cadastro IS NULL',
+    'UPDATE vendas SET data_venda = CURRENT_TIMESTAMP WHERE data_venda IS NULL',
+    'UPDATE documentos SET data_upload = CURRENT_TIMESTAMP WHERE data_upload IS NULL',
+    {
+        'postgres': 'UPDATE contatos SET data_contato = COALESCE(CAST(data_registro AS DATE), CURRENT_DATE) WHERE data_contato IS NULL',
+        'sqlite': 'UPDATE contatos SET data_contato = COALESCE(date(data_registro), date(\'now\')) WHERE data_contato IS NULL',
+    },
+]
+
+
+# Colunas de data do SQLite gravadas em formatos variados ao longo do tempo (data com hora em
+# coluna DATE, data pura ou 'T' em coluna TIMESTAMP). O pool lê essas colunas como date/datetime
+# e as devolve como parâmetro no texto canônico; sem normalizar, o valor devolvido (ex: cursor
+# de paginação) não compararia igual ao gravado. No PostgreSQL as colunas já são tipadas.
+COLUNAS_DATE = [
+    ('gastos', 'data'),
+    ('fluxo_caixa', 'data'),
+    ('contatos', 'data_contato'),
+    ('financiamentos', 'data_contrato'),
+    ('parcelas', 'data_vencimento'),
+    ('parcelas', 'data_pagamento'),
+]
+
+COLUNAS_TIMESTAMP = [
+    ('veiculos', 'data_cadastro'),
+    ('gastos', 'data_registro'),
+    ('vendas', 'data_venda'),
+    ('documentos', 'data_upload'),
+    ('fluxo_caixa', 'data_registro'),
+    ('contatos', 'data_registro'),
+    ('usuarios', 'data_criacao'),
+    ('financiamentos', 'data_registro'),
+    ('documentos_financeiros', 'data_upload'),
+    ('logs_acesso', 'data_acesso'),
+    ('kpi_snapshot', 'atualizado_em'),
+    ('schema_version', 'aplicada_em'),
+]
+
+
+def normalizar_datas_sqlite(cursor, dialeto):
+    if dialeto != 'sqlite':
+        return
+    for tabela, coluna in COLUNAS_DATE:
+        # date() de um texto ilegível é NULL - a linha fica como está
+        cursor.execute(f'UPDATE {tabela} SET {coluna} = date({coluna}) WHERE {coluna} <> date({coluna})')
+    for tabela, coluna in COLUNAS_TIMESTAMP:
+        cursor.execute(f"UPDATE {tabela} SET {coluna} = replace({coluna}, 'T', ' ') WHERE {coluna} LIKE '____-__-__T%'")
+        cursor.execute(f"UPDATE {tabela} SET {coluna} = {coluna} || ' 00:00:00' "
+                       f"WHERE length({coluna}) = 10 AND date({coluna}) IS NOT NULL")
+
+
+MIGRACOES = [
+    (1, 'tabelas iniciais', [
+        '''
+        CREATE TABLE IF NOT EXISTS veiculos (
+            id {pk},
+            modelo TEXT NOT NULL,
+            ano INTEGER NOT NULL,
+            marca TEXT NOT NULL,
+            cor TEXT NOT NULL,
+            preco_entrada REAL NOT NULL,
+            preco_venda REAL NOT NULL,
+            fornecedor TEXT NOT NULL,
+            km INTEGER,
+            placa TEXT,
+            chassi TEXT,
+            combustivel TEXT,
+            cambio TEXT,
+            portas INTEGER,
+            observacoes TEXT,
+            data_cadastro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            status TEXT DEFAULT 'Em estoque'
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS gastos (
+            id {pk},
+            veiculo_id INTEGER NOT NULL,
+            tipo_gasto TEXT NOT NULL,
+            valor REAL NOT NULL,
+            data DATE NOT NULL,
+            descricao TEXT,
+            categoria TEXT,
+            data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS vendas (
+            id {pk},
+            veiculo_id INTEGER NOT NULL,
+            comprador_nome TEXT NOT NULL,
+            comprador_cpf TEXT,
+            comprador_endereco TEXT,
+            valor_venda REAL NOT NULL,
+            data_venda TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            contrato_path TEXT,
+            status TEXT DEFAULT 'Concluída',
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS documentos (
+            id {pk},
+            veiculo_id INTEGER NOT NULL,
+            nome_documento TEXT NOT NULL,
+            tipo_documento TEXT NOT NULL,
+            arquivo {blob},
+            data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            observacoes TEXT,
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS fluxo_caixa (
+            id {pk},
+            data DATE NOT NULL,
+            descricao TEXT NOT NULL,
+            tipo TEXT NOT NULL,
+            categoria TEXT,
+            valor REAL NOT NULL,
+            veiculo_id INTEGER,
+            status TEXT DEFAULT 'Pendente',
+            data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS contatos (
+            id {pk},
+            nome TEXT NOT NULL,
+            telefone TEXT,
+            email TEXT,
+            tipo TEXT,
+            veiculo_interesse TEXT,
+            data_contato DATE,
+            status TEXT DEFAULT 'Novo',
+            observacoes TEXT,
+            data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS usuarios (
+            id {pk},
+            username TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            nome TEXT NOT NULL,
+            email TEXT,
+            nivel_acesso TEXT DEFAULT 'usuario',
+            data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS financiamentos (
+            id {pk},
+            veiculo_id INTEGER NOT NULL,
+            tipo_financiamento TEXT NOT NULL,
+            valor_total REAL NOT NULL,
+            valor_entrada REAL,
+            num_parcelas INTEGER,
+            data_contrato DATE,
+            status TEXT DEFAULT 'Ativo',
+            observacoes TEXT,
+            data_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS parcelas (
+            id {pk},
+            financiamento_id INTEGER NOT NULL,
+            numero_parcela INTEGER NOT NULL,
+            valor_parcela REAL NOT NULL,
+            data_vencimento DATE NOT NULL,
+            data_pagamento DATE,
+            status TEXT DEFAULT 'Pendente',
+            forma_pagamento TEXT,
+            observacoes TEXT,
+            arquivo_comprovante {blob},
+            FOREIGN KEY (financiamento_id) REFERENCES financiamentos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS documentos_financeiros (
+            id {pk},
+            veiculo_id INTEGER,
+            financiamento_id INTEGER,
+            tipo_documento TEXT NOT NULL,
+            nome_arquivo TEXT NOT NULL,
+            arquivo {blob} NOT NULL,
+            data_upload TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            observacoes TEXT,
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id),
+            FOREIGN KEY (financiamento_id) REFERENCES financiamentos (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS logs_acesso (
+            id {pk},
+            usuario_id INTEGER,
+            username TEXT,
+            data_acesso TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ip_address TEXT,
+            sucesso BOOLEAN,
+            FOREIGN KEY (usuario_id) REFERENCES usuarios (id)
+        )
+        ''',
+    ]),
+    (2, 'coluna veiculos.margem_negociacao', [
+        adicionar_coluna('veiculos', 'margem_negociacao', 'REAL DEFAULT 30'),
+    ]),
+    (3, 'coluna veiculos.foto', [
+        adicionar_coluna('veiculos', 'foto', '{blob}'),
+    ]),
+    (4, 'coluna veiculos.renavam', [
+        # add_veiculo sempre gravou renavam, mas a coluna nunca foi criada pelo bootstrap
+        adicionar_coluna('veiculos', 'renavam', 'TEXT'),
+    ]),
+    (5, 'tabela kpi_snapshot', [
+        # Linha única (id = 1) com os KPIs do dashboard, mantida pelos métodos de escrita
+        '''
+        CREATE TABLE IF NOT EXISTS kpi_snapshot (
+            id INTEGER PRIMARY KEY,
+            receitas REAL NOT NULL DEFAULT 0,
+            qtd_vendas INTEGER NOT NULL DEFAULT 0,
+            despesas REAL NOT NULL DEFAULT 0,
+            outras_despesas REAL NOT NULL DEFAULT 0,
+            veiculos_total INTEGER NOT NULL DEFAULT 0,
+            veiculos_estoque INTEGER NOT NULL DEFAULT 0,
+            veiculos_vendidos INTEGER NOT NULL DEFAULT 0,
+            capital_estoque REAL NOT NULL DEFAULT 0,
+            total_pendente REAL NOT NULL DEFAULT 0,
+            parcelas_pendentes INTEGER NOT NULL DEFAULT 0,
+            atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        '''
+        INSERT INTO kpi_snapshot (
+            id, receitas, qtd_vendas, despesas, outras_despesas, veiculos_total,
+            veiculos_estoque, veiculos_vendidos, capital_estoque, total_pendente, parcelas_pendentes
+        )
+        SELECT 1,
+            (SELECT COALESCE(SUM(valor_venda), 0) FROM vendas),
+            (SELECT COUNT(*) FROM vendas),
+            (SELECT COALESCE(SUM(valor), 0) FROM gastos),
+            (SELECT COALESCE(SUM(valor), 0) FROM fluxo_caixa WHERE tipo = 'Saída' AND COALESCE(categoria, '') <> 'Vendas'),
+            (SELECT COUNT(*) FROM veiculos),
+            (SELECT COUNT(*) FROM veiculos WHERE status = 'Em estoque'),
+            (SELECT COUNT(*) FROM veiculos WHERE status = 'Vendido'),
+            (SELECT COALESCE(SUM(preco_entrada), 0) FROM veiculos WHERE status = 'Em estoque'),
+            (SELECT COALESCE(SUM(valor_parcela), 0) FROM parcelas WHERE status = 'Pendente'),
+            (SELECT COUNT(*) FROM parcelas WHERE status = 'Pendente')
+        WHERE NOT EXISTS (SELECT 1 FROM kpi_snapshot WHERE id = 1)
+        ''',
+    ]),
+    (6, 'índices de chaves estrangeiras e filtros', criar_indices(INDICES[6])),
+    (7, 'fotos e documentos no armazenamento de arquivos', [
+        # O banco passa a guardar só hash/tamanho/mime; o conteúdo vai para armazenamento_blobs.
+        # O conteúdo já gravado no banco NÃO é movido aqui: no boot o BLOB_DIR pode ser um disco
+        # efêmero e a cópia se perderia no próximo deploy. Isso é `python migracoes.py mover-blobs`.
+        *colunas_blob('veiculos', 'foto'),
+        *colunas_blob('documentos', 'arquivo'),
+        *colunas_blob('documentos_financeiros', 'arquivo'),
+        avisar_blobs_no_banco,
+    ]),
+    (8, 'tabela fotos_variantes', [
+        # Versões redimensionadas da foto de cada veículo (variantes_foto.py); origem é o
+        # foto_hash de que foram geradas
+        '''
+        CREATE TABLE IF NOT EXISTS fotos_variantes (
+            veiculo_id INTEGER NOT NULL,
+            variante TEXT NOT NULL,
+            formato TEXT NOT NULL,
+            origem TEXT NOT NULL,
+            hash TEXT NOT NULL,
+            tamanho INTEGER NOT NULL,
+            largura INTEGER,
+            altura INTEGER,
+            PRIMARY KEY (veiculo_id, variante, formato),
+            FOREIGN KEY (veiculo_id) REFERENCES veiculos (id)
+        )
+        ''',
+    ]),
+    (9, 'índices de ordenação da vitrine', criar_indices(INDICES[9])),
+    (10, 'versão do inventário (cache da vitrine)', [
+        # Linha única incrementada por gatilho a cada escrita em veiculos - vale também
+        # para escritas fora do Database. A vitrine usa o número na chave do cache da página.
+        'CREATE TABLE IF NOT EXISTS inventario_versao (id INTEGER PRIMARY KEY, versao INTEGER NOT NULL)',
+        'INSERT INTO inventario_versao (id, versao) SELECT 1, 1 WHERE NOT EXISTS (SELECT 1 FROM inventario_versao WHERE id = 1)',
+        criar_gatilhos(GATILHOS_INVENTARIO),
+    ]),
+    (11, 'paginação por cursor das listagens', PREENCHER_DATAS + criar_indices(INDICES[11])),
+    (12, 'datas do SQLite no formato ISO canônico', [normalizar_datas_sqlite]),
+]
+
+VERSAO_ATUAL = max(numero for numero, _, _ in MIGRACOES)
+
+
+def _executar_passo(cursor, dialeto, passo):
+    if callable(passo):
+        passo(cursor, dialeto)
+        return
+    if isinstance(passo, dict):
+        passo = passo[dialeto]
+    cursor.execute(passo.format(**TIPOS[dialeto]))
+
+
+def criar_tabela_versoes(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INTEGER PRIMARY KEY,
+            descricao TEXT,
+            aplicada_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def versoes_aplicadas(cursor):
+    cursor.execute('SELECT versao FROM schema_version')
+    return {row[0] for row in cursor.fetchall()}
+
+
+def versao_atual(conn):
+    """Maior versão registrada em schema_version (0 se o banco nunca foi migrado)"""
+    cursor = conn.cursor()
+    try:
+        cursor.execute('SELECT MAX(versao) FROM schema_version')
+        resultado = cursor.fetchone()
+        return (resultado[0] or 0) if resultado else 0
+    except Exception:
+        conn.rollback()
+        return 0
+
+
+def migrar(conn, dialeto):
+    """Aplica, em ordem e cada uma em sua transação, as migrações ainda não registradas"""
+    cursor = conn.cursor()
+    placeholder = '%s' if dialeto == 'postgres' else '?'
+    aplicadas_agora = []
+
+    if dialeto == 'postgres':
+        cursor.execute('SELECT pg_advisory_lock(%s)', (LOCK_MIGRACOES,))
+
+    try:
+        criar_tabela_versoes(cursor)
+        conn.commit()
+        aplicadas = versoes_aplicadas(cursor)
+
+        for numero, descricao, passos in MIGRACOES:
+            if numero in aplicadas:
+                continue
+
+            print(f"🔄 Aplicando migração {numero}: {descricao}...")
+            try:
+                if dialeto == 'sqlite' and not conn.in_transaction:
+                    cursor.execute('BEGIN')
+                for passo in passos:
+                    _executar_passo(cursor, dialeto, passo)
+                cursor.execute(
+                    f'INSERT INTO schema_version (versao, descricao) VALUES ({placeholder}, {placeholder})',
+                    (numero, descricao)
+                )
+                conn.commit()
+            except Exception as e:
+                print(f"❌ Erro na migração {numero}: {e}")
+                conn.rollback()
+                raise
+
+            aplicadas_agora.append(numero)
+            print(f"✅ Migração {numero} aplicada")
+    finally:
+        if dialeto == 'postgres':
+            cursor.execute('SELECT pg_advisory_unlock(%s)', (LOCK_MIGRACOES,))
+            conn.commit()
+
+    return aplicadas_agora
+
+
+if __name__ == '__main__':
+    import sys
+
+    from pool_conexoes import obter_pool
+
+    if sys.argv[1:] not in ([], ['mover-blobs']):
+        print("Uso: python migracoes.py [mover-blobs]")
+        sys.exit(2)
+
+    pool = obter_pool()
+    conn = pool.obter()
+    try:
+        if sys.argv[1:] == ['mover-blobs']:
+            print(f"✅ {mover_blobs(conn, pool.dialeto)} arquivo(s) movido(s) para o armazenamento")
+        else:
+            aplicadas = migrar(conn, pool.dialeto)
+            if aplicadas:
+                print(f"✅ {len(aplicadas)} migração(ões) aplicada(s) - schema na versão {versao_atual(conn)}")
+            else:
+                print(f"✅ Nada a fazer - schema na versão {versao_atual(conn)}")
+    finally:
+        conn.close()
@@ -0,0 +1,309 @@
+import datetime
+import numpy as np
+import pandas as pd
+
+# =============================================
+# MOTOR DE INDICADORES DO DASHBOARD
+# =============================================
+# Totais e contagens vêm da linha única de kpi_snapshot, mantida a cada escrita;
+# agrupamentos (por categoria, veículo e mês) e os números que dependem da data
+# de hoje vêm prontos do banco pelos métodos de agregado do Database. A única listagem
+# carregada é a do estoque atual, necessária para o envelhecimento por veículo - já
+# chega como DataFrame (Database.get_estoque_painel); sobre ela os KPIs saem de
+# groupby/merge vetorizados. O resultado é um único
+# ResultadoPainel que a aba lê.
+
+DIAS_PERIODO = 30
+DIAS_PARADO = 45
+FAIXAS_GIRO = ('0-30 dias', '31-60 dias', '61+ dias')
+
+COLUNAS_ESTOQUE = ['id', 'marca', 'modelo', 'status', 'preco_entrada', 'preco_venda', 'data_cadastro', 'custo_total']
+
+
+class ResultadoPainel:
+    """Todos os indicadores do Dashboard, calculados em uma única passada"""
+
+    __slots__ = ('dre', 'stats', 'metricas_periodo', 'giro', 'alertas',
+                 'rentabilidade', 'recomendacoes', 'saude', 'estoque')
+
+    def __init__(self, **campos):
+        for nome in self.__slots__:
+            setattr(self, nome, campos[nome])
+
+
+def carregar_agregados(db, hoje):
+    """Busca no banco todos os agregados que o painel usa - alguns KB, qualquer que seja o histórico"""
+    return {
+        'snapshot': db.get_kpi_snapshot(),
+        'gastos_por_categoria': db.get_gastos_por_categoria(),
+        'gastos_por_veiculo': db.get_gastos_por_veiculo(),
+        'periodos': db.get_vendas_periodos(hoje, DIAS_PERIODO),
+        'tempo_medio_giro': db.get_tempo_medio_giro(),
+        'vendidos_por_modelo': db.get_rentabilidade_vendidos(),
+        'parcelas': db.get_resumo_parcelas_pendentes(hoje),
+        'parcelas_por_mes': db.get_parcelas_pendentes_por_mes(),
+        'financiamentos': db.get_totais_financiamentos_ativos(),
+    }
+
+
+def _agrupar(df, chave, colunas):
+    """groupby na ordem de aparição (desempate igual ao dos loops antigos) -> dict de dicts"""
+    if df.empty:
+        return {}
+    agregado = df.groupby(chave, sort=False).agg(**colunas)
+    resultado = {}
+    for nome, linha in agregado.iterrows():
+        resultado[nome] = {
+            campo: int(valor) if campo == 'qtd' else float(valor)
+            for campo, valor in linha.items()
+        }
+    return resultado
+
+
+def _dre(totais):
+    receitas = float(totais['receitas'] or 0)
+    despesas = float(totais['despesas'] or 0)
+    outras_despesas = float(totais['outras_despesas'] or 0)
+
+    lucro_bruto = receitas - despesas
+    return {
+        'receitas': receitas,
+        'despesas': despesas,
+        'outras_despesas': outras_despesas,
+        'lucro_bruto': lucro_bruto,
+        'lucro_liquido': lucro_bruto - outras_despesas,
+    }
+
+
+def _stats(agregados):
+    snapshot = agregados['snapshot']
+    return {
+        'total_veiculos': int(snapshot['veiculos_total'] or 0),
+        'veiculos_estoque': int(snapshot['veiculos_estoque'] or 0),
+        'veiculos_vendidos': int(snapshot['veiculos_vendidos'] or 0),
+        'gastos_por_categoria': {k: float(v) for k, v in agregados['gastos_por_categoria'].items()},
+        'gastos_por_veiculo': {k: float(v) for k, v in agregados['gastos_por_veiculo'].items()},
+    }
+
+
+def _metricas_periodo(periodos):
+    faturamento_atual = float(periodos['faturamento_atual'] or 0)
+    faturamento_anterior = float(periodos['faturamento_anterior'] or 0)
+
+    if faturamento_anterior > 0:
+        variacao = ((faturamento_atual - faturamento_anterior) / faturamento_anterior) * 100
+    else:
+        variacao = 100 if faturamento_atual > 0 else 0
+
+    return {
+        'faturamento_atual': faturamento_atual,
+        'faturamento_anterior': faturamento_anterior,
+        'variacao': variacao,
+        'qtd_vendas': int(periodos['qtd_vendas'] or 0),
+        'qtd_anterior': int(periodos['qtd_anterior'] or 0),
+    }
+
+
+def _rentabilidade(vendidos_por_modelo, estoque):
+    """Ranking por modelo/marca: 'Vendidos' (realizado, do banco) e 'Em Estoque' (potencial)"""
+    vendidos = pd.DataFrame(vendidos_por_modelo, columns=['marca', 'modelo', 'qtd', 'lucro_total', 'soma_margens', 'total_vendido'])
+    vendidos['modelo_key'] = vendidos['marca'].astype(str) + ' ' + vendidos['modelo'].astype(str)
+
+    modelos_vendidos = {
+        linha.modelo_key: {
+            'lucro_total': float(linha.lucro_total),
+            'margem_media': float(linha.soma_margens) / int(linha.qtd),
+            'qtd': int(linha.qtd),
+            'preco_medio': float(linha.total_vendido) / int(linha.qtd),
+        }
+        for linha in vendidos.itertuples() if linha.qtd
+    }
+    # Marca = soma dos modelos; a margem média é recalculada pela soma das margens
+    por_marca = vendidos.groupby('marca', sort=False)[['qtd', 'lucro_total', 'soma_margens']].sum()
+    marcas_vendidas = {
+        marca: {
+            'lucro_total': float(linha['lucro_total']),
+            'margem_media': float(linha['soma_margens']) / int(linha['qtd']),
+            'qtd': int(linha['qtd']),
+        }
+        for marca, linha in por_marca.iterrows() if linha['qtd']
+    }
+
+    estoque = estoque.copy()
+    estoque['lucro'] = estoque['preco_venda'] - estoque['custo_total']
+    estoque['margem'] = np.where(estoque['custo_total'] > 0, estoque['lucro'] / estoque['custo_total'].where(estoque['custo_total'] > 0) * 100, 0)
+
+    base = {'lucro_total': ('lucro', 'sum'), 'margem_media': ('margem', 'mean'), 'qtd': ('lucro', 'size'),
+            'investimento_total': ('custo_total', 'sum')}
+    return {
+        'Vendidos': {'modelos': modelos_vendidos, 'marcas': marcas_vendidas},
+        'Em Estoque': {
+            'modelos': _agrupar(estoque, 'modelo_key', base),
+            'marcas': _agrupar(estoque, 'marca', base),
+        },
+    }
+
+
+def _giro(estoque, tempo_medio):
+    faixas = {
+        faixa: estoque.loc[estoque['_faixa'] == faixa, COLUNAS_ESTOQUE].to_dict('records')
+        for faixa in FAIXAS_GIRO
+    }
+    return {
+        'tempo_medio': float(tempo_medio or 0),
+        'faixas': faixas,
+        'total_estoque': len(estoque),
+    }
+
+
+def _alertas(estoque, dre, metricas_periodo):
+    alertas = []
+
+    # Alerta 1: Veículos parados > 45 dias
+    parados = estoque[estoque['_dias'] > DIAS_PARADO]
+    if len(parados):
+        capital_parado = float(parados['preco_entrada'].sum())
+        alertas.append({
+            'tipo': 'critico',
+            'icone': '⚠️',
+            'mensagem': f"{len(parados)} veículos acima de {DIAS_PARADO} dias em estoque (R$ {capital_parado:,.0f} em capital parado)"
+        })
+
+    # Alerta 2: Margem em queda
+    if dre['lucro_liquido'] > 0:
+        margem_atual = (dre['lucro_liquido'] / dre['receitas'] * 100) if dre['receitas'] > 0 else 0
+        if margem_atual < 10:
+            alertas.append({
+                'tipo': 'atencao',
+                'icone': '📉',
+                'mensagem': f"Margem em {margem_atual:.1f}% - abaixo da meta recomendada (15%)"
+            })
+
+    # Alerta 3: Queda de vendas
+    if metricas_periodo['variacao'] < 0:
+        alertas.append({
+            'tipo': 'atencao',
+            'icone': '⬇️',
+            'mensagem': f"Vendas caíram {abs(metricas_periodo['variacao']):.1f}% vs período anterior"
+        })
+
+    # Alerta 4: Modelo com mais unidades no estoque atual
+    if len(estoque):
+        unidades = estoque.groupby('modelo_key', sort=False).size()
+        top_modelo = unidades.idxmax()
+        alertas.append({
+            'tipo': 'positivo',
+            'icone': '🔥',
+            'mensagem': f"Modelo {top_modelo} tem {int(unidades[top_modelo])} unidades em estoque"
+        })
+
+    return alertas
+
+
+def _recomendacoes(rentabilidade, giro):
+    recomendacoes = []
+    vendidos = rentabilidade['Vendidos']['modelos']
+    em_estoque = rentabilidade['Em Estoque']['modelos']
+
+    # Recomendação 1: Modelo com melhor margem histórica para priorizar compras
+    if vendidos:
+        top_historico = max(vendidos.items(), key=lambda x: x[1]['margem_media'])
+        recomendacoes.append({
+            'icone': '📈',
+            'titulo': 'Foco em compras',
+            'descricao': f"Modelo {top_historico[0]} tem melhor margem histórica ({top_historico[1]['margem_media']:.1f}%)"
+        })
+
+    # Recomendação 2: Veículos com melhor margem potencial no estoque
+    if em_estoque:
+        top_estoque = max(em_estoque.items(), key=lambda x: x[1]['margem_media'])
+        recomendacoes.append({
+            'icone': '💰',
+            'titulo': 'Priorizar vendas',
+            'descricao': f"Modelo {top_estoque[0]} tem melhor margem potencial no estoque"
+        })
+
+    # Recomendação 3: Reduzir preço de modelos lentos
+    lentos = giro['faixas']['61+ dias']
+    if lentos:
+        preco_medio_lentos = sum(v['preco_venda'] for v in lentos) / len(lentos)
+        recomendacoes.append({
+            'icone': '🏷️',
+            'titulo': 'Acelerar giro',
+            'descricao': f"Reduzir preço de {len(lentos)} veículos parados (média R$ {preco_medio_lentos:,.0f})"
+        })
+
+    # Recomendação 4: Modelos com baixo desempenho para revisar estratégia
+    if any(d['margem_media'] < 5 and d['qtd'] > 0 for d in em_estoque.values()):
+        pior = min(em_estoque.items(), key=lambda x: x[1]['margem_media'])
+        recomendacoes.append({
+            'icone': '⚠️',
+            'titulo': 'Revisar estratégia',
+            'descricao': f"Modelo {pior[0]} com margem potencial baixa ({pior[1]['margem_media']:.1f}%)"
+        })
+
+    return recomendacoes[:4]
+
+
+def _saude(parcelas, parcelas_por_mes, financiamentos, hoje):
+    total_pendente = float(parcelas['total_pendente'] or 0)
+    total_vencido = float(parcelas['total_vencido'] or 0)
+    taxa_inadimplencia = (total_vencido / total_pendente * 100) if total_pendente > 0 else 0
+
+    previsao = []
+    primeiro_dia = hoje.replace(day=1)
+    for i in range(1, 4):
+        mes = (primeiro_dia + datetime.timedelta(days=32 * i)).replace(day=1)
+        previsao.append({
+            'mes': mes.strftime('%b/%Y'),
+            'valor': float(parcelas_por_mes.get(mes.strftime('%Y-%m'), 0) or 0),
+        })
+
+    return {
+        'total_financiado': float(financiamentos['total'] or 0),
+        'carteira_ativa': int(financiamentos['qtd'] or 0),
+        'taxa_inadimplencia': taxa_inadimplencia,
+        'dias_medio_atraso': float(parcelas['dias_medio_atraso'] or 0),
+        'previsao': previsao,
+        'total_pendente': total_pendente,
+    }
+
+
+def calcular_painel(estoque, agregados, hoje=None):
+    """Calcula todos os KPIs do Dashboard a partir do estoque atual (DataFrame ou lista de dicts) e dos agregados do banco"""
+    hoje = hoje or datetime.date.today()
+
+    df_estoque = pd.DataFrame(estoque)
+    for coluna in COLUNAS_ESTOQUE:
+        if coluna not in df_estoque.columns:
+            df_estoque[coluna] = None
+    for coluna in ('preco_entrada', 'preco_venda', 'custo_total'):
+        df_estoque[coluna] = pd.to_numeric(df_estoque[coluna], errors='coerce').fillna(0.0)
+    df_estoque['modelo_key'] = df_estoque['marca'].astype(str) + ' ' + df_estoque['modelo'].astype(str)
+
+    # data_cadastro já chega como datetime64 (ou date/datetime numa lista de dicts); sem data conta como hoje
+    cadastro = pd.to_datetime(df_estoque['data_cadastro']).dt.normalize()
+    df_estoque['_dias'] = (pd.Timestamp(hoje) - cadastro).dt.days.fillna(0)
+    df_estoque['_faixa'] = np.select(
+        [df_estoque['_dias'] <= 30, df_estoque['_dias'] <= 60], FAIXAS_GIRO[:2], default=FAIXAS_GIRO[2]
+    )
+
+    dre = _dre(agregados['snapshot'])
+    metricas_periodo = _metricas_periodo(agregados['periodos'])
+    giro = _giro(df_estoque, agregados['tempo_medio_giro'])
+    rentabilidade = _rentabilidade(agregados['vendidos_por_modelo'], df_estoque)
+
+    return ResultadoPainel(
+        dre=dre,
+        stats=_stats(agregados),
+        metricas_periodo=metricas_periodo,
+        giro=giro,
+        alertas=_alertas(df_estoque, dre, metricas_periodo),
+        rentabilidade=rentabilidade,
+        recomendacoes=_recomendacoes(rentabilidade, giro),
+        saude=_saude(agregados['parcelas'], agregados['parcelas_por_mes'], agregados['financiamentos'], hoje),
+        estoque={
+            'investido': float(df_estoque['preco_entrada'].sum()),
+            'potencial': float(df_estoque['preco_venda'].sum()),
+        },
+    )
@@ -0,0 +1,269 @@
+import datetime
+import os
+import sqlite3
+import threading
+import time
+import psycopg2
+import psycopg2.extensions
+
+# =============================================
+# POOL DE CONEXÕES COMPARTILHADO PELO PROCESSO
+# =============================================
+# Configuração via variáveis de ambiente:
+#   DB_POOL_MIN        conexões abertas já na criação do pool (padrão 1)
+#   DB_POOL_MAX        máximo de conexões simultâneas (padrão 10)
+#   DB_POOL_TIMEOUT    segundos esperando uma conexão livre (padrão 30)
+#   DB_POOL_PING_APOS  conexões ociosas há mais que isso são testadas com SELECT 1 (padrão 30)
+#   DB_SSLMODE         sslmode do PostgreSQL (padrão require; 'disable' para um banco local de teste)
+#
+# Seguro com fork (gunicorn --preload): o processo filho descarta o pool herdado
+# e cria o seu na primeira conexão pedida.
+#
+# Datas saem do banco já como datetime.date (colunas DATE) e datetime.datetime
+# (colunas TIMESTAMP) nos dois dialetos: o psycopg2 faz isso sozinho, e no SQLite
+# os conversores abaixo leem o texto ISO pelo tipo declarado da coluna.
+
+SQLITE_PATH = "canal_automotivo.db"
+
+
+def _ler_date(valor):
+    try:
+        return datetime.date.fromisoformat(valor[:10].decode())
+    except ValueError:
+        return None
+
+
+def _ler_timestamp(valor):
+    try:
+        return datetime.datetime.fromisoformat(valor.decode())
+    except ValueError:
+        return None
+
+
+# Gravação no mesmo texto que str() produz - o formato que já está no banco, então
+# um valor lido e devolvido como parâmetro (ex: cursor de paginação) compara igual
+sqlite3.register_adapter(datetime.date, datetime.date.isoformat)
+sqlite3.register_adapter(datetime.datetime, lambda valor: valor.isoformat(' '))
+sqlite3.register_converter('DATE', _ler_date)
+sqlite3.register_converter('TIMESTAMP', _ler_timestamp)
+
+
+class ErroPool(Exception):
+    """Nenhuma conexão disponível dentro do tempo limite"""
+
+
+class ConexaoPool:
+    """Conexão emprestada do pool - close() devolve ao pool em vez de fechar"""
+
+    def __init__(self, pool, entrada):
+        self._pool = pool
+        self._entrada = entrada
+        self.dialeto = pool.dialeto
+
+    @property
+    def bruta(self):
+        """Conexão psycopg2/sqlite3 original"""
+        return self._entrada.conn
+
+    @property
+    def preparadas(self):
+        """Nomes dos PREPARE já feitos nesta conexão física (PostgreSQL)"""
+        return self._entrada.preparadas
+
+    def close(self):
+        if self.__dict__.get('_entrada') is not None:
+            entrada, self._entrada = self._entrada, None
+            self._pool.devolver(entrada)
+
+    def __getattr__(self, nome):
+        entrada = self.__dict__.get('_entrada')
+        if entrada is None:
+            raise psycopg2.InterfaceError("conexão já devolvida ao pool")
+        return getattr(entrada.conn, nome)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, tb):
+        self.close()
+
+    def __del__(self):
+        # Rede de segurança para métodos que esquecem o close()
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class _Entrada:
+    __slots__ = ('conn', 'ultimo_uso', 'preparadas')
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ultimo_uso = time.monotonic()
+        # Prepared statements vivem na sessão do servidor - somem junto com a conexão
+        self.preparadas = set()
+
+
+class PoolConexoes:
+    """Pool thread-safe com o mesmo comportamento para PostgreSQL e SQLite"""
+
+    def __init__(self, database_url=None, sqlite_path=SQLITE_PATH, minimo=None, maximo=None,
+                 timeout=None, ping_apos=None):
+        self.database_url = database_url
+        self.sqlite_path = sqlite_path
+        self.minimo = int(minimo if minimo is not None else os.getenv('DB_POOL_MIN', '1'))
+        self.maximo = max(1, int(maximo if maximo is not None else os.getenv('DB_POOL_MAX', '10')))
+        self.timeout = float(timeout if timeout is not None else os.getenv('DB_POOL_TIMEOUT', '30'))
+        self.ping_apos = float(ping_apos if ping_apos is not None else os.getenv('DB_POOL_PING_APOS', '30'))
+        self.sslmode = os.getenv('DB_SSLMODE', 'require')
+
+        self._cond = threading.Condition()
+        self._ociosas = []
+        self._abertas = 0
+
+        self.dialeto = 'sqlite'
+        primeira = None
+        if database_url and database_url.startswith('postgresql://'):
+            print("✅ Conectando ao PostgreSQL (pool)...")
+            try:
+                self.dialeto = 'postgres'
+                primeira = self._conectar()
+                print("🎉 PostgreSQL conectado com sucesso!")
+            except Exception as e:
+                print(f"❌ Erro PostgreSQL: {e}")
+                self.dialeto = 'sqlite'
+        if self.dialeto == 'sqlite':
+            print("🔄 Usando SQLite...")
+            primeira = self._conectar()
+
+        self._abertas = 1
+        self._ociosas.append(_Entrada(primeira))
+        for _ in range(min(self.minimo, self.maximo) - 1):
+            self._abertas += 1
+            self._ociosas.append(_Entrada(self._conectar()))
+
+        print(f"🏊 Pool {self.dialeto} pronto (min={self.minimo}, max={self.maximo})")
+
+    def _conectar(self):
+        if self.dialeto == 'postgres':
+            return psycopg2.connect(self.database_url, sslmode=self.sslmode)
+        return sqlite3.connect(self.sqlite_path, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def _saudavel(self, entrada):
+        """Health check no checkout: conexões fechadas ou mortas são descartadas"""
+        conn = entrada.conn
+        if self.dialeto == 'postgres' and conn.closed:
+            return False
+        if time.monotonic() - entrada.ultimo_uso < self.ping_apos:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT 1')
+            cursor.fetchone()
+            cursor.close()
+            conn.rollback()
+            return True
+        except Exception as e:
+            print(f"⚠️ Conexão do pool descartada no health check: {e}")
+            return False
+
+    def _descartar(self, entrada):
+        try:
+            entrada.conn.close()
+        except Exception:
+            pass
+        with self._cond:
+            self._abertas -= 1
+            self._cond.notify()
+
+    def obter(self):
+        """Empresta uma conexão; bloqueia até timeout se o pool estiver no máximo"""
+        limite = time.monotonic() + self.timeout
+        while True:
+            entrada = None
+            with self._cond:
+                while not self._ociosas and self._abertas >= self.maximo:
+                    restante = limite - time.monotonic()
+                    if restante <= 0 or not self._cond.wait(restante):
+                        raise ErroPool(f"Nenhuma conexão livre em {self.timeout:.0f}s (max={self.maximo})")
+                if self._ociosas:
+                    entrada = self._ociosas.pop()
+                else:
+                    self._abertas += 1
+
+            if entrada is None:
+                try:
+                    entrada = _Entrada(self._conectar())
+                except Exception:
+                    with self._cond:
+                        self._abertas -= 1
+                        self._cond.notify()
+                    raise
+            elif not self._saudavel(entrada):
+                self._descartar(entrada)
+                continue
+
+            return ConexaoPool(self, entrada)
+
+    def devolver(self, entrada):
+        """Recebe a conexão de volta, encerrando qualquer transação pendente"""
+        conn = entrada.conn
+        try:
+            if self.dialeto == 'postgres':
+                if conn.closed:
+                    raise psycopg2.InterfaceError("conexão fechada")
+                if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            elif conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self._descartar(entrada)
+            return
+
+        entrada.ultimo_uso = time.monotonic()
+        with self._cond:
+            self._ociosas.append(entrada)
+            self._cond.notify()
+
+    def fechar_todas(self):
+        """Fecha as conexões ociosas (ex: no desligamento do processo)"""
+        with self._cond:
+            ociosas, self._ociosas = self._ociosas, []
+            self._abertas -= len(ociosas)
+            self._cond.notify_all()
+        for entrada in ociosas:
+            try:
+                entrada.conn.close()
+            except Exception:
+                pass
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Pools herdados do processo pai num fork. O filho não pode usar essas conexões nem
+# fechá-las (o close manda o Terminate pelo socket compartilhado e derruba a sessão do
+# pai), então elas ficam referenciadas aqui e nunca são coletadas.
+_pools_herdados = []
+
+
+def _apos_fork_no_filho():
+    global _pool, _pool_lock
+    if _pool is not None:
+        _pools_herdados.append(_pool)
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_apos_fork_no_filho)
+
+
+def obter_pool():
+    """Pool único do processo (sessões do Streamlit, threads de um worker da vitrine)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = PoolConexoes(os.getenv('DATABASE_URL'))
+    return _pool
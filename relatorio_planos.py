@@ -0,0 +1,83 @@
+# =============================================
+# RELATÓRIO DE PLANOS DE CONSULTA - ANTES/DEPOIS DOS ÍNDICES
+# =============================================
+# Para cada listagem quente do catálogo, mostra o plano do banco sem os
+# índices secundários das migrações (migracoes.INDICES: 6, 9 e 11) e com
+# eles. O "antes" é obtido removendo todos esses índices dentro de uma
+# transação que termina em ROLLBACK - nada muda no banco.
+# No PostgreSQL o DROP INDEX trava a tabela até o ROLLBACK: rode fora do
+# horário de movimento. Com tabelas pequenas o PostgreSQL pode preferir
+# Seq Scan mesmo com índice; rode ANALYZE antes para estatísticas reais.
+#
+# Uso: python relatorio_planos.py > planos.txt
+
+import datetime
+
+import consultas
+from migracoes import INDICES
+from pool_conexoes import obter_pool
+
+HOJE = str(datetime.date.today())
+
+CONSULTAS_AMOSTRA = [
+    ('veiculos.listar', ()),
+    ('veiculos.listar:status', ('Em estoque',)),
+    ('veiculos.listar_com_custos:status', ('Em estoque',)),
+    ('gastos.listar:veiculo_id', (1,)),
+    ('vendas.listar', ()),
+    ('vendas.historico|inicio', (15,)),
+    ('vendas.periodos', (HOJE, HOJE, HOJE, HOJE, HOJE, HOJE)),
+    ('documentos.listar:veiculo_id', (1,)),
+    ('fluxo_caixa.listar:data_inicio,data_fim', (HOJE, HOJE)),
+    ('financiamentos.listar:veiculo_id', (1,)),
+    ('parcelas.listar:financiamento_id', (1,)),
+    ('parcelas.listar:status', ('Pendente',)),
+    ('parcelas.resumo_pendentes', (HOJE, HOJE, HOJE)),
+]
+
+
+def planos(conn, sql, dialeto):
+    """{nome: [linhas do plano]} para as consultas de amostra"""
+    prefixo = 'EXPLAIN ' if dialeto == 'postgres' else 'EXPLAIN QUERY PLAN '
+    cursor = conn.cursor()
+    resultado = {}
+    for nome, params in CONSULTAS_AMOSTRA:
+        cursor.execute(prefixo + sql.sql[nome], params)
+        # PostgreSQL: uma coluna de texto; SQLite: (id, pai, _, detalhe)
+        resultado[nome] = [linha[0] if dialeto == 'postgres' else linha[-1] for linha in cursor.fetchall()]
+    return resultado
+
+
+def gerar_relatorio(conn, dialeto):
+    sql = consultas.para(dialeto)
+    cursor = conn.cursor()
+
+    if dialeto == 'sqlite' and not conn.in_transaction:
+        cursor.execute('BEGIN')
+    for indices in INDICES.values():
+        for nome, _, _ in indices:
+            cursor.execute(f'DROP INDEX IF EXISTS {nome}')
+    antes = planos(conn, sql, dialeto)
+    conn.rollback()
+
+    depois = planos(conn, sql, dialeto)
+    conn.rollback()
+
+    linhas = [f"# Planos de consulta ({dialeto}) - {HOJE}", '']
+    for nome, _ in CONSULTAS_AMOSTRA:
+        linhas.append(f"## {nome}")
+        linhas.append('ANTES:')
+        linhas.extend(f"    {passo}" for passo in antes[nome])
+        linhas.append('DEPOIS:')
+        linhas.extend(f"    {passo}" for passo in depois[nome])
+        linhas.append('')
+    return '\n'.join(linhas)
+
+
+if __name__ == '__main__':
+    pool = obter_pool()
+    conn = pool.obter()
+    try:
+        print(gerar_relatorio(conn, pool.dialeto))
+    finally:
+        conn.close()
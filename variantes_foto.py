@@ -0,0 +1,139 @@
+# =============================================
+# VARIANTES REDIMENSIONADAS DAS FOTOS DOS VEÍCULOS
+# =============================================
+# Na hora do upload a foto original vai para o armazenamento e a geração das
+# variantes (card, detalhe e original reprocessada, cada uma em WebP e JPEG,
+# com a orientação EXIF aplicada) roda em segundo plano num pool de threads,
+# sem segurar o envio do formulário. Vitrine e lista de estoque pedem a menor
+# variante que cabe; enquanto ela não existe, a foto original é usada.
+# Cada variante guarda o hash da foto de origem: uma variante de foto antiga
+# nunca é servida depois da troca da foto.
+#
+# Uso: python variantes_foto.py gerar   (gera variantes das fotos que ainda não têm)
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, ImageOps
+
+import consultas
+from armazenamento_blobs import obter_armazenamento
+from pool_conexoes import obter_pool
+
+# Caixa máxima (largura, altura) de cada variante - None mantém o tamanho da foto.
+# Da maior para a menor: cada uma é reduzida a partir da anterior.
+VARIANTES = {
+    'original': None,
+    'detalhe': (1280, 960),
+    'card': (480, 360),
+}
+
+FORMATOS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+MIMES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+# Pillow libera o GIL ao decodificar/redimensionar/codificar
+TRABALHADORES = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variante_que_cabe(largura):
+    """Menor variante com largura suficiente para exibir em `largura` pixels"""
+    for nome in reversed(list(VARIANTES)):
+        caixa = VARIANTES[nome]
+        if caixa is None or caixa[0] >= largura:
+            return nome
+    return 'original'
+
+
+def gerar(conteudo):
+    """[(variante, formato, BlobSalvo, largura, altura)] a partir dos bytes/arquivo da foto"""
+    armazenamento = obter_armazenamento()
+    with Image.open(conteudo if hasattr(conteudo, 'read') else io.BytesIO(conteudo)) as aberta:
+        imagem = ImageOps.exif_transpose(aberta).convert('RGB')
+
+    resultado = []
+    for variante, caixa in VARIANTES.items():
+        if caixa is not None:
+            imagem = imagem.copy()
+            imagem.thumbnail(caixa, Image.Resampling.LANCZOS)
+        for formato, (formato_pil, opcoes) in FORMATOS.items():
+            saida = io.BytesIO()
+            imagem.save(saida, formato_pil, **opcoes)
+            saida.seek(0)
+            blob = armazenamento.salvar(saida)
+            resultado.append((variante, formato, blob, imagem.width, imagem.height))
+    return resultado
+
+
+def gerar_e_salvar(veiculo_id, hash_origem):
+    """Gera as variantes da foto `hash_origem` e registra em fotos_variantes.
+    Descarta o resultado se a foto do veículo mudou enquanto as variantes eram geradas."""
+    with obter_armazenamento().abrir(hash_origem) as arquivo:
+        variantes = gerar(arquivo)
+
+    pool = obter_pool()
+    sql = consultas.para(pool.dialeto)
+    conn = pool.obter()
+    try:
+        atual = sql.buscar_um(conn, 'veiculos.foto', (veiculo_id,))
+        if not atual or atual[0] != hash_origem:
+            conn.rollback()
+            return False
+        sql.executar(conn, 'fotos_variantes.excluir_por_veiculo', (veiculo_id,))
+        for variante, formato, blob, largura, altura in variantes:
+            sql.executar(conn, 'fotos_variantes.inserir', (
+                veiculo_id, variante, formato, hash_origem, blob.hash, blob.tamanho, largura, altura
+            ))
+        conn.commit()
+        return True
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def _executar(veiculo_id, hash_origem, ao_concluir):
+    try:
+        if gerar_e_salvar(veiculo_id, hash_origem):
+            print(f"🖼️ Variantes da foto do veículo {veiculo_id} geradas")
+            if ao_concluir:
+                ao_concluir()
+    except Exception as e:
+        print(f"❌ Erro ao gerar variantes da foto do veículo {veiculo_id}: {e}")
+
+
+def agendar(veiculo_id, hash_origem, ao_concluir=None):
+    """Gera as variantes em segundo plano; ao_concluir() roda depois do commit"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=TRABALHADORES, thread_name_prefix='variantes-foto')
+    return _executor.submit(_executar, veiculo_id, hash_origem, ao_concluir)
+
+
+if __name__ == '__main__':
+    import sys
+
+    if sys.argv[1:] != ['gerar']:
+        print("Uso: python variantes_foto.py gerar")
+        sys.exit(2)
+
+    pool = obter_pool()
+    conn = pool.obter()
+    try:
+        pendentes = consultas.para(pool.dialeto).executar(conn, 'fotos_variantes.pendentes').fetchall()
+    finally:
+        conn.close()
+
+    for veiculo_id, hash_origem in pendentes:
+        _executar(veiculo_id, hash_origem, None)
+    print(f"✅ {len(pendentes)} foto(s) processada(s)")
@@ -0,0 +1,208 @@
+// Comportamento da vitrine (vitrine_railway.py) - servido minificado em /static/<hash>.js.
+// vehicles e proximoCursor vêm do <script> de dados embutido na página.
+
+let compareList = [];
+let buscaAtual = 0;
+let temporizadorBusca = null;
+
+// Campos da barra lateral -> parâmetros de /api/veiculos
+const FILTROS = {
+    q: 'searchInput', marca: 'filterMarca', cambio: 'filterCambio', ordem: 'filterOrdem',
+    preco_min: 'filterPrecoMin', preco_max: 'filterPrecoMax',
+    ano_min: 'filterAnoMin', ano_max: 'filterAnoMax',
+    km_min: 'filterKmMin', km_max: 'filterKmMax'
+};
+
+// Header Scroll Effect
+window.addEventListener('scroll', () => {
+    const header = document.getElementById('mainHeader');
+    const textLogo = document.getElementById('textLogo');
+    if (window.scrollY > 100) {
+        header.classList.add('scrolled');
+        if(textLogo) textLogo.style.color = 'black';
+    } else {
+        header.classList.remove('scrolled');
+        if(textLogo) textLogo.style.color = 'white';
+    }
+});
+
+const FOTOS_PADRAO = {
+    card: 'https://images.unsplash.com/photo-1503376780353-7e6692767b70?w=1200&q=80',
+    detalhe: 'https://images.unsplash.com/photo-1549317661-bd32c8ce0729?w=1200&q=80'
+};
+
+// card nos cards e no comparador, detalhe no modal
+function fotoVeiculo(v, variante) {
+    return v.foto ? `/foto/${v.id}/${variante}?v=${v.foto}` : FOTOS_PADRAO[variante];
+}
+
+function formatPrice(p) {
+    return 'R$ ' + p.toLocaleString('pt-BR', {minimumFractionDigits: 2, maximumFractionDigits: 2});
+}
+
+function renderVehicles(list) {
+    const grid = document.getElementById('vehicleGrid');
+    grid.innerHTML = list.map(v => `
+        <div class="vehicle-card" onclick="openDetail(${v.id})">
+            <div class="card-img-box">
+                <img src="${fotoVeiculo(v, 'card')}" alt="${v.marca} ${v.modelo}" loading="lazy">
+            </div>
+            <div class="card-info">
+                <h3>${v.marca} ${v.modelo}</h3>
+                <div class="card-price-row">
+                    <div class="price-label">A partir de</div>
+                    <div class="price-value">${formatPrice(v.preco_venda)}</div>
+                </div>
+                <div class="card-specs">
+                    <span class="spec-tag">${v.ano}</span>
+                    <span class="spec-tag">${v.km.toLocaleString('pt-BR')} KM</span>
+                    <span class="spec-tag">${v.cambio}</span>
+                </div>
+                <button class="compare-btn-card ${compareList.some(c => c.id === v.id) ? 'active' : ''}" 
+                        onclick="event.stopPropagation(); toggleCompare(${v.id})">
+                    <svg width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" viewBox="0 0 24 24">
+                        <path d="M8 3 4 7l4 4M16 3l4 4-4 4M14 20V4M10 20V4"/>
+                    </svg>
+                    ${compareList.some(c => c.id === v.id) ? 'Remover da Comparação' : 'Comparar Modelo'}
+                </button>
+            </div>
+        </div>
+    `).join('');
+    document.getElementById('emptyState').style.display = list.length ? 'none' : 'block';
+    document.getElementById('loadMore').style.display = proximoCursor ? 'block' : 'none';
+}
+
+async function carregarVeiculos(anexar) {
+    const params = new URLSearchParams();
+    Object.entries(FILTROS).forEach(([param, id]) => {
+        const valor = document.getElementById(id).value.trim();
+        if (valor) params.set(param, valor);
+    });
+    if (anexar) params.set('cursor', proximoCursor);
+
+    // Só a resposta da busca mais recente é aplicada (digitação rápida gera várias)
+    const busca = ++buscaAtual;
+    const resposta = await fetch('/api/veiculos?' + params.toString());
+    if (!resposta.ok || busca !== buscaAtual) return;
+    const dados = await resposta.json();
+
+    vehicles = anexar ? vehicles.concat(dados.veiculos) : dados.veiculos;
+    proximoCursor = dados.proximo;
+    renderVehicles(vehicles);
+}
+
+function filterVehicles() {
+    clearTimeout(temporizadorBusca);
+    temporizadorBusca = setTimeout(() => carregarVeiculos(false), 250);
+}
+
+function loadMore() {
+    if (proximoCursor) carregarVeiculos(true);
+}
+
+function toggleCompare(id) {
+    const v = vehicles.find(x => x.id === id);
+    const index = compareList.findIndex(c => c.id === id);
+
+    if (index > -1) {
+        compareList.splice(index, 1);
+    } else if (compareList.length < 4) {
+        compareList.push(v);
+    } else {
+        alert('Máximo de 4 modelos para comparação.');
+    }
+
+    updateCompareUI();
+    renderVehicles(vehicles);
+}
+
+function updateCompareUI() {
+    const count = compareList.length;
+    document.getElementById('compareCount').textContent = count;
+    document.getElementById('compareCountTop').textContent = count;
+    document.getElementById('compareBar').style.display = count > 0 ? 'flex' : 'none';
+}
+
+function openDetail(id) {
+    const v = vehicles.find(x => x.id === id);
+    if (!v) return;
+
+    const modalContent = document.getElementById('modalContent');
+    modalContent.innerHTML = `
+        <div style="display:grid; grid-template-columns: 1.5fr 1fr; gap: 80px;">
+            <div>
+                <img src="${fotoVeiculo(v, 'detalhe')}" style="width:100%; border-radius:4px; margin-bottom:40px;">
+                <h4 style="text-transform:uppercase; font-size:14px; margin-bottom:20px; border-bottom:1px solid #eee; padding-bottom:10px;">Histórico e Condição</h4>
+                <p style="color:#666; line-height:1.8;">${v.history}</p>
+            </div>
+            <div>
+                <div style="text-transform:uppercase; letter-spacing:3px; font-size:12px; color:#999; margin-bottom:10px;">${v.marca}</div>
+                <h2 style="font-size:48px; font-weight:800; margin-bottom:30px; line-height:1;">${v.modelo}</h2>
+
+                <div style="background:#f9f9f9; padding:30px; margin-bottom:40px;">
+                    <div style="font-size:14px; color:#666; margin-bottom:5px;">Preço de Venda</div>
+                    <div style="font-size:36px; font-weight:800; color:var(--porsche-orange);">${formatPrice(v.preco_venda)}</div>
+                </div>
+
+                <div style="display:grid; grid-template-columns:1fr 1fr; gap:30px; margin-bottom:50px;">
+                    <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Ano</div><div style="font-weight:700;">${v.ano}</div></div>
+                    <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Quilometragem</div><div style="font-weight:700;">${v.km.toLocaleString('pt-BR')} KM</div></div>
+                    <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Câmbio</div><div style="font-weight:700;">${v.cambio}</div></div>
+                    <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Combustível</div><div style="font-weight:700;">${v.combustivel}</div></div>
+                </div>
+
+                <div style="margin-bottom:50px;">
+                    <h4 style="text-transform:uppercase; font-size:13px; margin-bottom:20px;">Destaques do Veículo</h4>
+                    <div style="display:grid; grid-template-columns:1fr 1fr; gap:12px;">
+                        ${v.optionals.map(opt => `<div style="font-size:13px; display:flex; align-items:center; gap:10px;"><span style="width:5px; height:5px; background:black; border-radius:50%;"></span>${opt}</div>`).join('')}
+                    </div>
+                </div>
+
+                <a href="https://wa.me/558430622434?text=Olá! Tenho interesse no ${v.marca} ${v.modelo}" target="_blank" class="hero-btn" style="background:black; color:white; width:100%; text-align:center; border:none;">Solicitar Proposta</a>
+            </div>
+        </div>
+    `;
+    document.getElementById('detailModal').classList.add('active');
+    document.body.style.overflow = 'hidden';
+}
+
+function closeModal() { document.getElementById('detailModal').classList.remove('active'); document.body.style.overflow = 'auto'; }
+
+function openCompare() {
+    if (compareList.length < 2) { alert('Selecione pelo menos 2 modelos.'); return; }
+    const container = document.getElementById('compareTableContainer');
+    let html = '<table style="width:100%; border-collapse:collapse; min-width:800px;">';
+    html += '<tr><th style="padding:20px; border-bottom:1px solid #eee; text-align:left; width:200px;">Especificações</th>';
+    compareList.forEach(v => {
+        html += `<td style="padding:20px; border-bottom:1px solid #eee;">
+            <img src="${fotoVeiculo(v, 'card')}" style="width:100%; height:150px; object-fit:cover; margin-bottom:15px;">
+            <div style="font-weight:800; font-size:18px;">${v.marca} ${v.modelo}</div>
+        </td>`;
+    });
+    html += '</tr>';
+
+    const fields = [
+        {label: 'Preço', key: 'preco_venda', fmt: formatPrice},
+        {label: 'Ano', key: 'ano'},
+        {label: 'KM', key: 'km', fmt: v => v.toLocaleString('pt-BR') + ' KM'},
+        {label: 'Câmbio', key: 'cambio'},
+        {label: 'Combustível', key: 'combustivel'},
+        {label: 'Cor', key: 'cor'}
+    ];
+
+    fields.forEach(f => {
+        html += `<tr><th style="padding:20px; border-bottom:1px solid #eee; text-align:left; font-size:12px; text-transform:uppercase; color:#999;">${f.label}</th>`;
+        compareList.forEach(v => {
+            html += `<td style="padding:20px; border-bottom:1px solid #eee; font-weight:600;">${f.fmt ? f.fmt(v[f.key]) : v[f.key]}</td>`;
+        });
+        html += '</tr>';
+    });
+    html += '</table>';
+    container.innerHTML = html;
+    document.getElementById('compareView').classList.add('active');
+    document.body.style.overflow = 'hidden';
+}
+
+function closeCompare() { document.getElementById('compareView').classList.remove('active'); document.body.style.overflow = 'auto'; }
+
+renderVehicles(vehicles);
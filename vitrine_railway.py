@@ -1,192 +1,370 @@
 import os
-import sqlite3
 import json
 import base64
+import hashlib
+import threading
+import time
 from datetime import datetime
-from flask import Flask, render_template_string, jsonify, request
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from flask import Flask, Response, abort, jsonify, request
 
-app = Flask(__name__)
+from armazenamento_blobs import obter_armazenamento
+from ativos_estaticos import AtivosEstaticos, carregar_imagens, carregar_textos
+from cache_respostas import CacheRespostas, escolher_codificacao
+from pool_conexoes import obter_pool
+from variantes_foto import MIMES, VARIANTES
+
+# /static é servido por servir_estatico a partir da memória, não de uma pasta
+app = Flask(__name__, static_folder=None)
+
+# Caracteres do hash da foto usados no ?v= das URLs de /foto
+VERSAO_FOTO = 16
 
 # =============================================
 # CONEXÃO COM BANCO DE DADOS
 # =============================================
 def get_db_connection():
-    """Conecta ao banco de dados (PostgreSQL Railway ou SQLite local)"""
-    database_url = os.environ.get('DATABASE_URL')
-
-    if database_url and database_url.startswith('postgresql://'):
-        # PostgreSQL no Railway
-        conn = psycopg2.connect(database_url, sslmode='require')
-        return conn
-    else:
-        # SQLite local (desenvolvimento)
-        conn = sqlite3.connect("canal_automotivo.db")
-        conn.row_factory = sqlite3.Row
-        return conn
+    """Conexão emprestada do pool do worker (PostgreSQL Railway ou SQLite local).
+    close() devolve ao pool; o pool é recriado em cada processo filho do gunicorn."""
+    return obter_pool().obter()
 
 # =============================================
-# FUNÇÃO AUXILIAR PARA PROCESSAR FOTOS
+# FUNÇÕES DE BANCO DE DADOS
 # =============================================
-def processar_foto(foto_data):
-    """Processa a foto independentemente do formato"""
-    if not foto_data:
+COLUNAS_VITRINE = '''
+    v.id, v.marca, v.modelo, v.ano, v.cor,
+    v.preco_venda, v.km, v.combustivel, v.cambio,
+    v.portas, v.observacoes, v.foto_hash, v.data_cadastro
+'''
+
+LIMITE_PAGINA = 24
+LIMITE_MAXIMO = 60
+
+# ordem: (coluna, direção) - o id desempata e entra no cursor junto com o valor da coluna
+ORDENACOES = {
+    'recentes': ('data_cadastro', 'DESC'),
+    'menor_preco': ('preco_venda', 'ASC'),
+    'maior_preco': ('preco_venda', 'DESC'),
+    'mais_novos': ('ano', 'DESC'),
+}
+
+# Tipo SQL do valor do cursor quando o parâmetro não chega com o tipo da coluna: preco_venda é
+# REAL (float4 no PostgreSQL) e o float do cliente vai como float8 - sem o CAST, o valor com
+# centavos não compara igual ao gravado e a página repete ou pula os empates
+TIPOS_CURSOR = {
+    'preco_venda': 'REAL',
+}
+
+# parâmetro: (coluna, operador, conversão)
+FAIXAS = {
+    'preco_min': ('preco_venda', '>=', float),
+    'preco_max': ('preco_venda', '<=', float),
+    'ano_min': ('ano', '>=', int),
+    'ano_max': ('ano', '<=', int),
+    'km_min': ('km', '>=', int),
+    'km_max': ('km', '<=', int),
+}
+
+
+def _placeholder(conn):
+    return '%s' if conn.dialeto == 'postgres' else '?'
+
+
+def _consultar(conn, sql, params=()):
+    """Linhas como dicts, igual nos dois bancos"""
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    colunas = [desc[0] for desc in cursor.description]
+    return [dict(zip(colunas, row)) for row in cursor.fetchall()]
+
+
+def codificar_cursor(ordem, valor, veiculo_id):
+    texto = json.dumps([ordem, valor, veiculo_id], default=str)
+    return base64.urlsafe_b64encode(texto.encode('utf-8')).decode('ascii')
+
+
+def decodificar_cursor(cursor, ordem):
+    """(valor, id) do último veículo da página anterior - ValueError se inválido"""
+    if not cursor:
         return None
-
     try:
-        # Se já for bytes (PostgreSQL bytea)
-        if isinstance(foto_data, bytes):
-            return base64.b64encode(foto_data).decode('utf-8')
-
-        # Se for memoryview (PostgreSQL)
-        if isinstance(foto_data, memoryview):
-            return base64.b64encode(foto_data.tobytes()).decode('utf-8')
-
-        # Se for string com \x (hex string)
-        if isinstance(foto_data, str):
-            if foto_data.startswith('\\x'):
-                try:
-                    hex_str = foto_data.replace('\\x', '')
-                    bytes_data = bytes.fromhex(hex_str)
-                    return base64.b64encode(bytes_data).decode('utf-8')
-                except:
-                    return None
-
-            if len(foto_data) > 100 and ('/' in foto_data or '+' in foto_data):
-                return foto_data
+        ordem_cursor, valor, veiculo_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except Exception:
+        raise ValueError('cursor inválido')
+    if ordem_cursor != ordem:
+        raise ValueError('cursor de outra ordenação')
+    return valor, int(veiculo_id)
+
+
+def filtros_da_requisicao(args):
+    """Filtros de /api/veiculos a partir da query string - ValueError se algum valor é inválido"""
+    filtros = {campo: args.get(campo, '').strip() or None for campo in ('marca', 'cambio', 'q')}
+    for campo, (_, _, converter) in FAIXAS.items():
+        valor = args.get(campo, '').strip()
+        if valor:
+            try:
+                filtros[campo] = converter(valor)
+            except ValueError:
+                raise ValueError(f'{campo} inválido')
+    return filtros
+
+
+class VeiculoVitrine:
+    """Só o que os cards, o detalhe e o comparador mostram - placa e chassi nunca saem do banco"""
+
+    __slots__ = ('id', 'marca', 'modelo', 'ano', 'cor', 'preco_venda', 'km',
+                 'cambio', 'combustivel', 'foto', 'optionals', 'history')
+
+    def __init__(self, linha):
+        self.id = linha['id']
+        self.marca = linha['marca']
+        self.modelo = linha['modelo']
+        self.ano = int(linha['ano']) if linha['ano'] else 2023
+        self.cor = linha['cor']
+        self.preco_venda = float(linha['preco_venda']) if linha['preco_venda'] else 0.0
+        self.km = int(linha['km']) if linha['km'] else 0
+        self.cambio = linha['cambio']
+        self.combustivel = linha['combustivel']
+        # O navegador monta /foto/<id>/<variante>?v=<foto>; None usa a imagem padrão
+        self.foto = linha['foto_hash'][:VERSAO_FOTO] if linha['foto_hash'] else None
+
+        portas = int(linha['portas']) if linha['portas'] else 4
+        observacoes = linha['observacoes']
+        opcionais = [item.strip() for item in observacoes.split(',')[:8]] if observacoes else []
+        opcionais.extend([f"Cambio {self.cambio}", f"{self.combustivel}", f"{portas} portas"])
+        self.optionals = list(dict.fromkeys(opcionais))[:10]
+
+        if self.km < 50000:
+            self.history = f"Veículo {self.marca} {self.modelo} {self.ano} em excelente estado."
+        else:
+            self.history = f"Veículo {self.marca} {self.modelo} {self.ano} com {self.km} km rodados. Bem conservado, pronto para uso."
 
-        return None
+    def como_dict(self):
+        return {campo: getattr(self, campo) for campo in self.__slots__}
 
-    except Exception as e:
-        print(f"❌ Erro ao processar foto: {e}")
-        return None
 
-# =============================================
-# FUNÇÕES DE BANCO DE DADOS
-# =============================================
-def get_veiculos_estoque():
-    """Busca veículos em estoque do banco"""
+# Colunas que alimentam VeiculoVitrine - se nenhuma mudou, o objeto guardado continua valendo
+CAMPOS_EXIBICAO = ('marca', 'modelo', 'ano', 'cor', 'preco_venda', 'km', 'cambio',
+                   'combustivel', 'portas', 'observacoes', 'foto_hash')
+MAXIMO_EXIBICAO = 2000
+
+# id -> (valores das colunas, VeiculoVitrine); o lock protege o despejo entre as
+# threads do worker (gthread), que iteraria o dict enquanto outra thread o altera
+_exibicao = {}
+_exibicao_lock = threading.Lock()
+
+
+def veiculo_vitrine(linha):
+    """VeiculoVitrine da linha, recalculado só quando o veículo mudou"""
+    assinatura = tuple(linha[campo] for campo in CAMPOS_EXIBICAO)
+    with _exibicao_lock:
+        guardado = _exibicao.get(linha['id'])
+    if guardado is not None and guardado[0] == assinatura:
+        return guardado[1]
+
+    veiculo = VeiculoVitrine(linha)
+    with _exibicao_lock:
+        while len(_exibicao) >= MAXIMO_EXIBICAO:
+            _exibicao.pop(next(iter(_exibicao)))
+        _exibicao[linha['id']] = (assinatura, veiculo)
+    return veiculo
+
+
+def buscar_veiculos(filtros, ordem='recentes', cursor=None, limite=LIMITE_PAGINA):
+    """Uma página de veículos em estoque e o cursor da próxima (None na última)"""
+    coluna, direcao = ORDENACOES[ordem]
     conn = None
     try:
         conn = get_db_connection()
-
-        if isinstance(conn, psycopg2.extensions.connection):
-            cursor = conn.cursor(cursor_factory=RealDictCursor)
-            cursor.execute('''
-                SELECT 
-                    v.id, v.marca, v.modelo, v.ano, v.cor, 
-                    v.preco_venda, v.km, v.combustivel, v.cambio, 
-                    v.portas, v.placa, v.chassi, v.observacoes, v.foto,
-                    v.data_cadastro, v.status
-                FROM veiculos v
-                WHERE v.status = 'Em estoque'
-                ORDER BY v.data_cadastro DESC
-            ''')
-            rows = cursor.fetchall()
-            veiculos = [dict(row) for row in rows]
-        else:
-            cursor = conn.cursor()
-            cursor.execute('''
-                SELECT 
-                    v.id, v.marca, v.modelo, v.ano, v.cor, 
-                    v.preco_venda, v.km, v.combustivel, v.cambio, 
-                    v.portas, v.placa, v.chassi, v.observacoes, v.foto,
-                    v.data_cadastro, v.status
-                FROM veiculos v
-                WHERE v.status = 'Em estoque'
-                ORDER BY v.data_cadastro DESC
-            ''')
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            veiculos = [dict(zip(columns, row)) for row in rows]
-
-        marcas_set = set()
-        for veiculo in veiculos:
-            veiculo['preco_venda'] = float(veiculo['preco_venda']) if veiculo.get('preco_venda') else 0.0
-            veiculo['foto_base64'] = processar_foto(veiculo.get('foto'))
-            veiculo['km'] = int(veiculo.get('km', 0)) if veiculo.get('km') else 0
-            veiculo['portas'] = int(veiculo.get('portas', 4)) if veiculo.get('portas') else 4
-            veiculo['ano'] = int(veiculo.get('ano', 2023)) if veiculo.get('ano') else 2023
-            veiculo['nome_completo'] = f"{veiculo['marca']} {veiculo['modelo']}"
-            veiculo['version'] = f"{veiculo['ano']} • {veiculo['combustivel']}"
-            
-            veiculo['optionals'] = []
-            if veiculo.get('observacoes'):
-                if ',' in veiculo['observacoes']:
-                    veiculo['optionals'] = [item.strip() for item in veiculo['observacoes'].split(',')[:8]]
-                else:
-                    veiculo['optionals'] = [veiculo['observacoes']] if veiculo['observacoes'] else []
-            
-            veiculo['optionals'].extend([
-                f"Cambio {veiculo['cambio']}",
-                f"{veiculo['combustivel']}",
-                f"{veiculo['portas']} portas"
-            ])
-            veiculo['optionals'] = list(dict.fromkeys(veiculo['optionals']))[:10]
-            veiculo['history'] = f"Veículo {veiculo['marca']} {veiculo['modelo']} {veiculo['ano']} em excelente estado." if veiculo['km'] < 50000 else f"Veículo {veiculo['marca']} {veiculo['modelo']} {veiculo['ano']} com {veiculo['km']} km rodados. Bem conservado, pronto para uso."
-            
-            if veiculo['km'] < 10000:
-                veiculo['badge'] = 'new'
-                veiculo['badgeText'] = 'Zero Km'
-            elif veiculo['km'] < 30000:
-                veiculo['badge'] = 'deal'
-                veiculo['badgeText'] = 'Seminovo'
-            else:
-                veiculo['badge'] = None
-                veiculo['badgeText'] = ''
-            
-            veiculo['power'] = 'Consultar Loja'
-            
-            if veiculo['foto_base64']:
-                veiculo['images'] = [f"data:image/jpeg;base64,{veiculo['foto_base64']}"] * 2
-            else:
-                veiculo['images'] = [
-                    "https://images.unsplash.com/photo-1503376780353-7e6692767b70?w=1200&q=80",
-                    "https://images.unsplash.com/photo-1549317661-bd32c8ce0729?w=1200&q=80"
-                ]
-            
-            marcas_set.add(veiculo['marca'])
-
-        return veiculos, sorted(list(marcas_set))
+        p = _placeholder(conn)
+
+        condicoes = ["v.status = 'Em estoque'"]
+        params = []
+        for campo in ('marca', 'cambio'):
+            if filtros.get(campo):
+                condicoes.append(f'v.{campo} = {p}')
+                params.append(filtros[campo])
+        if filtros.get('q'):
+            condicoes.append(f"LOWER(v.marca || ' ' || v.modelo) LIKE {p}")
+            params.append(f"%{filtros['q'].lower()}%")
+        for campo, (coluna_faixa, operador, _) in FAIXAS.items():
+            if filtros.get(campo) is not None:
+                condicoes.append(f'v.{coluna_faixa} {operador} {p}')
+                params.append(filtros[campo])
+
+        # Paginação por cursor (keyset): continua depois do último (valor, id) entregue
+        if cursor:
+            comparacao = '<' if direcao == 'DESC' else '>'
+            valor = f'CAST({p} AS {TIPOS_CURSOR[coluna]})' if coluna in TIPOS_CURSOR else p
+            condicoes.append(f'(v.{coluna} {comparacao} {valor} OR (v.{coluna} = {valor} AND v.id {comparacao} {p}))')
+            params.extend([cursor[0], cursor[0], cursor[1]])
+
+        # Um a mais só para saber se existe a próxima página
+        linhas = _consultar(conn, f'''
+            SELECT {COLUNAS_VITRINE}
+            FROM veiculos v
+            WHERE {' AND '.join(condicoes)}
+            ORDER BY v.{coluna} {direcao}, v.id {direcao}
+            LIMIT {p}
+        ''', params + [limite + 1])
+
+        proximo = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo = codificar_cursor(ordem, linhas[-1][coluna], linhas[-1]['id'])
+        return [veiculo_vitrine(linha).como_dict() for linha in linhas], proximo
 
     except Exception as e:
+        # Propaga: uma falha do banco não pode virar uma página de estoque vazia (e ficar em cache)
         print(f"❌ Erro ao buscar veículos: {e}")
-        return [], []
+        raise
     finally:
         if conn:
             conn.close()
 
-def get_logo_base64():
+
+def listar_marcas():
+    """Marcas com veículo em estoque, para o filtro"""
+    conn = None
     try:
-        possible_paths = ["logoca.png", "./logoca.png", "/app/logoca.png", "logo-icon.png", "./logo-icon.png"]
-        for path in possible_paths:
-            if os.path.exists(path):
-                with open(path, "rb") as f:
-                    return base64.b64encode(f.read()).decode('utf-8')
+        conn = get_db_connection()
+        linhas = _consultar(conn, "SELECT DISTINCT marca FROM veiculos WHERE status = 'Em estoque' ORDER BY marca")
+        return [linha['marca'] for linha in linhas]
     except Exception as e:
-        print(f"⚠️ Não foi possível carregar logo: {e}")
-    return None
+        print(f"❌ Erro ao buscar marcas: {e}")
+        raise
+    finally:
+        if conn:
+            conn.close()
 
-def get_favicon_base64():
+# =============================================
+# ARQUIVOS ESTÁTICOS - CARREGADOS E OTIMIZADOS UMA VEZ POR WORKER
+# =============================================
+ativos = AtivosEstaticos()
+carregar_imagens(ativos)
+carregar_textos(ativos)
+
+# Muda quando o deploy traz outro template ou outros arquivos estáticos - entra na chave
+# do cache da página para o HTML gravado em VITRINE_CACHE_DIR não apontar para hashes antigos
+with open(__file__, 'rb') as _fonte:
+    IMPRESSAO_BUILD = hashlib.sha256(_fonte.read() + ''.join(sorted(ativos.por_arquivo)).encode()).hexdigest()[:12]
+
+
+@app.route('/static/<arquivo>')
+def servir_estatico(arquivo):
+    """O nome do arquivo é o hash do conteúdo: a resposta nunca expira"""
+    ativo = ativos.buscar(arquivo)
+    if ativo is None:
+        abort(404)
+    codificacao = escolher_codificacao(request.headers.get('Accept-Encoding'), ativo.codificados)
+
+    resposta = Response(ativo.codificados[codificacao], content_type=ativo.mime)
+    if codificacao:
+        resposta.content_encoding = codificacao
+    resposta.vary.add('Accept-Encoding')
+    resposta.set_etag(f"{ativo.etag}-{codificacao or 'identity'}")
+    resposta.cache_control.public = True
+    resposta.cache_control.max_age = 31536000
+    resposta.cache_control.immutable = True
+    return resposta.make_conditional(request)
+
+# =============================================
+# ROTA DE FOTOS - STREAMING DO ARMAZENAMENTO
+# =============================================
+@app.route('/foto/<int:veiculo_id>', defaults={'variante': 'original'})
+@app.route('/foto/<int:veiculo_id>/<variante>')
+def foto_veiculo(veiculo_id, variante):
+    """Entrega a variante em partes (WebP se o navegador aceita, senão JPEG).
+    Enquanto as variantes não foram geradas, entrega a foto original enviada."""
+    if variante not in VARIANTES:
+        abort(404)
+    formato = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+
+    conn = get_db_connection()
     try:
-        if os.path.exists("logo-icon.png"):
-            with open("logo-icon.png", "rb") as f:
-                return base64.b64encode(f.read()).decode('utf-8')
-    except Exception as e:
-        print(f"⚠️ Erro ao carregar favicon: {e}")
-    return None
+        p = _placeholder(conn)
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT fv.hash, fv.tamanho, v.foto_hash, v.foto_tamanho, v.foto_mime
+            FROM veiculos v
+            LEFT JOIN fotos_variantes fv
+                ON fv.veiculo_id = v.id AND fv.origem = v.foto_hash
+                AND fv.variante = {p} AND fv.formato = {p}
+            WHERE v.id = {p} AND v.status = 'Em estoque'
+        ''', (variante, formato, veiculo_id))
+        row = cursor.fetchone()
+    finally:
+        conn.close()
+
+    # Vendido, excluído ou sem foto: a vitrine só expõe fotos do estoque
+    if not row or not row[2]:
+        abort(404)
+    variante_pronta = row[0] is not None
+    if variante_pronta:
+        hash_servido, tamanho, mime = row[0], row[1], MIMES[formato]
+    else:
+        hash_servido, tamanho, mime = row[2], row[3], row[4] or 'image/jpeg'
+
+    armazenamento = obter_armazenamento()
+    try:
+        modificado_em = armazenamento.modificado_em(hash_servido)
+    except FileNotFoundError:
+        abort(404)  # Registro aponta para um arquivo que não está no armazenamento
+
+    # ler_em_partes é um gerador: o arquivo só é aberto quando a primeira parte é pedida,
+    # então um 304 decidido abaixo (só com os metadados) nunca toca no conteúdo
+    resposta = Response(armazenamento.ler_em_partes(hash_servido), mimetype=mime)
+    resposta.content_length = tamanho
+    resposta.set_etag(hash_servido)
+    resposta.last_modified = modificado_em
+    resposta.vary.add('Accept')
+    # ?v= é o hash da foto: a URL muda quando a foto muda, então a variante pronta
+    # nunca expira. Sem v, com v antigo ou com a original no lugar da variante ainda
+    # não gerada, o navegador revalida (e recebe 304 enquanto nada mudou).
+    if variante_pronta and request.args.get('v') == row[2][:VERSAO_FOTO]:
+        resposta.cache_control.public = True
+        resposta.cache_control.max_age = 31536000
+        resposta.cache_control.immutable = True
+    else:
+        resposta.cache_control.no_cache = True
+
+    return resposta.make_conditional(request)
+
+# =============================================
+# API DO ESTOQUE - FILTROS, ORDENAÇÃO E PÁGINAS NO SERVIDOR
+# =============================================
+@app.route('/api/veiculos')
+def api_veiculos():
+    """Página de veículos em estoque.
+    Parâmetros: marca, cambio, q, preco_min/max, ano_min/max, km_min/max, ordem, cursor, limite"""
+    ordem = request.args.get('ordem', 'recentes')
+    try:
+        if ordem not in ORDENACOES:
+            raise ValueError('ordem inválida')
+        filtros = filtros_da_requisicao(request.args)
+        cursor = decodificar_cursor(request.args.get('cursor'), ordem)
+        limite = min(max(int(request.args.get('limite', LIMITE_PAGINA)), 1), LIMITE_MAXIMO)
+    except ValueError as e:
+        return jsonify({'erro': str(e)}), 400
+
+    try:
+        veiculos, proximo = buscar_veiculos(filtros, ordem, cursor, limite)
+    except Exception:
+        return jsonify({'erro': 'estoque indisponível no momento'}), 503
+    return jsonify({'veiculos': veiculos, 'proximo': proximo})
 
 # =============================================
 # ROTA PRINCIPAL - PORSCHE CINEMATIC EXPERIENCE
 # =============================================
-@app.route('/')
-def home():
-    veiculos, marcas = get_veiculos_estoque()
-    logo_base64 = get_logo_base64()
-    favicon_base64 = get_favicon_base64()
+def renderizar_home():
+    # Só a primeira página vai no HTML; filtros e "Carregar mais" buscam em /api/veiculos
+    veiculos, proximo = buscar_veiculos({})
+    marcas = listar_marcas()
+    logo_url = ativos.url('logo')
+    favicon_url = ativos.url('favicon')
     
-    veiculos_json = json.dumps(veiculos, default=str, ensure_ascii=False)
+    # '</' escapado para um texto do banco não fechar o <script> de dados
+    veiculos_json = json.dumps(veiculos, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+    proximo_json = json.dumps(proximo)
     tipos = ["SUV", "Sedan", "Hatch", "Picape", "Coupé", "Elétrico"]
     transmissoes = ["Automático", "Manual", "CVT"]
 
@@ -196,300 +374,17 @@ def home():
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Carmelo Multimarcas | Experiência Premium</title>
-    <link rel="icon" href="data:image/png;base64,{favicon_base64}" type="image/png">
+    {f'<link rel="icon" href="{favicon_url}" type="image/png">' if favicon_url else ''}
     <link rel="preconnect" href="https://fonts.googleapis.com">
     <link href="https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700;800&display=swap" rel="stylesheet">
-    <style>
-        :root {{
-            --porsche-white: #ffffff;
-            --porsche-black: #000000;
-            --porsche-orange: #ff4d00;
-            --porsche-gray: #666666;
-            --porsche-light-gray: #e6e6e6;
-            --transition: all 0.5s cubic-bezier(0.16, 1, 0.3, 1);
-        }}
-
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{
-            font-family: 'Inter', sans-serif;
-            background-color: var(--porsche-white);
-            color: var(--porsche-black);
-            overflow-x: hidden;
-            scroll-behavior: smooth;
-        }}
-
-        /* HEADER TRANSPARENTE QUE FICA BRANCO AO ROLAR */
-        header {{
-            position: fixed;
-            top: 0; width: 100%;
-            height: 80px;
-            display: flex;
-            align-items: center;
-            justify-content: space-between;
-            padding: 0 50px;
-            z-index: 1000;
-            transition: var(--transition);
-            background: transparent;
-        }}
-
-        header.scrolled {{
-            background: rgba(255, 255, 255, 0.98);
-            backdrop-filter: blur(10px);
-            border-bottom: 1px solid var(--porsche-light-gray);
-            height: 70px;
-        }}
-
-        .logo-container {{ height: 40px; }}
-        .logo-img {{ height: 100%; width: auto; object-fit: contain; filter: brightness(0) invert(1); transition: var(--transition); }}
-        header.scrolled .logo-img {{ filter: none; }}
-
-        .header-nav {{ display: flex; gap: 40px; }}
-        .header-nav a {{
-            text-decoration: none;
-            color: white;
-            font-size: 13px;
-            font-weight: 600;
-            text-transform: uppercase;
-            letter-spacing: 2px;
-            transition: var(--transition);
-        }}
-        header.scrolled .header-nav a {{ color: var(--porsche-black); }}
-        .header-nav a:hover {{ color: var(--porsche-orange) !important; }}
-
-        /* HERO SECTION CINEMATOGRÁFICA */
-        .hero-cinematic {{
-            height: 100vh;
-            width: 100%;
-            position: relative;
-            display: flex;
-            align-items: center;
-            justify-content: flex-start;
-            padding: 0 10%;
-            background: #000;
-            overflow: hidden;
-        }}
-
-        .hero-bg {{
-            position: absolute;
-            inset: 0;
-            background: linear-gradient(to right, rgba(0,0,0,0.7) 0%, rgba(0,0,0,0.2) 50%, rgba(0,0,0,0) 100%),
-                        url('https://images.unsplash.com/photo-1533473359331-0135ef1b58bf?auto=format&fit=crop&w=1920&q=80'); /* ALTERE O LINK DA IMAGEM DA HERO AQUI */
-            background-size: cover;
-            background-position: center;
-            z-index: 1;
-        }}
-
-        .hero-content {{
-            position: relative;
-            z-index: 2;
-            color: white;
-            max-width: 800px;
-        }}
-
-        .hero-content h1 {{
-            font-size: clamp(48px, 8vw, 110px);
-            font-weight: 800;
-            line-height: 0.9;
-            letter-spacing: -4px;
-            margin-bottom: 30px;
-            text-transform: uppercase;
-        }}
-
-        .hero-btn {{
-            display: inline-block;
-            padding: 20px 45px;
-            border: 1px solid white;
-            color: white;
-            text-decoration: none;
-            font-size: 14px;
-            font-weight: 700;
-            text-transform: uppercase;
-            letter-spacing: 2px;
-            transition: var(--transition);
-            background: transparent;
-        }}
-
-        .hero-btn:hover {{
-            background: white;
-            color: black;
-        }}
-
-        .scroll-indicator {{
-            position: absolute;
-            bottom: 40px;
-            left: 50%;
-            transform: translateX(-50%);
-            z-index: 2;
-            color: white;
-            animation: bounce 2s infinite;
-            cursor: pointer;
-        }}
-
-        @keyframes bounce {{
-            0%, 20%, 50%, 80%, 100% {{ transform: translateY(0) translateX(-50%); }}
-            40% {{ transform: translateY(-10px) translateX(-50%); }}
-            60% {{ transform: translateY(-5px) translateX(-50%); }}
-        }}
-
-        /* VITRINE TÉCNICA (CLEAN LUXURY) */
-        .showcase-section {{
-            padding: 100px 50px;
-            max-width: 1500px;
-            margin: 0 auto;
-        }}
-
-        .showcase-header {{
-            margin-bottom: 60px;
-        }}
-
-        .showcase-header h2 {{
-            font-size: 42px;
-            font-weight: 700;
-            letter-spacing: -1px;
-            margin-bottom: 15px;
-        }}
-
-        .showcase-layout {{
-            display: grid;
-            grid-template-columns: 300px 1fr;
-            gap: 60px;
-        }}
-
-        /* FILTROS */
-        .sidebar {{ position: sticky; top: 100px; height: fit-content; }}
-        .filter-group {{ margin-bottom: 35px; border-bottom: 1px solid var(--porsche-light-gray); padding-bottom: 25px; }}
-        .filter-label {{ font-size: 13px; font-weight: 800; text-transform: uppercase; letter-spacing: 1px; margin-bottom: 15px; display: block; }}
-        
-        .search-box input {{
-            width: 100%;
-            padding: 15px;
-            background: #f8f8f8;
-            border: 1px solid transparent;
-            font-family: inherit;
-            font-size: 14px;
-            transition: var(--transition);
-        }}
-        .search-box input:focus {{ background: white; border-color: black; outline: none; }}
-
-        .custom-select {{
-            width: 100%;
-            padding: 15px;
-            background: #f8f8f8;
-            border: none;
-            font-size: 14px;
-            cursor: pointer;
-        }}
-
-        /* GRID DE VEÍCULOS */
-        .vehicle-grid {{
-            display: grid;
-            grid-template-columns: repeat(auto-fill, minmax(350px, 1fr));
-            gap: 40px;
-        }}
-
-        .vehicle-card {{
-            cursor: pointer;
-            transition: var(--transition);
-            border-bottom: 1px solid transparent;
-            padding-bottom: 20px;
-        }}
-
-        .vehicle-card:hover {{ border-color: var(--porsche-light-gray); }}
-
-        .card-img-box {{
-            aspect-ratio: 16/10;
-            background: #f2f2f2;
-            overflow: hidden;
-            position: relative;
-            margin-bottom: 25px;
-        }}
-
-        .card-img-box img {{
-            width: 100%; height: 100%; object-fit: cover;
-            transition: transform 1s ease;
-        }}
-
-        .vehicle-card:hover .card-img-box img {{ transform: scale(1.08); }}
-
-        .card-info h3 {{ font-size: 24px; font-weight: 700; margin-bottom: 5px; }}
-        .card-price-row {{ margin: 15px 0; }}
-        .price-label {{ font-size: 12px; color: var(--porsche-gray); text-transform: uppercase; }}
-        .price-value {{ font-size: 20px; font-weight: 700; color: var(--porsche-black); }}
-
-        .card-specs {{ display: flex; gap: 10px; margin-top: 20px; }}
-        .spec-tag {{ background: #f2f2f2; padding: 6px 12px; font-size: 12px; font-weight: 600; border-radius: 2px; }}
-
-        /* COMPARAÇÃO REFORÇADA */
-        .compare-btn-card {{
-            margin-top: 25px;
-            width: 100%;
-            padding: 15px;
-            background: white;
-            border: 1px solid black;
-            font-size: 12px;
-            font-weight: 800;
-            text-transform: uppercase;
-            letter-spacing: 1px;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-            gap: 10px;
-            transition: var(--transition);
-        }}
-
-        .compare-btn-card:hover {{ background: black; color: white; }}
-        .compare-btn-card.active {{ background: var(--porsche-orange); border-color: var(--porsche-orange); color: white; }}
-
-        /* FLOATING COMPARE BAR */
-        .compare-floating-bar {{
-            position: fixed;
-            bottom: 30px;
-            right: 30px;
-            background: black;
-            color: white;
-            padding: 15px 30px;
-            border-radius: 4px;
-            display: none;
-            align-items: center;
-            gap: 20px;
-            z-index: 900;
-            box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-            animation: slideIn 0.5s ease;
-        }}
-
-        @keyframes slideIn {{ from {{ transform: translateX(100%); }} to {{ transform: translateX(0); }} }}
-
-        /* MODAIS */
-        .modal-overlay {{
-            position: fixed;
-            inset: 0;
-            background: white;
-            z-index: 2000;
-            display: none;
-            overflow-y: auto;
-            padding: 60px;
-        }}
-        .modal-overlay.active {{ display: block; }}
-        .modal-close {{ position: fixed; top: 40px; right: 40px; background: black; color: white; border: none; width: 45px; height: 45px; border-radius: 50%; cursor: pointer; display: flex; align-items: center; justify-content: center; z-index: 2100; }}
-
-        /* FOOTER */
-        footer {{ background: #fafafa; padding: 80px 50px; border-top: 1px solid var(--porsche-light-gray); }}
-        .footer-grid {{ display: grid; grid-template-columns: repeat(auto-fit, minmax(250px, 1fr)); gap: 50px; max-width: 1500px; margin: 0 auto; }}
-        .footer-col h4 {{ font-size: 14px; text-transform: uppercase; margin-bottom: 25px; letter-spacing: 1px; }}
-        .footer-col p {{ font-size: 14px; color: var(--porsche-gray); line-height: 1.8; }}
-
-        @media (max-width: 1024px) {{
-            .showcase-layout {{ grid-template-columns: 1fr; }}
-            header {{ padding: 0 25px; }}
-            .hero-content h1 {{ font-size: 60px; }}
-        }}
-    </style>
+    <link rel="stylesheet" href="{ativos.url('css')}">
+    <script src="{ativos.url('js')}" defer></script>
 </head>
 <body>
 
     <header id="mainHeader">
         <div class="logo-container">
-            {f'<img src="data:image/png;base64,{logo_base64}" class="logo-img" alt="Logo">' if logo_base64 else '<div style="font-weight:800;font-size:24px;letter-spacing:-1px;color:white;" id="textLogo">CARMELO</div>'}
+            {f'<img src="{logo_url}" class="logo-img" alt="Logo">' if logo_url else '<div style="font-weight:800;font-size:24px;letter-spacing:-1px;color:white;" id="textLogo">CARMELO</div>'}
         </div>
         <nav class="header-nav">
             <a href="#estoque">Modelos</a>
@@ -544,6 +439,40 @@ def home():
                     </select>
                 </div>
 
+                <div class="filter-group">
+                    <label class="filter-label">Preço (R$)</label>
+                    <div class="search-box range-box">
+                        <input type="number" id="filterPrecoMin" placeholder="Mínimo" min="0" oninput="filterVehicles()">
+                        <input type="number" id="filterPrecoMax" placeholder="Máximo" min="0" oninput="filterVehicles()">
+                    </div>
+                </div>
+
+                <div class="filter-group">
+                    <label class="filter-label">Ano</label>
+                    <div class="search-box range-box">
+                        <input type="number" id="filterAnoMin" placeholder="De" min="1950" oninput="filterVehicles()">
+                        <input type="number" id="filterAnoMax" placeholder="Até" min="1950" oninput="filterVehicles()">
+                    </div>
+                </div>
+
+                <div class="filter-group">
+                    <label class="filter-label">Quilometragem</label>
+                    <div class="search-box range-box">
+                        <input type="number" id="filterKmMin" placeholder="De" min="0" oninput="filterVehicles()">
+                        <input type="number" id="filterKmMax" placeholder="Até" min="0" oninput="filterVehicles()">
+                    </div>
+                </div>
+
+                <div class="filter-group">
+                    <label class="filter-label">Ordenar por</label>
+                    <select id="filterOrdem" class="custom-select" onchange="filterVehicles()">
+                        <option value="recentes">Mais recentes</option>
+                        <option value="menor_preco">Menor preço</option>
+                        <option value="maior_preco">Maior preço</option>
+                        <option value="mais_novos">Mais novos</option>
+                    </select>
+                </div>
+
                 <div style="background: #f8f8f8; padding: 30px; border-radius: 4px;">
                     <div style="font-weight: 800; font-size: 14px; text-transform: uppercase; margin-bottom: 10px;">Comparar Selecionados</div>
                     <p style="font-size: 13px; color: var(--porsche-gray); margin-bottom: 20px;">Selecione até 4 modelos para ver as diferenças técnicas lado a lado.</p>
@@ -555,6 +484,8 @@ def home():
                 <div class="vehicle-grid" id="vehicleGrid">
                     <!-- Injected via JS -->
                 </div>
+                <div id="emptyState" style="display:none; padding:60px 0; text-align:center; color:var(--porsche-gray);">Nenhum veículo encontrado com esses filtros.</div>
+                <button class="hero-btn" id="loadMore" style="display:none; margin:50px auto 0; border-color:black; color:black;" onclick="loadMore()">Carregar mais</button>
             </main>
         </div>
     </section>
@@ -605,180 +536,74 @@ def home():
     </div>
 
     <script>
-        const vehicles = {veiculos_json};
-        let compareList = [];
-
-        // Header Scroll Effect
-        window.addEventListener('scroll', () => {{
-            const header = document.getElementById('mainHeader');
-            const textLogo = document.getElementById('textLogo');
-            if (window.scrollY > 100) {{
-                header.classList.add('scrolled');
-                if(textLogo) textLogo.style.color = 'black';
-            }} else {{
-                header.classList.remove('scrolled');
-                if(textLogo) textLogo.style.color = 'white';
-            }}
-        }});
-
-        function formatPrice(p) {{
-            return 'R$ ' + p.toLocaleString('pt-BR', {{minimumFractionDigits: 2, maximumFractionDigits: 2}});
-        }}
-
-        function renderVehicles(list) {{
-            const grid = document.getElementById('vehicleGrid');
-            grid.innerHTML = list.map(v => `
-                <div class="vehicle-card" onclick="openDetail(${{v.id}})">
-                    <div class="card-img-box">
-                        <img src="${{v.images[0]}}" alt="${{v.nome_completo}}" loading="lazy">
-                    </div>
-                    <div class="card-info">
-                        <h3>${{v.marca}} ${{v.modelo}}</h3>
-                        <div class="card-price-row">
-                            <div class="price-label">A partir de</div>
-                            <div class="price-value">${{formatPrice(v.preco_venda)}}</div>
-                        </div>
-                        <div class="card-specs">
-                            <span class="spec-tag">${{v.ano}}</span>
-                            <span class="spec-tag">${{v.km.toLocaleString('pt-BR')}} KM</span>
-                            <span class="spec-tag">${{v.cambio}}</span>
-                        </div>
-                        <button class="compare-btn-card ${{compareList.some(c => c.id === v.id) ? 'active' : ''}}" 
-                                onclick="event.stopPropagation(); toggleCompare(${{v.id}})">
-                            <svg width="16" height="16" fill="none" stroke="currentColor" stroke-width="2" viewBox="0 0 24 24">
-                                <path d="M8 3 4 7l4 4M16 3l4 4-4 4M14 20V4M10 20V4"/>
-                            </svg>
-                            ${{compareList.some(c => c.id === v.id) ? 'Remover da Comparação' : 'Comparar Modelo'}}
-                        </button>
-                    </div>
-                </div>
-            `).join('');
-        }}
-
-        function filterVehicles() {{
-            const search = document.getElementById('searchInput').value.toLowerCase();
-            const marca = document.getElementById('filterMarca').value;
-            const cambio = document.getElementById('filterCambio').value;
-
-            const filtered = vehicles.filter(v => {{
-                const matchSearch = v.nome_completo.toLowerCase().includes(search) || v.marca.toLowerCase().includes(search);
-                const matchMarca = !marca || v.marca === marca;
-                const matchCambio = !cambio || v.cambio === cambio;
-                return matchSearch && matchMarca && matchCambio;
-            }});
-            renderVehicles(filtered);
-        }}
-
-        function toggleCompare(id) {{
-            const v = vehicles.find(x => x.id === id);
-            const index = compareList.findIndex(c => c.id === id);
-
-            if (index > -1) {{
-                compareList.splice(index, 1);
-            }} else if (compareList.length < 4) {{
-                compareList.push(v);
-            }} else {{
-                alert('Máximo de 4 modelos para comparação.');
-            }}
-
-            updateCompareUI();
-            renderVehicles(vehicles);
-        }}
-
-        function updateCompareUI() {{
-            const count = compareList.length;
-            document.getElementById('compareCount').textContent = count;
-            document.getElementById('compareCountTop').textContent = count;
-            document.getElementById('compareBar').style.display = count > 0 ? 'flex' : 'none';
-        }}
-
-        function openDetail(id) {{
-            const v = vehicles.find(x => x.id === id);
-            if (!v) return;
-
-            const modalContent = document.getElementById('modalContent');
-            modalContent.innerHTML = `
-                <div style="display:grid; grid-template-columns: 1.5fr 1fr; gap: 80px;">
-                    <div>
-                        <img src="${{v.images[0]}}" style="width:100%; border-radius:4px; margin-bottom:40px;">
-                        <h4 style="text-transform:uppercase; font-size:14px; margin-bottom:20px; border-bottom:1px solid #eee; padding-bottom:10px;">Histórico e Condição</h4>
-                        <p style="color:#666; line-height:1.8;">${{v.history}}</p>
-                    </div>
-                    <div>
-                        <div style="text-transform:uppercase; letter-spacing:3px; font-size:12px; color:#999; margin-bottom:10px;">${{v.marca}}</div>
-                        <h2 style="font-size:48px; font-weight:800; margin-bottom:30px; line-height:1;">${{v.modelo}}</h2>
-                        
-                        <div style="background:#f9f9f9; padding:30px; margin-bottom:40px;">
-                            <div style="font-size:14px; color:#666; margin-bottom:5px;">Preço de Venda</div>
-                            <div style="font-size:36px; font-weight:800; color:var(--porsche-orange);">${{formatPrice(v.preco_venda)}}</div>
-                        </div>
-
-                        <div style="display:grid; grid-template-columns:1fr 1fr; gap:30px; margin-bottom:50px;">
-                            <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Ano</div><div style="font-weight:700;">${{v.ano}}</div></div>
-                            <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Quilometragem</div><div style="font-weight:700;">${{v.km.toLocaleString('pt-BR')}} KM</div></div>
-                            <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Câmbio</div><div style="font-weight:700;">${{v.cambio}}</div></div>
-                            <div><div style="font-size:11px; text-transform:uppercase; color:#999;">Combustível</div><div style="font-weight:700;">${{v.combustivel}}</div></div>
-                        </div>
-
-                        <div style="margin-bottom:50px;">
-                            <h4 style="text-transform:uppercase; font-size:13px; margin-bottom:20px;">Destaques do Veículo</h4>
-                            <div style="display:grid; grid-template-columns:1fr 1fr; gap:12px;">
-                                ${{v.optionals.map(opt => `<div style="font-size:13px; display:flex; align-items:center; gap:10px;"><span style="width:5px; height:5px; background:black; border-radius:50%;"></span>${{opt}}</div>`).join('')}}
-                            </div>
-                        </div>
-
-                        <a href="https://wa.me/558430622434?text=Olá! Tenho interesse no ${{v.nome_completo}}" target="_blank" class="hero-btn" style="background:black; color:white; width:100%; text-align:center; border:none;">Solicitar Proposta</a>
-                    </div>
-                </div>
-            `;
-            document.getElementById('detailModal').classList.add('active');
-            document.body.style.overflow = 'hidden';
-        }}
-
-        function closeModal() {{ document.getElementById('detailModal').classList.remove('active'); document.body.style.overflow = 'auto'; }}
-
-        function openCompare() {{
-            if (compareList.length < 2) {{ alert('Selecione pelo menos 2 modelos.'); return; }}
-            const container = document.getElementById('compareTableContainer');
-            let html = '<table style="width:100%; border-collapse:collapse; min-width:800px;">';
-            html += '<tr><th style="padding:20px; border-bottom:1px solid #eee; text-align:left; width:200px;">Especificações</th>';
-            compareList.forEach(v => {{
-                html += `<td style="padding:20px; border-bottom:1px solid #eee;">
-                    <img src="${{v.images[0]}}" style="width:100%; height:150px; object-fit:cover; margin-bottom:15px;">
-                    <div style="font-weight:800; font-size:18px;">${{v.nome_completo}}</div>
-                </td>`;
-            }});
-            html += '</tr>';
-
-            const fields = [
-                {{label: 'Preço', key: 'preco_venda', fmt: formatPrice}},
-                {{label: 'Ano', key: 'ano'}},
-                {{label: 'KM', key: 'km', fmt: v => v.toLocaleString('pt-BR') + ' KM'}},
-                {{label: 'Câmbio', key: 'cambio'}},
-                {{label: 'Combustível', key: 'combustivel'}},
-                {{label: 'Cor', key: 'cor'}}
-            ];
-
-            fields.forEach(f => {{
-                html += `<tr><th style="padding:20px; border-bottom:1px solid #eee; text-align:left; font-size:12px; text-transform:uppercase; color:#999;">${{f.label}}</th>`;
-                compareList.forEach(v => {{
-                    html += `<td style="padding:20px; border-bottom:1px solid #eee; font-weight:600;">${{f.fmt ? f.fmt(v[f.key]) : v[f.key]}}</td>`;
-                }});
-                html += '</tr>';
-            }});
-            html += '</table>';
-            container.innerHTML = html;
-            document.getElementById('compareView').classList.add('active');
-            document.body.style.overflow = 'hidden';
-        }}
-
-        function closeCompare() {{ document.getElementById('compareView').classList.remove('active'); document.body.style.overflow = 'auto'; }}
-
-        renderVehicles(vehicles);
+        let vehicles = {veiculos_json};
+        let proximoCursor = {proximo_json};
     </script>
 </body>
 </html>'''
-    return render_template_string(html_template)
+    return html_template
+
+
+# =============================================
+# CACHE DA PÁGINA INICIAL - CHAVE = VERSÃO DO INVENTÁRIO
+# =============================================
+# Um gatilho (migração 10) incrementa inventario_versao a cada escrita em
+# veiculos. A página renderizada e comprimida fica em cache sob essa versão;
+# cada worker confere a versão no banco no máximo a cada VERSAO_TTL segundos.
+VERSAO_TTL = 2.0
+
+cache_paginas = CacheRespostas(os.environ.get('VITRINE_CACHE_DIR'))
+_versao_lida = {'versao': None, 'em': 0.0}
+# Última página servida com sucesso - volta a ser servida enquanto o banco estiver fora
+_ultima_home = {'pagina': None}
+
+PAGINA_INDISPONIVEL = '''<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="UTF-8"><title>Carmelo Multimarcas</title></head>
+<body style="font-family:sans-serif;text-align:center;padding:80px 20px;">
+<h1>Estoque temporariamente indisponível</h1>
+<p>Tente novamente em alguns instantes.</p>
+</body></html>'''
+
+
+def versao_inventario():
+    agora = time.monotonic()
+    if _versao_lida['versao'] is None or agora - _versao_lida['em'] > VERSAO_TTL:
+        conn = get_db_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT versao FROM inventario_versao WHERE id = 1')
+            row = cursor.fetchone()
+        finally:
+            conn.close()
+        _versao_lida['versao'], _versao_lida['em'] = (row[0] if row else 0), agora
+    return _versao_lida['versao']
+
+
+@app.route('/')
+def home():
+    # Se versao_inventario() ou renderizar_home() falham, nada entra no cache
+    try:
+        pronta = cache_paginas.obter(f"home-v{versao_inventario()}-{IMPRESSAO_BUILD}", renderizar_home)
+    except Exception as e:
+        print(f"❌ Erro ao montar a página inicial: {e}")
+        pronta = _ultima_home['pagina']
+        if pronta is None:
+            resposta = Response(PAGINA_INDISPONIVEL, status=503, mimetype='text/html')
+            resposta.retry_after = 30
+            resposta.cache_control.no_store = True
+            return resposta
+    else:
+        _ultima_home['pagina'] = pronta
+    codificacao = escolher_codificacao(request.headers.get('Accept-Encoding'), pronta.codificados)
+
+    resposta = Response(pronta.codificados[codificacao], mimetype='text/html')
+    if codificacao:
+        resposta.content_encoding = codificacao
+    resposta.vary.add('Accept-Encoding')
+    # ETag forte por representação: cada codificação tem bytes diferentes
+    resposta.set_etag(f"{pronta.etag}-{codificacao or 'identity'}")
+    resposta.cache_control.no_cache = True
+    return resposta.make_conditional(request)
 
 if __name__ == '__main__':
     port = int(os.environ.get("PORT", 5000))